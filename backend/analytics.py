@@ -0,0 +1,316 @@
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models, services
+from .database import epoch_seconds
+from .metrics import timed
+
+# Elemzési korlátok (.env-ben felülírhatók), hogy egy kérés a késleltetési kereten belül maradjon
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", 92))
+ANALYTICS_MAX_CORRELATION_CITIES = int(os.getenv("ANALYTICS_MAX_CORRELATION_CITIES", 50))
+
+METRICS = tuple(services.STAT_METRICS)
+EPOCH = datetime(1970, 1, 1)
+
+# Oszlopos adatok (city_id, timestamp) szerint rendezve: city_id int64, epoch (másodperc) és value float64 tömbök
+Columns = namedtuple("Columns", "city_id epoch value")
+
+
+def _check_metric(metric: str):
+    if metric not in METRICS:
+        raise ValueError(f"Ismeretlen mező: {metric}")
+
+
+def _check_range(start: datetime, end: datetime):
+    if start >= end:
+        raise ValueError("A kezdőidőpont a záró időpont előtt legyen.")
+    if end - start > timedelta(days=ANALYTICS_MAX_DAYS):
+        raise ValueError(f"Legfeljebb {ANALYTICS_MAX_DAYS} napos időszak kérhető.")
+
+
+def _check_limit(limit: int):
+    if limit < 1:
+        raise ValueError("A limit legalább 1 legyen.")
+
+
+def to_epoch(timestamp: datetime) -> float:
+    return (timestamp - EPOCH).total_seconds()
+
+
+def from_epoch(seconds: float) -> str:
+    return (EPOCH + timedelta(seconds=round(float(seconds)))).isoformat()
+
+
+def load_columns(
+    db: Session,
+    metric: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    city_ids: Optional[Sequence[int]] = None,
+) -> Columns:
+    """Egyetlen lekérdezéssel, ORM objektumok és datetime példányok nélkül tölti be a mező idősorait."""
+    raw = models.WeatherData
+    column = getattr(raw, metric)
+    stmt = select(raw.city_id, epoch_seconds(db.get_bind(), raw.timestamp), column).where(
+        column.isnot(None), raw.timestamp.isnot(None)
+    )
+    stmt = services.filter_weather(stmt, None, start, end)
+    if city_ids is not None:
+        stmt = stmt.where(raw.city_id.in_(list(city_ids)))
+    # Core végrehajtás (az ORM eredményfeldolgozása nélkül); a sorok laposított bejárása nagyságrenddel gyorsabb, mint np.array(rows)
+    rows = db.connection().execute(stmt).all()
+    data = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=3 * len(rows)).reshape(-1, 3)
+    # ORDER BY helyett numpy rendez: így a rövid időablakos lekérdezés az időbélyeg indexét használhatja
+    # a teljes (city_id, timestamp) index bejárása helyett
+    data = data[np.lexsort((data[:, 1], data[:, 0]))]
+    # A julianday alapú átváltás lebegőpontos hibáját ezredmásodpercre kerekítjük
+    return Columns(data[:, 0].astype(np.int64), np.round(data[:, 1], 3), data[:, 2])
+
+
+def segments(city_id: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Városonkénti szakaszok a rendezett tömbben: (szakasz sorszáma soronként, a szakasz első indexe soronként, szakaszkezdetek)."""
+    new_city = np.ones(len(city_id), dtype=bool)
+    new_city[1:] = city_id[1:] != city_id[:-1]
+    rank = np.cumsum(new_city) - 1
+    first = np.flatnonzero(new_city)
+    return rank, first[rank], first
+
+
+def trailing_bounds(columns: Columns, seconds: float, include_current: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Soronként a [t - seconds, t] (vagy [t - seconds, t)) időablak [lo, hi) indexhatárai a saját városán belül.
+
+    A (város sorszáma, idő) párt egyetlen monoton kulccsá alakítjuk, így minden sor ablakkezdete
+    egyetlen searchsorted hívással, városonkénti ciklus nélkül adódik.
+    """
+    n = len(columns.epoch)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    rank, starts, _ = segments(columns.city_id)
+    relative = columns.epoch - columns.epoch.min()
+    span = relative.max() + seconds + 1
+    key = rank * span + relative
+    lo = np.maximum(np.searchsorted(key, key - seconds, side="left"), starts)
+    hi = np.arange(n) + (1 if include_current else 0)
+    return lo, hi
+
+
+def window_stats(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Ablakonkénti darabszám, átlag és (mintabeli) szórás prefix összegekből, O(n) időben."""
+    prefix = np.concatenate(([0.0], np.cumsum(values)))
+    prefix_sq = np.concatenate(([0.0], np.cumsum(values * values)))
+    count = hi - lo
+    total = prefix[hi] - prefix[lo]
+    total_sq = prefix_sq[hi] - prefix_sq[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        variance = (total_sq - total * total / count) / (count - 1)
+    return count, mean, np.sqrt(np.clip(variance, 0.0, None))
+
+
+def daily_means(epoch: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Napi (UTC) átlagok: (napok sorszáma 1970 óta, átlagok, darabszámok)."""
+    days, inverse = np.unique((epoch // 86400).astype(np.int64), return_inverse=True)
+    counts = np.bincount(inverse)
+    return days, np.bincount(inverse, weights=values) / counts, counts
+
+
+def _round(value, digits: int = 2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def _city_names(db: Session, city_ids: Iterable[int]) -> Dict[int, str]:
+    ids = {int(city_id) for city_id in city_ids}
+    if not ids:
+        return {}
+    return dict(db.execute(select(models.City.id, models.City.city_name).where(models.City.id.in_(ids))).all())
+
+
+@timed()
+def trend(
+    db: Session,
+    city_id: int,
+    metric: str = "temperature",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    window_hours: float = 24,
+) -> Dict:
+    """Mozgóátlag (az utolsó window_hours órára) minden mérésre, valamint napi átlagok és napról napra változás."""
+    _check_metric(metric)
+    if window_hours <= 0:
+        raise ValueError("A window_hours pozitív legyen.")
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=7)
+    _check_range(start, end)
+
+    window = window_hours * 3600
+    columns = load_columns(db, metric, start - timedelta(seconds=window), end, [city_id])
+    lo, hi = trailing_bounds(columns, window, include_current=True)
+    _, rolling, _ = window_stats(columns.value, lo, hi)
+
+    in_range = columns.epoch >= to_epoch(start)
+    epoch, values = columns.epoch[in_range], columns.value[in_range]
+    days, means, counts = daily_means(epoch, values)
+    deltas = np.full(len(days), np.nan)
+    consecutive = np.diff(days) == 1
+    deltas[1:][consecutive] = np.diff(means)[consecutive]
+
+    return {
+        "city_id": city_id,
+        "metric": metric,
+        "window_hours": window_hours,
+        "points": [
+            {"timestamp": from_epoch(e), "value": float(v), "rolling_mean": _round(m)}
+            for e, v, m in zip(epoch, values, rolling[in_range])
+        ],
+        "daily": [
+            {"day": (EPOCH + timedelta(days=int(d))).date().isoformat(), "mean": _round(m), "count": int(c), "delta": _round(delta)}
+            for d, m, c, delta in zip(days, means, counts, deltas)
+        ],
+    }
+
+
+@timed()
+def anomalies(
+    db: Session,
+    metric: str = "temperature",
+    city_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    baseline_hours: float = 168,
+    threshold: float = 3.0,
+    min_samples: int = 24,
+    limit: int = 100,
+) -> Dict:
+    """Z-score alapú anomáliák: minden [start, end) közti mérést a saját városa előző baseline_hours órájához mér.
+
+    A küszöböt meghaladó |z| értékű méréseket csökkenő |z| szerint adja vissza (legfeljebb limit darabot).
+    """
+    _check_metric(metric)
+    _check_limit(limit)
+    if baseline_hours <= 0 or threshold <= 0 or min_samples < 2:
+        raise ValueError("A baseline_hours és a threshold pozitív, a min_samples legalább 2 legyen.")
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=1)
+    baseline = timedelta(hours=baseline_hours)
+    _check_range(start - baseline, end)
+
+    columns = load_columns(db, metric, start - baseline, end, [city_id] if city_id is not None else None)
+    lo, hi = trailing_bounds(columns, baseline.total_seconds(), include_current=False)
+    count, mean, std = window_stats(columns.value, lo, hi)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (columns.value - mean) / std
+    checked = (columns.epoch >= to_epoch(start)) & (count >= min_samples) & (std > 0)
+    flagged = np.flatnonzero(checked & (np.abs(z) >= threshold))
+    top = flagged[np.argsort(-np.abs(z[flagged]), kind="stable")][:limit]
+    names = _city_names(db, columns.city_id[top])
+
+    return {
+        "metric": metric,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "baseline_hours": baseline_hours,
+        "threshold": threshold,
+        "checked": int(checked.sum()),
+        "flagged": int(len(flagged)),
+        "anomalies": [
+            {
+                "city_id": int(columns.city_id[i]),
+                "city_name": names.get(int(columns.city_id[i])),
+                "timestamp": from_epoch(columns.epoch[i]),
+                "value": float(columns.value[i]),
+                "baseline_mean": _round(mean[i]),
+                "baseline_std": _round(std[i]),
+                "z": _round(z[i]),
+            }
+            for i in top
+        ],
+    }
+
+
+@timed()
+def ranking(
+    db: Session,
+    metric: str = "temperature",
+    limit: int = 10,
+    order: str = "desc",
+    max_age_hours: float = 3,
+    now: Optional[datetime] = None,
+) -> Dict:
+    """Az összes város legutóbbi (max_age_hours óránál nem régebbi) mérésének rangsora egyetlen lekérdezésből."""
+    _check_metric(metric)
+    _check_limit(limit)
+    if order not in ("asc", "desc"):
+        raise ValueError("Az order értéke asc vagy desc lehet.")
+    now = now or datetime.utcnow()
+    columns = load_columns(db, metric, now - timedelta(hours=max_age_hours), None)
+
+    if len(columns.epoch):
+        _, _, first = segments(columns.city_id)
+        latest = np.append(first[1:] - 1, len(columns.epoch) - 1)
+    else:
+        latest = np.zeros(0, dtype=np.int64)
+    values = columns.value[latest]
+    top = latest[np.argsort(-values if order == "desc" else values, kind="stable")[:limit]]
+    names = _city_names(db, columns.city_id[top])
+
+    return {
+        "metric": metric,
+        "order": order,
+        "max_age_hours": max_age_hours,
+        "cities": int(len(latest)),
+        "ranking": [
+            {
+                "rank": position,
+                "city_id": int(columns.city_id[i]),
+                "city_name": names.get(int(columns.city_id[i])),
+                "value": float(columns.value[i]),
+                "timestamp": from_epoch(columns.epoch[i]),
+            }
+            for position, i in enumerate(top, start=1)
+        ],
+    }
+
+
+@timed()
+def correlation(
+    db: Session,
+    city_ids: List[int],
+    metric: str = "temperature",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_overlap: int = 24,
+) -> Dict:
+    """Városok közti Pearson-korreláció órás átlagokon; a pár kimarad (None), ha kevesebb mint min_overlap közös órája van."""
+    _check_metric(metric)
+    city_ids = sorted(set(city_ids))
+    if not city_ids:
+        raise ValueError("Legalább egy city_id szükséges.")
+    if len(city_ids) > ANALYTICS_MAX_CORRELATION_CITIES:
+        raise ValueError(f"Legfeljebb {ANALYTICS_MAX_CORRELATION_CITIES} város hasonlítható össze egyszerre.")
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30)
+    _check_range(start, end)
+
+    columns = load_columns(db, metric, start, end, city_ids)
+    frame = pd.DataFrame({"city_id": columns.city_id, "hour": (columns.epoch // 3600).astype(np.int64), "value": columns.value})
+    grid = frame.groupby(["hour", "city_id"])["value"].mean().unstack("city_id").reindex(columns=city_ids)
+    matrix = grid.corr(min_periods=min_overlap).to_numpy()
+
+    return {
+        "metric": metric,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "resolution": "hour",
+        "city_ids": city_ids,
+        "hours": {int(city_id): int(n) for city_id, n in grid.count().items()},
+        "matrix": [[_round(value, 4) for value in row] for row in matrix],
+    }
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+
+# Válasz-gyorsítótár beállításai (.env-ben felülírhatók); 0 TTL kikapcsolja
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+
+# Címkék: egy városhoz kötött bejegyzések, az összes várost érintő lekérdezések és a városlista
+ALL_CITIES_TAG = ("all",)
+CITY_LIST_TAG = ("cities",)
+
+
+def city_tag(city_id: int) -> Tuple:
+    return ("city", city_id)
+
+
+def tags_for(city_id: Optional[int]) -> Tuple:
+    """Egy városra szűrt lekérdezés a város címkéjét, a szűretlen az 'összes város' címkét kapja."""
+    return (city_tag(city_id),) if city_id is not None else (ALL_CITIES_TAG,)
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    tags: Tuple = ()
+    expires_at: float = 0.0
+
+
+class ResponseCache:
+    """Szálbiztos, méretkorlátos LRU gyorsítótár TTL-lel és címke alapú érvénytelenítéssel.
+
+    Az írások (save_weather, create_city) az érintett város címkéjét érvénytelenítik, így a
+    gyorsítótár sosem ad vissza elavult adatot a saját folyamat írásai után.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._keys_by_tag: Dict[Tuple, set] = {}
+        self._lock = threading.Lock()
+        # Minden érvénytelenítés növeli; a közben számolt válaszokat nem tároljuk el
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= self._clock():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: Hashable, body: bytes, tags: Iterable[Tuple] = (), headers: Optional[Dict[str, str]] = None, generation: Optional[int] = None) -> CachedResponse:
+        """Eltárol egy választ; ha a számolása közben érvénytelenítés történt, csak visszaadja."""
+        entry = CachedResponse(body=body, etag=make_etag(body), headers=headers or {}, tags=tuple(tags))
+        with self._lock:
+            if not self.enabled or (generation is not None and generation != self.generation):
+                return entry
+            entry.expires_at = self._clock() + self.ttl
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def invalidate(self, *tags: Tuple):
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def invalidate_cities(self, city_ids: Iterable[int]):
+        """Új mérés után: az érintett városok és az összes várost lefedő lekérdezések érvénytelenítése."""
+        self.invalidate(ALL_CITIES_TAG, *(city_tag(city_id) for city_id in set(city_ids)))
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+
+# Folyamaton belüli, megosztott példány
+response_cache = ResponseCache()
+
+
+async def cached_response(request: Request, tags: Iterable[Tuple], producer: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]]) -> Response:
+    """A kérés útvonala és paraméterei alapján gyorsítótárazott JSON válasz ETag / If-None-Match támogatással.
+
+    A producer egy (JSON törzs, extra fejlécek) párt visszaadó korutin, és csak gyorsítótár-hiány esetén fut le.
+    """
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        body, headers = await producer()
+        entry = response_cache.set(key, body, tags, headers, generation=generation)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
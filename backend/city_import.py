@@ -0,0 +1,185 @@
+import codecs
+import csv
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import cache, geo, models
+from .database import dialect_insert
+
+# csv: fejléces CSV; ndjson: soronként egy JSON objektum; geonames: a GeoNames tabulátoros dumpja (fejléc nélkül)
+IMPORT_FORMATS = ("csv", "ndjson", "geonames")
+CITY_IMPORT_BATCH_ROWS = int(os.getenv("CITY_IMPORT_BATCH_ROWS", 1000))
+CITY_IMPORT_MAX_ROWS = int(os.getenv("CITY_IMPORT_MAX_ROWS", 500000))
+# Elfogadott oszlop- (illetve kulcs-) nevek mezőnként
+FIELD_ALIASES = {
+    "city_name": ("city_name", "name", "city"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lon", "lng"),
+}
+# GeoNames dump: geonameid, name, asciiname, alternatenames, latitude, longitude, ...
+GEONAMES_COLUMNS = (1, 4, 5)
+
+
+class CityImportError(ValueError):
+    """Hibás bemeneti sor; az import egésze elmarad (egy tranzakció)."""
+
+
+def _pick(record: Dict, field: str):
+    for alias in FIELD_ALIASES[field]:
+        if alias in record:
+            return record[alias]
+    return None
+
+
+class CityParser:
+    """Darabonként érkező törzs soronkénti feldolgozása; a teljes fájl sosem kerül a memóriába.
+
+    Az eredmény név szerint egyedi: ha egy név többször szerepel, az utolsó előfordulás érvényes
+    (az upsert is így viselkedne, és egy utasításon belül ugyanazt a sort kétszer nem frissíthetjük).
+    """
+
+    def __init__(self, fmt: str = "csv"):
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Ismeretlen importformátum: {fmt}")
+        self.format = fmt
+        self.cities: Dict[str, Tuple[float, float]] = {}
+        self.lines = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._pending = ""
+        self._columns = None  # csv: a fejléc alapján a (név, szélesség, hosszúság) oszlopindexek
+        self._record = None  # csv: idézőjelek közti sortörés miatt még folytatódó rekord (első sor száma, sorai)
+
+    def feed(self, chunk: bytes):
+        try:
+            text = self._pending + self._decoder.decode(chunk)
+        except UnicodeDecodeError as exc:
+            raise CityImportError(f"A bemenet nem UTF-8 kódolású: {exc}") from exc
+        lines = text.split("\n")
+        self._pending = lines.pop()
+        self._parse(lines)
+
+    def close(self) -> Dict[str, Tuple[float, float]]:
+        tail = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        if tail:
+            self._parse([tail])
+        if self._record is not None:
+            raise CityImportError(f"{self._record[0]}. sor: lezáratlan idézőjel")
+        if self.format == "csv" and self._columns is None:
+            raise CityImportError("Hiányzik a CSV fejléc")
+        return self.cities
+
+    def _parse(self, lines: List[str]):
+        if self.format == "csv":
+            numbered = list(self._csv_records(lines))
+            records = zip([lineno for lineno, _ in numbered], csv.reader(text for _, text in numbered))
+        else:
+            first = self.lines + 1
+            self.lines += len(lines)
+            if self.format == "geonames":
+                lines = (line.rstrip("\r").split("\t") for line in lines)
+            records = enumerate(lines, start=first)
+        for lineno, record in records:
+            if not record or (isinstance(record, str) and not record.strip()) or record == [""]:
+                continue
+            self._add(lineno, *self._fields(lineno, record))
+
+    def _csv_records(self, lines: List[str]) -> Iterable[Tuple[int, str]]:
+        """(első sor száma, rekord) párok; idézőjelek közti sortörésnél (RFC 4180) a rekord a következő
+        sorokban, akár a következő darabban folytatódik. Páratlan számú idézőjel után a rekord még nyitott.
+        """
+        for line in lines:
+            self.lines += 1
+            line = line.rstrip("\r")
+            if self._record is None:
+                if line.count('"') % 2 == 0:
+                    yield self.lines, line
+                    continue
+                self._record = (self.lines, [line])
+                continue
+            self._record[1].append(line)
+            if line.count('"') % 2:
+                start, parts = self._record
+                self._record = None
+                yield start, "\n".join(parts)
+
+    def _fields(self, lineno: int, record):
+        if self.format == "ndjson":
+            try:
+                data = json.loads(record)
+            except ValueError as exc:
+                raise CityImportError(f"{lineno}. sor: érvénytelen JSON ({exc})") from exc
+            if not isinstance(data, dict):
+                raise CityImportError(f"{lineno}. sor: JSON objektum szükséges")
+            return _pick(data, "city_name"), _pick(data, "latitude"), _pick(data, "longitude")
+
+        if self.format == "csv" and self._columns is None:
+            header = {name.strip().lower(): index for index, name in enumerate(record)}
+            columns = [next((header[a] for a in FIELD_ALIASES[field] if a in header), None) for field in FIELD_ALIASES]
+            if None in columns:
+                raise CityImportError(f"A CSV fejlécben kötelező: {', '.join(FIELD_ALIASES)}")
+            self._columns = columns
+            return None, None, None
+        columns = self._columns if self.format == "csv" else GEONAMES_COLUMNS
+        if len(record) <= max(columns):
+            raise CityImportError(f"{lineno}. sor: túl kevés oszlop ({len(record)})")
+        return tuple(record[index] for index in columns)
+
+    def _add(self, lineno: int, name, latitude, longitude):
+        if name is None and latitude is None and longitude is None:
+            return  # CSV fejléc
+        name = str(name or "").strip()
+        if not name:
+            raise CityImportError(f"{lineno}. sor: hiányzó városnév")
+        try:
+            lat, lon = float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            raise CityImportError(f"{lineno}. sor: érvénytelen koordináta") from None
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            raise CityImportError(f"{lineno}. sor: a koordináta tartományon kívül esik ({lat}, {lon})")
+        self.cities[name] = (lat, lon)
+        if len(self.cities) > CITY_IMPORT_MAX_ROWS:
+            raise CityImportError(f"Legfeljebb {CITY_IMPORT_MAX_ROWS} város importálható egyszerre")
+
+
+def import_cities(db: Session, cities: Dict[str, Tuple[float, float]], batch_rows: int = CITY_IMPORT_BATCH_ROWS) -> Dict:
+    """Városok upsertje név szerint (INSERT ... ON CONFLICT (city_name) DO UPDATE) egyetlen tranzakcióban.
+
+    A mentett sorok a commit után kerülnek a térbeli indexbe, a városlista gyorsítótára pedig érvénytelenül.
+    """
+    table = models.City.__table__
+    items = list(cities.items())
+    inserted = updated = 0
+    saved: List = []
+    connection = db.connection()
+    for start in range(0, len(items), batch_rows):
+        batch = items[start:start + batch_rows]
+        names = [name for name, _ in batch]
+        existing = len(connection.execute(select(table.c.id).where(table.c.city_name.in_(names))).all())
+        stmt = dialect_insert(db.get_bind(), table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.city_name],
+            set_={"latitude": stmt.excluded.latitude, "longitude": stmt.excluded.longitude},
+        ).returning(table.c.id, table.c.city_name, table.c.latitude, table.c.longitude)
+        rows = [{"city_name": name, "latitude": lat, "longitude": lon} for name, (lat, lon) in batch]
+        saved += connection.execute(stmt, rows).all()
+        updated += existing
+        inserted += len(batch) - existing
+    db.commit()
+    if items:
+        cache.response_cache.invalidate(cache.CITY_LIST_TAG)
+        geo.city_index.add(saved)
+    return {"cities": len(items), "inserted": inserted, "updated": updated}
+
+
+def parse_all(fmt: str, chunks: Iterable[bytes]) -> Dict[str, Tuple[float, float]]:
+    """Szinkron segéd (CLI, benchmark): a darabok feldolgozása egy lépésben."""
+    parser = CityParser(fmt)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
@@ -1,19 +1,111 @@
 import os
-from sqlalchemy import create_engine
+from datetime import datetime
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
+from . import metrics
+
 load_dotenv() # .env fájl betöltése
 
 # Ha nincs megadva DATABASE_URL akkor automatikusan SQLite-ot használ
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./weather.db")
+def async_database_url(url: str) -> str:
+    """A szinkron kapcsolati URL aszinkron driveres megfelelője (aiosqlite, illetve asyncpg)."""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
+# Induláskor create_all (fejlesztés, SQLite); PostgreSQL-en alapból az Alembic migrációk kezelik a sémát
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", str(DATABASE_URL.startswith("sqlite"))).lower() in ("1", "true", "yes", "on")
+# Az aszinkron réteg ugyanarra az adatbázisra mutat, külön megadni csak egyedi driverhez kell
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_database_url(DATABASE_URL))
+# Ennyi ideig vár egy zárolt SQLite adatbázisra, mielőtt hibát dobna
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+def configure_sqlite(engine: Engine) -> Engine:
+    """SQLite hangolás minden új kapcsolaton: WAL napló, synchronous=NORMAL, busy timeout és inkrementális auto_vacuum.
+
+    WAL módban az olvasók nem blokkolják az írót, a NORMAL szinkronizáció pedig
+    tranzakciónként spórol egy fsync-et. Más adatbázisoknál nem csinál semmit.
+    """
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Új adatbázisfájlnál érvényes (meglévőnél csak egy teljes VACUUM után): a törölt lapok
+        # fokozatosan, PRAGMA incremental_vacuum-mal adhatók vissza (lásd retention.py)
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+    return engine
+
+def dialect_insert(bind, table):
+    """Dialektus-specifikus INSERT, amely támogatja az ON CONFLICT (upsert) ágat SQLite-on és PostgreSQL-en."""
+    if bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+def time_bucket(bind, column, unit: str):
+    """Órára vagy napra csonkolt időbélyeg kifejezés az adatbázis dialektusának megfelelően."""
+    if bind.dialect.name == "sqlite":
+        fmt = "%Y-%m-%d %H:00:00" if unit == "hour" else "%Y-%m-%d 00:00:00"
+        return func.strftime(fmt, column)
+    return func.date_trunc(unit, column)
 
-engine = create_engine(DATABASE_URL)
+def epoch_seconds(bind, column):
+    """Az időbélyeg Unix időként (másodperc, lebegőpontos), hogy tömegesen datetime objektumok nélkül lehessen olvasni."""
+    if bind.dialect.name == "sqlite":
+        return (func.julianday(column) - 2440587.5) * 86400.0
+    return func.extract("epoch", column)
+
+def bucket_value(value) -> datetime:
+    """A time_bucket eredménye datetime-ként (SQLite szöveget, PostgreSQL datetime-ot ad vissza)."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+def scalar_min(bind, a, b):
+    """Két érték minimuma egy soron belül (SQLite: min(a, b), PostgreSQL: LEAST)."""
+    return func.least(a, b) if bind.dialect.name == "postgresql" else func.min(a, b)
+
+def scalar_max(bind, a, b):
+    """Két érték maximuma egy soron belül (SQLite: max(a, b), PostgreSQL: GREATEST)."""
+    return func.greatest(a, b) if bind.dialect.name == "postgresql" else func.max(a, b)
+
+engine = metrics.instrument_engine(configure_sqlite(create_engine(DATABASE_URL)))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Aszinkron engine: a lekérdezések nem blokkolják az eseményhurkot (aiosqlite / asyncpg)
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+configure_sqlite(async_engine.sync_engine)
+metrics.instrument_engine(async_engine.sync_engine)
+metrics.instrument_sessions()
+# expire_on_commit=False: commit után se kelljen (eseményhurkon kívüli) lusta újratöltés
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_async_session_factory():
+    """Sessiongyár azokhoz a végpontokhoz, amelyek a kérés után is olvasnak (pl. streamelt export)."""
+    return AsyncSessionLocal
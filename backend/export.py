@@ -0,0 +1,148 @@
+import csv
+import importlib.util
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from . import models
+from .services import filter_weather
+
+# Az Arrow/Parquet export csak akkor érhető el, ha a pyarrow telepítve van
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+EXPORT_COLUMNS = (
+    "id", "city_id", "timestamp", "temperature", "humidity", "apparent_temperature",
+    "precipitation", "cloud_cover", "is_day", "weather_code", "wind_speed", "observed_at",
+)
+TIMESTAMP_COLUMNS = ("timestamp", "observed_at")
+EXPORT_BATCH_ROWS = 5000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def export_query(city_id: Optional[int] = None, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Egyszerű oszlop-tuple-öket (nem ORM objektumokat) ad vissza időrendben."""
+    columns = [getattr(models.WeatherData, name) for name in EXPORT_COLUMNS]
+    stmt = filter_weather(select(*columns), city_id, start, end)
+    return stmt.order_by(models.WeatherData.timestamp, models.WeatherData.id)
+
+
+async def iter_batches(session_factory, city_id=None, start=None, end=None, batch_rows: int = EXPORT_BATCH_ROWS) -> AsyncIterator[List[Sequence]]:
+    """Szerveroldali kurzorral (yield_per) olvas, így egyszerre csak egy köteg van a memóriában.
+
+    Saját sessiont nyit, mert a válasz streamelése tovább tarthat, mint a kérés függőségeinek élete.
+    """
+    async with session_factory() as db:
+        result = await db.stream(export_query(city_id, start, end).execution_options(yield_per=batch_rows))
+        async for partition in result.partitions(batch_rows):
+            yield partition
+
+
+def row_dict(row: Sequence) -> Dict:
+    record = dict(zip(EXPORT_COLUMNS, row))
+    for name in TIMESTAMP_COLUMNS:
+        record[name] = record[name].isoformat() if record[name] else None
+    return record
+
+
+async def ndjson_stream(batches) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield "".join(json.dumps(row_dict(row), ensure_ascii=False) + "\n" for row in batch).encode("utf-8")
+
+
+async def csv_stream(batches) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for batch in batches:
+        for row in batch:
+            writer.writerow(row_dict(row).values())
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Írható fájlszerű objektum, amelynek tartalmát kötegenként kiürítjük és továbbküldjük."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()), ("city_id", pa.int64()), ("timestamp", pa.timestamp("us")),
+        ("temperature", pa.float64()), ("humidity", pa.int64()), ("apparent_temperature", pa.float64()),
+        ("precipitation", pa.float64()), ("cloud_cover", pa.int64()), ("is_day", pa.int64()),
+        ("weather_code", pa.int64()), ("wind_speed", pa.float64()), ("observed_at", pa.timestamp("us")),
+    ])
+
+
+def record_batch(schema, batch):
+    import pyarrow as pa
+
+    columns = list(zip(*batch))
+    return pa.RecordBatch.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema)
+
+
+async def arrow_stream(batches, file_format: str) -> AsyncIterator[bytes]:
+    """Arrow IPC stream vagy Parquet kimenet; minden DB köteg egy record batch / row group."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        async for batch in batches:
+            writer.write_batch(record_batch(schema, batch))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def stream_export(session_factory, file_format: str, city_id=None, start=None, end=None) -> AsyncIterator[bytes]:
+    """A kért formátumú, kötegenként előálló export bájtfolyam."""
+    batches = iter_batches(session_factory, city_id, start, end)
+    if file_format == "ndjson":
+        return ndjson_stream(batches)
+    if file_format == "csv":
+        return csv_stream(batches)
+    return arrow_stream(batches, file_format)
@@ -0,0 +1,329 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from . import models, services
+from .database import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Előrejelzési horizont és a modellfrissítések üteme (.env-ben felülírhatók)
+FORECAST_DAYS = int(os.getenv("FORECAST_DAYS", 7))
+# Az upstream modell ilyen óránként fut (00, 03, 06 ... UTC) ...
+FORECAST_RUN_HOURS = int(os.getenv("FORECAST_RUN_HOURS", 3))
+# ... és a futás után ennyi perccel érhető el az API-n
+FORECAST_RUN_DELAY_MINUTES = int(os.getenv("FORECAST_RUN_DELAY_MINUTES", 60))
+# A frissítő ilyen gyakran nézi meg, van-e a várt futásnál régebbi (vagy hiányzó) városelőrejelzés; 0: kikapcsolva
+FORECAST_CHECK_SECONDS = float(os.getenv("FORECAST_CHECK_SECONDS", 60))
+# Folyamatonként legfeljebb ennyi város előrejelzése marad a memóriában
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", 5000))
+# Ha a tárolt előrejelzés régebbi a várt futásnál (a frissítés még nem ért ide), ennyi ideig használjuk újraolvasás előtt
+FORECAST_STALE_SECONDS = float(os.getenv("FORECAST_STALE_SECONDS", 60))
+FORECAST_SAVE_BATCH_ROWS = int(os.getenv("FORECAST_SAVE_BATCH_ROWS", 500))
+
+# Tárolt változó -> Open-Meteo 'hourly' mezőnév
+FORECAST_FIELDS = {
+    "temperature": "temperature_2m",
+    "apparent_temperature": "apparent_temperature",
+    "humidity": "relative_humidity_2m",
+    "precipitation": "precipitation",
+    "precipitation_probability": "precipitation_probability",
+    "cloud_cover": "cloud_cover",
+    "weather_code": "weather_code",
+    "wind_speed": "wind_speed_10m",
+}
+VARIABLES = tuple(FORECAST_FIELDS)
+DTYPE = np.dtype("<f4")
+
+# Memóriabeli előrejelzés: a tömbök a tárolt bájtsorok nézetei (másolás nélkül)
+ForecastEntry = namedtuple("ForecastEntry", "city_id model_run start interval_seconds arrays expires_at")
+
+
+def model_run(now: Optional[datetime] = None, run_hours: int = FORECAST_RUN_HOURS, delay_minutes: int = FORECAST_RUN_DELAY_MINUTES) -> datetime:
+    """A legutóbbi, az API-n már elérhető modellfuttatás időpontja (UTC)."""
+    available = (now or datetime.utcnow()) - timedelta(minutes=delay_minutes)
+    day = available.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day + timedelta(hours=available.hour // run_hours * run_hours)
+
+
+def next_run_available(run: datetime, run_hours: int = FORECAST_RUN_HOURS, delay_minutes: int = FORECAST_RUN_DELAY_MINUTES) -> datetime:
+    """Mikor jelenik meg a run utáni következő futás az API-n (eddig érvényes a run-hoz tartozó gyorsítótár)."""
+    return run + timedelta(hours=run_hours, minutes=delay_minutes)
+
+
+def pack(values) -> bytes:
+    """Értéklista -> little-endian float32 bájtsor; a None NaN lesz."""
+    return np.asarray(values, dtype=np.float64).astype(DTYPE).tobytes()
+
+
+def unpack(blob: Optional[bytes], length: int) -> np.ndarray:
+    if blob is None:
+        return np.full(length, np.nan, dtype=DTYPE)
+    return np.frombuffer(blob, dtype=DTYPE)
+
+
+def forecast_query(days: int = FORECAST_DAYS) -> Dict:
+    # unixtime: az időtengely egész számokként jön, elég az első elem és a lépésköz
+    return {"hourly": ",".join(FORECAST_FIELDS.values()), "forecast_days": days, "timeformat": "unixtime"}
+
+
+def parse_hourly(city: models.City, item: Dict) -> Dict:
+    """Egy helyszín 'hourly' blokkja -> a forecasts tábla egy sora (változónként egy bájtsor)."""
+    hourly = item["hourly"]
+    times = hourly["time"]
+    if not times:
+        raise ValueError("Üres előrejelzés")
+    interval = times[1] - times[0] if len(times) > 1 else 3600
+    if any(b - a != interval for a, b in zip(times, times[1:])):
+        raise ValueError("Nem egyenletes időtengely")
+    row = {
+        "city_id": city.id,
+        "start": datetime.utcfromtimestamp(times[0]),
+        "interval_seconds": interval,
+        "hours": len(times),
+    }
+    for name, field in FORECAST_FIELDS.items():
+        values = hourly.get(field)
+        if values is not None and len(values) != len(times):
+            raise ValueError(f"A {field} hossza eltér az időtengelyétől")
+        row[name] = pack(values) if values is not None else None
+    return row
+
+
+def entry_from_row(row: Dict, expires_at: datetime) -> ForecastEntry:
+    """A forecasts tábla egy sora (oszlopnév -> érték) -> memóriabeli bejegyzés."""
+    arrays = {name: unpack(row[name], row["hours"]) for name in VARIABLES}
+    return ForecastEntry(row["city_id"], row["model_run"], row["start"], row["interval_seconds"], arrays, expires_at)
+
+
+def entry_expiry(run: datetime, now: datetime) -> datetime:
+    """A gyorsítótár lejárata: a következő futás megjelenése; ha az már elmúlt (késik a frissítés), rövid idő."""
+    return max(next_run_available(run), now + timedelta(seconds=FORECAST_STALE_SECONDS))
+
+
+class ForecastCache:
+    """Városonkénti előrejelzések LRU gyorsítótára, (város, modellfuttatás) kulcson.
+
+    Új futás megjelenésekor a kulcs is változik, így a régi bejegyzések maguktól kiesnek; a még régi
+    futást tartalmazó (késve frissülő) bejegyzések csak rövid ideig érvényesek.
+    """
+
+    def __init__(self, max_entries: int = FORECAST_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, ForecastEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, city_id: int, run: datetime, now: datetime) -> Optional[ForecastEntry]:
+        key = (city_id, run)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, run: datetime, entry: ForecastEntry):
+        if self.max_entries <= 0:
+            return
+        key = (entry.city_id, run)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(a.nbytes for entry in self._entries.values() for a in entry.arrays.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+forecast_cache = ForecastCache()
+
+
+def cached_forecast(city_id: int, now: Optional[datetime] = None) -> Optional[ForecastEntry]:
+    now = now or datetime.utcnow()
+    return forecast_cache.get(city_id, model_run(now), now)
+
+
+def load_forecast(db: Session, city_id: int, now: Optional[datetime] = None) -> Optional[ForecastEntry]:
+    """Gyorsítótár-hiánykor: egyetlen elsődleges kulcsos olvasás az adatbázisból, majd a bejegyzés eltárolása."""
+    now = now or datetime.utcnow()
+    run = model_run(now)
+    table = models.Forecast.__table__
+    row = db.connection().execute(select(table).where(table.c.city_id == city_id)).mappings().first()
+    if row is None:
+        return None
+    entry = entry_from_row(row, entry_expiry(row["model_run"], now))
+    forecast_cache.put(run, entry)
+    return entry
+
+
+def forecast_payload(entry: ForecastEntry, hours: int, now: Optional[datetime] = None) -> Dict:
+    """A következő hours óra (az aktuális órától) oszlopos formában; NaN helyett None."""
+    now = now or datetime.utcnow()
+    offset = max(0, math.floor((now - entry.start).total_seconds() / entry.interval_seconds))
+    columns = {
+        "time": [
+            (entry.start + timedelta(seconds=entry.interval_seconds * i)).isoformat()
+            for i in range(offset, min(offset + hours, len(entry.arrays[VARIABLES[0]])))
+        ]
+    }
+    for name, values in entry.arrays.items():
+        part = np.round(values[offset:offset + hours].astype(np.float64), 2)
+        columns[name] = [None if math.isnan(v) else v for v in part.tolist()]
+    return columns
+
+
+def stale_cities(db: Session, run: datetime) -> List[models.City]:
+    """Azok a városok, amelyeknek nincs előrejelzésük, vagy az a run-nál régebbi futásból származik."""
+    stmt = (
+        select(models.City)
+        .outerjoin(models.Forecast, models.Forecast.city_id == models.City.id)
+        .where(or_(models.Forecast.city_id.is_(None), models.Forecast.model_run < run))
+        .order_by(models.City.id)
+    )
+    return list(db.scalars(stmt))
+
+
+def save_forecasts(db: Session, rows: List[Dict], run: datetime, batch_rows: int = FORECAST_SAVE_BATCH_ROWS) -> int:
+    """Előrejelzések upsertje (városonként egy sor, ON CONFLICT (city_id) DO UPDATE), majd a gyorsítótár frissítése."""
+    if not rows:
+        return 0
+    table = models.Forecast.__table__
+    fetched_at = datetime.utcnow()
+    rows = [{**row, "model_run": run, "fetched_at": fetched_at} for row in rows]
+    stmt = dialect_insert(db.get_bind(), table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.city_id],
+        set_={column: stmt.excluded[column] for column in rows[0] if column != "city_id"},
+    )
+    connection = db.connection()
+    for start in range(0, len(rows), batch_rows):
+        connection.execute(stmt, rows[start:start + batch_rows])
+    db.commit()
+    # Ez a folyamat azonnal az új futást szolgálja ki; a többi worker a kulcsváltáskor olvassa újra
+    expires_at = entry_expiry(run, fetched_at)
+    for row in rows:
+        forecast_cache.put(run, entry_from_row(row, expires_at))
+    return len(rows)
+
+
+class ForecastRefresher:
+    """Háttérfeladat: minden modellfuttatás után egyszer, kötegelten lekéri az összes város órás előrejelzését.
+
+    FORECAST_CHECK_SECONDS időközönként megnézi, van-e a várt futásnál régebbi vagy hiányzó előrejelzés;
+    így az új városok és a korábban sikertelen lekérések is pótlódnak. Több worker esetén csak az fut,
+    amelyiknél a should_run igaz (az ütemező bérletének birtokosa).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval_seconds: float = FORECAST_CHECK_SECONDS,
+        should_run: Callable[[], bool] = lambda: True,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval_seconds
+        self.should_run = should_run
+        self.runs = 0
+        self.last_run: Optional[datetime] = None
+        self.last_model_run: Optional[datetime] = None
+        self.last_report: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+        self.retry_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self, now: Optional[datetime] = None, client=None) -> Dict:
+        """Egy frissítési kör: a lemaradt városok lekérése és mentése."""
+        run = model_run(now)
+        started = datetime.utcnow()
+        cities = await asyncio.to_thread(self._stale_cities, run)
+        report = {"model_run": run.isoformat(), "cities": len(cities), "saved": 0, "failed": 0, "rate_limited": False}
+        if cities:
+            try:
+                results = await services.fetch_weather_data_batch(cities, client=client, query=forecast_query(), parse=parse_hourly)
+            except services.RateLimitedError as e:
+                results = e.results
+                report["rate_limited"] = True
+                self.retry_at = started + timedelta(seconds=e.retry_after)
+            report["saved"] = await asyncio.to_thread(self._save, list(results.values()), run)
+            report["failed"] = len(cities) - len(results)
+        report["seconds"] = round((datetime.utcnow() - started).total_seconds(), 3)
+        self.last_model_run = run
+        return report
+
+    # Saját szinkron session egy szálon, hogy az eseményhurok szabad maradjon
+    def _stale_cities(self, run: datetime) -> List[models.City]:
+        with self.session_factory() as db:
+            cities = stale_cities(db, run)
+            db.expunge_all()
+            return cities
+
+    def _save(self, rows: List[Dict], run: datetime) -> int:
+        with self.session_factory() as db:
+            return save_forecasts(db, rows, run)
+
+    async def run(self):
+        while True:
+            if self.should_run() and (self.retry_at is None or datetime.utcnow() >= self.retry_at):
+                self.retry_at = None
+                try:
+                    self.last_report = await self.refresh()
+                    self.last_error = None
+                    if self.last_report["cities"]:
+                        logger.info(f"Előrejelzések frissítve: {self.last_report}")
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Hiba az előrejelzések frissítésekor: {e}")
+                self.runs += 1
+                self.last_run = datetime.utcnow()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._task is not None,
+            "expected_model_run": model_run().isoformat(),
+            "last_model_run": self.last_model_run.isoformat() if self.last_model_run else None,
+            "runs": self.runs,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_report": self.last_report,
+            "last_error": self.last_error,
+            "cache": forecast_cache.stats(),
+        }
@@ -0,0 +1,242 @@
+import bisect
+import heapq
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Rácscella mérete fokban; sűrű városhálónál kisebb cella kevesebb távolságszámítást jelent
+CITY_INDEX_CELL_DEGREES = float(os.getenv("CITY_INDEX_CELL_DEGREES", 1.0))
+CITY_NEAREST_MAX_K = int(os.getenv("CITY_NEAREST_MAX_K", 100))
+# Több worker esetén ilyen gyakran (mp) veszi át a többi folyamat által felvett új városokat; 0: soha
+CITY_INDEX_REFRESH_SECONDS = float(os.getenv("CITY_INDEX_REFRESH_SECONDS", 0))
+EARTH_RADIUS_KM = 6371.0088
+# Ennyi város alatt egyszerűbb (és gyorsabb) mindet végignézni, mint gyűrűnként keresni
+BRUTE_FORCE_LIMIT = 256
+
+# x, y, z: egységvektor; két város közül az a közelebbi, amelyiknél nagyobb a skaláris szorzat
+IndexedCity = namedtuple("IndexedCity", "id city_name latitude longitude x y z")
+
+
+def unit_vector(latitude: float, longitude: float) -> Tuple[float, float, float]:
+    phi, lam = math.radians(latitude), math.radians(longitude)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+
+def dot_to_km(dot: float) -> float:
+    return EARTH_RADIUS_KM * math.acos(max(-1.0, min(1.0, dot)))
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Gömbi (great-circle) távolság két pont között."""
+    a, b = unit_vector(lat1, lon1), unit_vector(lat2, lon2)
+    return dot_to_km(a[0] * b[0] + a[1] * b[1] + a[2] * b[2])
+
+
+class CityIndex:
+    """A városok memóriabeli, szálbiztos rácsindexe (lat/lon cellák) a legközelebbi város kereséséhez.
+
+    Szélességi soronként a foglalt cellák oszlopindexei rendezve állnak. A keresés legjobb-először halad:
+    egy kupac a még meg nem nézett sorok és soronként a két irányba (kelet/nyugat) haladó front következő
+    cellájának alsó távolságbecslését tartja. Ha a legkisebb becslés sem jobb a k-adik találatnál, leáll.
+    A becslés a cella középpontjától mért gömbi távolság mínusz a cella sugara, illetve a szélességi rés;
+    ez a sarkok közelében és óceán közepén is pontos, nem kell az egész földgömböt végigpásztázni.
+    Új vagy módosított város csak a saját celláját érinti (nincs újraépítés).
+    """
+
+    def __init__(self, cell_degrees: float = CITY_INDEX_CELL_DEGREES):
+        self.cell = cell_degrees
+        self.rows = math.ceil(180 / cell_degrees)
+        self.cols = math.ceil(360 / cell_degrees)
+        self._cells: Dict[Tuple[int, int], Dict[int, IndexedCity]] = {}
+        self._row_cols: Dict[int, List[int]] = {}
+        self._where: Dict[int, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.max_id = 0
+        self.refreshed_at = 0.0
+        self.queries = 0
+        self.cells_visited = 0
+        # Soronként: a cellaközéppont szélességének sin/cos értéke és a cella szögsugara (középpont -> legtávolabbi sarok)
+        self._row_geometry = []
+        for row in range(self.rows):
+            low, high = math.radians(row * self.cell - 90), math.radians(min((row + 1) * self.cell, 180) - 90)
+            center = (low + high) / 2
+            half_lon = math.radians(self.cell / 2)
+            radius = max(
+                math.acos(max(-1.0, min(1.0, math.sin(center) * math.sin(edge) + math.cos(center) * math.cos(edge) * math.cos(half_lon))))
+                for edge in (low, high)
+            )
+            self._row_geometry.append((math.sin(center), math.cos(center), radius, low, high))
+
+    def _cell_of(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        row = min(int((latitude + 90) // self.cell), self.rows - 1)
+        col = int(((longitude + 180) % 360) // self.cell) % self.cols
+        return row, col
+
+    def load(self, db: Session) -> int:
+        """Teljes betöltés az adatbázisból (induláskor)."""
+        rows = db.execute(select(models.City.id, models.City.city_name, models.City.latitude, models.City.longitude)).all()
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._put(*row)
+            self.loaded = True
+            self.refreshed_at = time.monotonic()
+        return len(rows)
+
+    def needs_refresh(self, interval: float = CITY_INDEX_REFRESH_SECONDS) -> bool:
+        return interval > 0 and time.monotonic() - self.refreshed_at >= interval
+
+    def refresh(self, db: Session) -> int:
+        """Csak a legnagyobb ismert azonosító utáni (más folyamat által felvett) városok betöltése.
+
+        A meglévő városok koordinátáinak másik workerben történt módosítását nem látja; azt a teljes load() veszi át.
+        """
+        rows = db.execute(
+            select(models.City.id, models.City.city_name, models.City.latitude, models.City.longitude).where(models.City.id > self.max_id)
+        ).all()
+        with self._lock:
+            for row in rows:
+                self._put(*row)
+            self.refreshed_at = time.monotonic()
+        return len(rows)
+
+    def add(self, cities: Iterable):
+        """Új vagy módosított városok (ORM objektum vagy id, city_name, latitude, longitude sor) felvétele."""
+        with self._lock:
+            for city in cities:
+                self._put(city.id, city.city_name, city.latitude, city.longitude)
+
+    def _put(self, city_id: int, city_name: str, latitude, longitude):
+        previous = self._where.pop(city_id, None)
+        if previous is not None:
+            cell = self._cells[previous]
+            del cell[city_id]
+            if not cell:
+                del self._cells[previous]
+                cols = self._row_cols[previous[0]]
+                del cols[bisect.bisect_left(cols, previous[1])]
+        if latitude is None or longitude is None:
+            return
+        key = self._cell_of(latitude, longitude)
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = {}
+            bisect.insort(self._row_cols.setdefault(key[0], []), key[1])
+        cell[city_id] = IndexedCity(city_id, city_name, latitude, longitude, *unit_vector(latitude, longitude))
+        self._where[city_id] = key
+        self.max_id = max(self.max_id, city_id)
+
+    def _reset(self):
+        self._cells.clear()
+        self._row_cols.clear()
+        self._where.clear()
+        self.max_id = 0
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.loaded = False
+
+    def nearest(self, latitude: float, longitude: float, k: int = 5) -> List[Tuple[IndexedCity, float]]:
+        """A k legközelebbi város (város, távolság km) párokban, növekvő távolság szerint."""
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("A lat -90 és 90, a lon -180 és 180 közé essen.")
+        if not 1 <= k <= CITY_NEAREST_MAX_K:
+            raise ValueError(f"A k 1 és {CITY_NEAREST_MAX_K} közé essen.")
+        qx, qy, qz = unit_vector(latitude, longitude)
+        best: List[Tuple[float, int, IndexedCity]] = []  # min-kupac: best[0] a megtartottak közül a legtávolabbi
+
+        def consider(cities):
+            for city in cities:
+                dot = city.x * qx + city.y * qy + city.z * qz
+                if len(best) < k:
+                    heapq.heappush(best, (dot, city.id, city))
+                elif dot > best[0][0]:
+                    heapq.heapreplace(best, (dot, city.id, city))
+
+        with self._lock:
+            self.queries += 1
+            if len(self._where) <= BRUTE_FORCE_LIMIT:
+                for cell in self._cells.values():
+                    consider(cell.values())
+            else:
+                self._search(latitude, longitude, k, best, consider)
+        return [(city, dot_to_km(dot)) for dot, _, city in sorted(best, reverse=True)]
+
+    def _search(self, latitude: float, longitude: float, k: int, best: list, consider):
+        q_row, q_col = self._cell_of(latitude, longitude)
+        q_lat = math.radians(latitude)
+        sin_q, cos_q = math.sin(q_lat), math.cos(q_lat)
+        # Kupacelemek: (alsó becslés radiánban, sorszám, sor, front iránya, index a sor oszloplistájában)
+        # irány 0: még meg nem nyitott sor (a becslés a szélességi rés), +1/-1: keleti/nyugati front
+        frontier = [(0.0, 0, q_row, 0, 0)]
+        seq = 1
+        taken: Dict[int, int] = {}
+
+        def row_gap(row):
+            _, _, _, low, high = self._row_geometry[row]
+            return max(0.0, low - q_lat, q_lat - high)
+
+        def cell_bound(row, col, gap):
+            sin_c, cos_c, radius, _, _ = self._row_geometry[row]
+            d_lon = math.radians((col + 0.5) * self.cell - 180 - longitude)
+            center = math.acos(max(-1.0, min(1.0, sin_q * sin_c + cos_q * cos_c * math.cos(d_lon))))
+            return max(gap, center - radius)
+
+        while frontier:
+            bound, _, row, step, index = heapq.heappop(frontier)
+            if len(best) == k and bound >= math.acos(max(-1.0, min(1.0, best[0][0]))):
+                break
+            if step == 0:
+                # Sor megnyitása: a két front indul a lekérdezés oszlopától, és a szomszédos sor is sorra kerül
+                for neighbour in ((row - 1, row + 1) if row == q_row else (row + (1 if row > q_row else -1),)):
+                    if 0 <= neighbour < self.rows:
+                        heapq.heappush(frontier, (row_gap(neighbour), seq, neighbour, 0, 0))
+                        seq += 1
+                cols = self._row_cols.get(row)
+                if not cols:
+                    continue
+                taken[row] = 0
+                start = bisect.bisect_left(cols, q_col) % len(cols)
+                gap = row_gap(row)
+                heapq.heappush(frontier, (cell_bound(row, cols[start], gap), seq, row, 1, start))
+                if len(cols) > 1:
+                    west = (start - 1) % len(cols)
+                    heapq.heappush(frontier, (cell_bound(row, cols[west], gap), seq + 1, row, -1, west))
+                seq += 2
+                continue
+
+            cols = self._row_cols[row]
+            if taken[row] == len(cols):
+                continue  # a két front találkozott, ezt a cellát a másik már feldolgozta
+            taken[row] += 1
+            self.cells_visited += 1
+            consider(self._cells[(row, cols[index])].values())
+            if taken[row] < len(cols):
+                nxt = (index + step) % len(cols)
+                heapq.heappush(frontier, (cell_bound(row, cols[nxt], row_gap(row)), seq, row, step, nxt))
+                seq += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "cities": len(self._where),
+                "cells": len(self._cells),
+                "cell_degrees": self.cell,
+                "queries": self.queries,
+                "cells_visited": self.cells_visited,
+            }
+
+
+# Folyamaton belüli, megosztott példány
+city_index = CityIndex()
@@ -0,0 +1,345 @@
+import math
+import os
+import threading
+from array import array
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+# Városonként ennyi legutóbbi mérés marad memóriában (30 perces frissítésnél 96 = 2 nap); 0 kikapcsolja
+HOT_STORE_SIZE = int(os.getenv("HOT_STORE_SIZE", 96))
+
+# Oszloponként egy tömb: a WeatherBase float mezői 'd', az egész mezői 'q' típuskóddal
+COLUMN_TYPES = {
+    name: "d" if field.annotation is float else "q"
+    for name, field in schemas.WeatherBase.model_fields.items()
+}
+# A mezők sorrendje megegyezik a WeatherResponse JSON kimenetével
+HotRecord = namedtuple("HotRecord", (*COLUMN_TYPES, "id", "city_id", "timestamp"))
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value: datetime) -> int:
+    """Naiv UTC időbélyeg mikroszekundumban (időzónás érték esetén előbb UTC-re alakítjuk)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+class CityRing:
+    """Egy város legutóbbi méréseinek rögzített méretű, oszlopos gyűrűpuffere időrendben.
+
+    A complete jelzi, hogy a város összes mérése benne van; ha már kiszorult belőle régebbi sor,
+    csak a legrégebbi tárolt időbélyegnél későbbi időtartományokat szolgálhatja ki.
+    """
+
+    __slots__ = ("capacity", "start", "size", "complete", "ids", "timestamps", "columns")
+
+    def __init__(self, capacity: int, complete: bool = True):
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.complete = complete
+        self.ids = array("q", [0]) * capacity
+        self.timestamps = array("q", [0]) * capacity
+        self.columns = {name: array(code, [0]) * capacity for name, code in COLUMN_TYPES.items()}
+
+    def _pos(self, index: int) -> int:
+        return (self.start + index) % self.capacity
+
+    def key(self, index: int) -> Tuple[int, int]:
+        pos = self._pos(index)
+        return self.timestamps[pos], self.ids[pos]
+
+    def append(self, record_id: int, micros: int, values: Sequence):
+        """Új mérés a végére; időrenden kívüli (utólag betöltött) mérésnél a puffert újrarendezzük."""
+        if self.size and (micros, record_id) < self.key(self.size - 1):
+            self._insert_sorted(record_id, micros, values)
+            return
+        if self.size == self.capacity:
+            pos = self.start
+            self.start = (self.start + 1) % self.capacity
+            self.complete = False
+        else:
+            pos = self._pos(self.size)
+            self.size += 1
+        self.ids[pos] = record_id
+        self.timestamps[pos] = micros
+        for column, value in zip(self.columns.values(), values):
+            column[pos] = value
+
+    def _insert_sorted(self, record_id: int, micros: int, values: Sequence):
+        if not self.complete and (micros, record_id) < self.key(0):
+            # A tárolt ablaknál régebbi mérés: előtte kiszorult sorok is lehetnek, ezért nem vesszük fel
+            return
+        rows = [(*self.key(i), self.values(i)) for i in range(self.size)]
+        rows.append((micros, record_id, tuple(values)))
+        rows.sort(key=lambda row: row[:2])
+        if len(rows) > self.capacity:
+            self.complete = False
+            rows = rows[-self.capacity:]
+        self.start, self.size = 0, 0
+        for row_micros, row_id, row_values in rows:
+            self.append(row_id, row_micros, row_values)
+
+    def drop_before(self, micros: int):
+        """A micros előtti mérések eldobása (a nyers adatok törlése után)."""
+        count = self._lower_bound(micros)
+        if count == 0:
+            return
+        # Ha a kiszorult sorok mind a határ előtt voltak, azok az adatbázisból is törlődtek
+        if not self.complete and micros > self.key(0)[0]:
+            self.complete = True
+        self.start = self._pos(count)
+        self.size -= count
+
+    def values(self, index: int) -> Tuple:
+        pos = self._pos(index)
+        return tuple(column[pos] for column in self.columns.values())
+
+    def column(self, name: str, indexes: Iterable[int]) -> List:
+        column = self.columns[name]
+        return [column[self._pos(i)] for i in indexes]
+
+    def record(self, index: int, city_id: int) -> "HotRecord":
+        micros, record_id = self.key(index)
+        return HotRecord(*self.values(index), record_id, city_id, from_micros(micros))
+
+    def contains(self, record_id: int) -> bool:
+        return any(self.ids[self._pos(i)] == record_id for i in range(self.size))
+
+    def covers(self, start_micros: Optional[int]) -> bool:
+        """Igaz, ha a [start, ...) tartomány minden mérése a pufferben van."""
+        if self.complete:
+            return True
+        return start_micros is not None and self.size > 0 and start_micros > self.key(0)[0]
+
+    def window(self, start_micros: Optional[int], end_micros: Optional[int]) -> range:
+        """A [start, end) időtartományba eső logikai indexek (a sor időrendben rendezett, bináris kereséssel)."""
+        return range(
+            self._lower_bound(start_micros) if start_micros is not None else 0,
+            self._lower_bound(end_micros) if end_micros is not None else self.size,
+        )
+
+    def _lower_bound(self, micros: int) -> int:
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[self._pos(mid)] < micros:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def nbytes(self) -> int:
+        arrays = (self.ids, self.timestamps, *self.columns.values())
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+class HotStore:
+    """Folyamaton belüli, városonkénti gyűrűpufferek a legfrissebb mérésekhez.
+
+    Induláskor az adatbázisból töltődik fel, utána minden sikeres mentés hozzáfűzi az új sorokat.
+    Az olvasó metódusok None-t adnak vissza, ha a kérés nem szolgálható ki teljes egészében
+    a memóriából; ilyenkor a hívó az adatbázishoz fordul.
+    """
+
+    def __init__(self, capacity: int = HOT_STORE_SIZE):
+        self.capacity = capacity
+        self._rings: Dict[int, CityRing] = {}
+        self._lock = threading.Lock()
+        # Betöltés közben érkező mentések; a betöltés végén visszajátsszuk őket
+        self._pending: Optional[List[Tuple]] = None
+        # Hiányzó (NULL) mezőt tartalmazó városok: ezeket mindig az adatbázis szolgálja ki
+        self._bypass: set = set()
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def load(self, db: Session):
+        """Városonként a legutóbbi capacity darab mérés betöltése egyetlen ablakfüggvényes lekérdezéssel."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending = []
+
+        rings = {city_id: CityRing(self.capacity) for city_id in db.scalars(select(models.City.id))}
+        columns = [getattr(models.WeatherData, name) for name in COLUMN_TYPES]
+        ranked = select(
+            models.WeatherData.id, models.WeatherData.city_id, models.WeatherData.timestamp, *columns,
+            func.row_number().over(
+                partition_by=models.WeatherData.city_id,
+                order_by=(models.WeatherData.timestamp.desc(), models.WeatherData.id.desc()),
+            ).label("rn"),
+        ).subquery()
+        # Egy sorral többet kérünk: ha az is megjön, a városnak van a pufferen kívül eső, régebbi mérése
+        stmt = select(ranked).where(ranked.c.rn <= self.capacity + 1).order_by(ranked.c.city_id, ranked.c.rn.desc())
+        bypass = set()
+        for record_id, city_id, timestamp, *values, rn in db.execute(stmt):
+            ring = rings.setdefault(city_id, CityRing(self.capacity))
+            if rn > self.capacity:
+                ring.complete = False
+            elif timestamp is None or None in values:
+                bypass.add(city_id)
+            else:
+                ring.append(record_id, to_micros(timestamp), values)
+
+        with self._lock:
+            self._rings = {city_id: ring for city_id, ring in rings.items() if city_id not in bypass}
+            self._bypass = bypass
+            pending, self._pending = self._pending, None
+            self.loaded = True
+            for row in pending:
+                self._append_row(row, deduplicate=True)
+
+    def clear(self):
+        with self._lock:
+            self._rings = {}
+            self._bypass = set()
+            self._pending = None
+            self.loaded = False
+
+    def append(self, records: Iterable[models.WeatherData]):
+        """Frissen mentett (commitolt) mérések hozzáfűzése."""
+        if not self.enabled:
+            return
+        rows = [(r.city_id, r.id, r.timestamp, tuple(getattr(r, name) for name in COLUMN_TYPES)) for r in records]
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(rows)
+            elif self.loaded:
+                for row in rows:
+                    self._append_row(row)
+
+    def _append_row(self, row: Tuple, deduplicate: bool = False):
+        city_id, record_id, timestamp, values = row
+        if city_id in self._bypass:
+            return
+        if timestamp is None or None in values:
+            self._bypass.add(city_id)
+            self._rings.pop(city_id, None)
+            return
+        ring = self._rings.get(city_id)
+        if ring is None:
+            # Betöltés után létrehozott város: minden mérése ezen az úton érkezik
+            ring = self._rings[city_id] = CityRing(self.capacity)
+        if deduplicate and ring.contains(record_id):
+            return
+        ring.append(record_id, to_micros(timestamp), values)
+
+    def drop_before(self, timestamp: datetime):
+        """A megőrzési idő lejárta miatt törölt mérések eltávolítása minden városból."""
+        micros = to_micros(timestamp)
+        with self._lock:
+            for ring in self._rings.values():
+                ring.drop_before(micros)
+
+    def _ring_for(self, city_id: Optional[int], start_micros: Optional[int]) -> Optional[CityRing]:
+        ring = self._rings.get(city_id) if self.loaded and city_id is not None else None
+        if ring is None or not ring.covers(start_micros):
+            return None
+        return ring
+
+    def history(
+        self,
+        city_id: Optional[int],
+        limit: int = 20,
+        before: Optional[Tuple[datetime, int]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Optional[List[HotRecord]]:
+        """A services.get_history memóriabeli megfelelője: (timestamp, id) szerint csökkenő sorrend."""
+        if limit <= 0:
+            return None
+        start_micros = to_micros(start) if start is not None else None
+        end_micros = to_micros(end) if end is not None else None
+        before_key = (to_micros(before[0]), before[1]) if before is not None else None
+
+        with self._lock:
+            ring = self._rings.get(city_id) if self.loaded and city_id is not None else None
+            if ring is None:
+                self.misses += 1
+                return None
+            indexes = []
+            for index in reversed(ring.window(start_micros, end_micros)):
+                if before_key is not None and ring.key(index) >= before_key:
+                    continue
+                indexes.append(index)
+                if len(indexes) == limit:
+                    break
+            else:
+                # Elfogyott a puffer: csak akkor teljes a válasz, ha régebbi sor sem eshet a tartományba
+                if not ring.covers(start_micros):
+                    self.misses += 1
+                    return None
+            self.hits += 1
+            return [ring.record(index, city_id) for index in indexes]
+
+    def weather_stats(
+        self,
+        city_id: Optional[int],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        metrics: Dict[str, str],
+        percentiles: Sequence[int] = (),
+    ) -> Optional[Dict]:
+        """A services.get_weather_stats csoportosítás nélküli változata ugyanazokkal a kulcsokkal és kerekítéssel.
+
+        A metrics a mezőnevet a válaszkulcsban használt rövid névre képezi le (lásd services.STAT_METRICS).
+        """
+        start_micros = to_micros(start) if start is not None else None
+        end_micros = to_micros(end) if end is not None else None
+
+        with self._lock:
+            ring = self._ring_for(city_id, start_micros)
+            if ring is None:
+                self.misses += 1
+                return None
+            window = ring.window(start_micros, end_micros)
+            samples = {metric: ring.column(metric, window) for metric in metrics}
+            self.hits += 1
+
+        stats = {"count": len(window)}
+        for metric, alias in metrics.items():
+            values = samples[metric]
+            stats[f"avg_{alias}"] = round(math.fsum(values) / len(values), 2) if values else 0
+            stats[f"max_{alias}"] = max(values, default=0)
+            stats[f"min_{alias}"] = min(values, default=0)
+            ordered = sorted(values)
+            for p in percentiles:
+                # Legközelebbi rang: ceil(n * p / 100), mint az SQL oldali számításnál
+                stats[f"p{p}_{alias}"] = ordered[(len(ordered) * p + 99) // 100 - 1] if ordered else 0
+        return stats
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "loaded": self.loaded,
+                "capacity_per_city": self.capacity,
+                "cities": len(self._rings),
+                "rows": sum(ring.size for ring in self._rings.values()),
+                "complete_cities": sum(ring.complete for ring in self._rings.values()),
+                "bytes": sum(ring.nbytes() for ring in self._rings.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Folyamaton belüli, megosztott példány
+hot_store = HotStore()
@@ -1,10 +1,15 @@
-import asyncio
-import os
+import json
 import logging
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from . import models, schemas, database, services
-from .database import engine, get_db
+from datetime import datetime
+from typing import Optional, Union
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import analytics, cache, city_import, export, forecast, geo, hotstore, metrics, models, pubsub, retention, rollups, schemas, database, serialization, services, upstream
+from .database import engine, get_async_db, get_async_session_factory
+from .scheduler import WeatherScheduler
 from dotenv import load_dotenv
 
 load_dotenv() # .env fájl betöltése
@@ -12,10 +17,21 @@ load_dotenv() # .env fájl betöltése
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Adatbázis táblák létrehozása
-models.Base.metadata.create_all(bind=engine)
-
 app = FastAPI(title="Időjárás Figyelő API")
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+# Háttérben futó, városonként ütemezett frissítés (több worker esetén csak a bérlet birtokosa dolgozik)
+scheduler = WeatherScheduler()
+# Lejárt nyers mérések tömörítése; több worker közül csak az ütemező bérletének birtokosa futtatja
+retention_job = retention.RetentionJob(database.SessionLocal, should_run=lambda: scheduler.is_leader)
+forecast_refresher = forecast.ForecastRefresher(database.SessionLocal, should_run=lambda: scheduler.is_leader)
+
+# A lista végpontok sima oszlop-tuple-öket kódolnak közvetlenül JSON-ná (serialization modul, ORM és Pydantic
+# validálás nélkül); a response_model a dokumentált szerződés marad, a tesztek ehhez mérik a kimenetet
+
+
+def json_bytes(data) -> bytes:
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 
 @app.get("/")
@@ -25,107 +41,559 @@ def read_root():
 
 
 @app.post("/weather/update", response_model=schemas.WeatherResponse)
-async def update_weather(city_name: str = "Budapest", db: Session = Depends(get_db)):
-    """Manuális frissítést indít egy adott városra: lekéri az API-tól és elmenti az adatbázisba."""
+async def update_weather(city_name: str = "Budapest", db: AsyncSession = Depends(get_async_db)):
+    """Manuális frissítést indít egy adott városra: lekéri az API-tól és elmenti az adatbázisba.
+
+    Az egyidejű kérések egy upstream lekérést osztanak meg; ha az upstream mérés (observed_at) már tárolva van,
+    új sor helyett a meglévőt adja vissza.
+    """
     # Megkeressük a várost az adatbázisban
-    db_city = db.query(models.City).filter(models.City.city_name == city_name).first()
+    db_city = await services.get_city_by_name_async(db, city_name)
     if not db_city:
         # Ha nincs meg a város, megpróbáljuk alapértelmezett koordinátákkal felvenni (példa)
         raise HTTPException(status_code=404, detail=f"A(z) {city_name} város nem szerepel a listában.")
     
-    data = await services.fetch_weather_data(db_city)
+    try:
+        data = await services.fetch_weather_data(db_city)
+    except services.RateLimitedError as e:
+        raise HTTPException(status_code=429, detail="Az upstream API korlátozza a kéréseket.", headers={"Retry-After": str(int(e.retry_after))})
     if not data:
         raise HTTPException(status_code=500, detail="Sikertelen API lekérés.")
 
-    return services.save_weather(db, schemas.WeatherCreate(**data))
+    return await services.save_weather_async(db, schemas.WeatherCreate(**data))
+
+@app.get("/weather/history", response_model=Union[list[schemas.WeatherResponse], schemas.WeatherColumns])
+async def read_history(
+    request: Request,
+    city_id: int = None,
+    limit: int = 20,
+    before: Optional[str] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    layout: str = "rows",
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Visszaadja az időjárási mérési előzményeket, opcionálisan városra és időtartományra szűrve.
+
+    Lapozáshoz a válasz X-Next-Cursor fejlécét kell a következő kérés before paraméterébe tenni.
+    A layout=columns tömör, oszlopos formát ad ({"timestamp": [...], "temperature": [...], ...}).
+    """
+    try:
+        cursor = services.decode_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Érvénytelen lapozási kurzor.")
+    if layout not in serialization.LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen elrendezés: {layout}")
 
-@app.get("/weather/history", response_model=list[schemas.WeatherResponse])
-def read_history(city_id: int = None, limit: int = 20, db: Session = Depends(get_db)):
-    """Visszaadja az időjárási mérési előzményeket, opcionálisan városra szűrve."""
-    query = db.query(models.WeatherData)
-    if city_id:
-        query = query.filter(models.WeatherData.city_id == city_id)
-    return query.order_by(models.WeatherData.timestamp.desc()).limit(limit).all()
+    async def produce():
+        # A legfrissebb mérések a memóriabeli tárból, a többi sima oszlopsorként az adatbázisból jön
+        records = hotstore.hot_store.history(city_id, limit=limit, before=cursor, start=start, end=end)
+        if records is None:
+            records = await services.get_history_rows_async(db, city_id=city_id, limit=limit, before=cursor, start=start, end=end)
+        with metrics.timer("history_serialize"):
+            body = serialization.encode(records, serialization.WEATHER_FIELDS, layout)
+        headers = {}
+        if records and len(records) == limit:
+            headers["X-Next-Cursor"] = services.encode_cursor(records[-1])
+        return body, headers
+
+    return await cache.cached_response(request, cache.tags_for(city_id), produce)
 
 
 @app.get("/weather/stats")
-def get_stats(city_id: int = None, db: Session = Depends(get_db)):
-    """Statisztikai számításokat (átlag, max, min hőmérséklet) végez a mért adatokon."""
-    # Lekérdezés alapja
-    query = db.query(models.WeatherData)
-    
-    # Ha van megadva city_id, szűrünk rá
-    if city_id:
-        query = query.filter(models.WeatherData.city_id == city_id)
-    
-    history = query.all()
-    
-    if not history:
-        return {"avg_temp": 0, "count": 0, "max_temp": 0, "min_temp": 0}
+async def get_stats(
+    request: Request,
+    city_id: int = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    metric_list: str = Query("temperature", alias="metrics"),
+    percentiles: str = "",
+    group_by: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Statisztikai számításokat (átlag, max, min, percentilisek) végez a mért adatokon, az adatbázisban aggregálva.
+
+    A metrics és percentiles vesszővel elválasztott listák (pl. metrics=temperature,humidity&percentiles=50,90),
+    a group_by=city|hour|day pedig egy hívásban adja vissza az összes csoport statisztikáját.
+    """
+    async def produce():
+        try:
+            stats = await services.get_weather_stats_async(
+                db,
+                city_id=city_id,
+                start=start,
+                end=end,
+                metrics=[m.strip() for m in metric_list.split(",") if m.strip()],
+                percentiles=[int(p) for p in percentiles.split(",") if p.strip()],
+                group_by=group_by,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if group_by:
+            stats = {"group_by": group_by, "groups": stats}
+        return json_bytes(stats), {}
+
+    return await cache.cached_response(request, cache.tags_for(city_id), produce)
+
+
+@app.get("/weather/series")
+async def get_series(
+    request: Request,
+    city_id: int,
+    metric: str = "temperature",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    max_points: int = rollups.DEFAULT_MAX_POINTS,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Diagramhoz való idősor: a felbontást (nyers / órás / napi) a kért időtartam és a max_points keret alapján választja."""
+    async def produce():
+        try:
+            series = await db.run_sync(
+                lambda session: rollups.get_series(session, city_id, metric=metric, start=start, end=end, max_points=max_points)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return json_bytes(series), {}
+
+    return await cache.cached_response(request, cache.tags_for(city_id), produce)
+
+
+@app.get("/weather/forecast")
+async def weather_forecast(city_id: int, hours: int = 48, layout: str = "rows", db: AsyncSession = Depends(get_async_db)):
+    """Órás előrejelzés a következő hours órára (az aktuális órától).
+
+    A háttérben futó frissítő modellfuttatásonként egyszer, kötegelten kéri le az összes várost; a kérés
+    a folyamat memóriájából, hiány esetén egyetlen adatbázis-olvasással szolgálódik ki, upstream hívás nélkül.
+    """
+    if layout not in serialization.LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen elrendezés: {layout}")
+    if not 1 <= hours <= forecast.FORECAST_DAYS * 24:
+        raise HTTPException(status_code=400, detail=f"A hours 1 és {forecast.FORECAST_DAYS * 24} közé essen.")
+    entry = forecast.cached_forecast(city_id) or await db.run_sync(forecast.load_forecast, city_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Ehhez a városhoz még nincs előrejelzés.")
+    columns = forecast.forecast_payload(entry, hours)
+    series = columns if layout == "columns" else serialization.rows_payload(zip(*columns.values()), tuple(columns))
+    body = {"city_id": city_id, "model_run": entry.model_run, "interval_seconds": entry.interval_seconds, "forecast": series}
+    return Response(serialization.dumps(body), media_type="application/json")
+
+
+@app.get("/weather/export")
+async def export_weather(
+    format: str = "ndjson",
+    city_id: int = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    session_factory=Depends(get_async_session_factory),
+):
+    """Tömeges export streamelve (NDJSON, CSV, illetve pyarrow esetén Arrow IPC / Parquet).
+
+    Szerveroldali kurzorral, kötegenként olvas és küld, így a memóriahasználat a sorok számától független.
+    """
+    if format not in export.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen formátum: {format}")
+    if format in ("parquet", "arrow") and not export.PYARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Az Arrow/Parquet exporthoz a pyarrow csomag szükséges.")
+
+    filename = f"weather_history{f'_{city_id}' if city_id else ''}.{format}"
+    return StreamingResponse(
+        export.stream_export(session_factory, format, city_id=city_id, start=start, end=end),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/weather/stream")
+async def stream_weather(city_ids: str = ""):
+    """Élő frissítések Server-Sent Events folyamként: minden új mérés egy weather esemény (a WeatherResponse JSON-ja).
+
+    A city_ids vesszővel elválasztott lista (üresen az összes város). Ha a kliens lemarad, a legrégebbi eseményeket
+    eldobjuk, és egy dropped esemény jelzi, hogy az előzményeket újra kell tölteni.
+    """
+    try:
+        ids = [int(i) for i in city_ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="A city_ids egész számok vesszővel elválasztott listája legyen.")
+    events = pubsub.broker.stream(ids)
+    try:
+        # Az első sor lekérése foglalja le a helyet; a már elindult generátor bontáskor biztosan leiratkozik
+        first = await events.__anext__()
+    except pubsub.SubscriberLimitError:
+        raise HTTPException(status_code=503, detail="Túl sok élő kapcsolat.", headers={"Retry-After": str(pubsub.STREAM_RETRY_MS // 1000)})
+    return StreamingResponse(
+        pubsub.prepend(first, events),
+        media_type="text/event-stream",
+        # A proxyk (pl. nginx) ne pufferelják a folyamot
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    #list comprehension
-    temps = [w.temperature for w in history]
-    
-    return {
-        "avg_temp": round(sum(temps) / len(temps), 2),
-        "count": len(history),
-        "max_temp": max(temps),
-        "min_temp": min(temps)
-    }
+
+async def analytics_response(request: Request, db: AsyncSession, tags, compute):
+    """Közös keret az /analytics végpontokhoz: gyorsítótár, a számítás a session szinkron oldalán, ValueError -> 400."""
+    async def produce():
+        try:
+            result = await db.run_sync(compute)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return json_bytes(result), {}
+
+    return await cache.cached_response(request, tags, produce)
+
+
+@app.get("/analytics/trend")
+async def get_trend(
+    request: Request,
+    city_id: int,
+    metric: str = "temperature",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    window_hours: float = 24,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Mozgóátlag minden mérésre, napi átlagok és napról napra változás (alapból az utolsó 7 napra)."""
+    return await analytics_response(
+        request, db, cache.tags_for(city_id),
+        lambda session: analytics.trend(session, city_id, metric=metric, start=start, end=end, window_hours=window_hours),
+    )
+
+
+@app.get("/analytics/anomalies")
+async def get_anomalies(
+    request: Request,
+    city_id: int = None,
+    metric: str = "temperature",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    baseline_hours: float = 168,
+    threshold: float = 3.0,
+    min_samples: int = 24,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Kiugró mérések (z-score a város előző baseline_hours órájához képest); city_id nélkül az összes városra egyszerre."""
+    return await analytics_response(
+        request, db, cache.tags_for(city_id),
+        lambda session: analytics.anomalies(
+            session, metric=metric, city_id=city_id, start=start, end=end,
+            baseline_hours=baseline_hours, threshold=threshold, min_samples=min_samples, limit=limit,
+        ),
+    )
+
+
+@app.get("/analytics/correlation")
+async def get_correlation(
+    request: Request,
+    city_ids: str,
+    metric: str = "temperature",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    min_overlap: int = 24,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Városok közti korrelációs mátrix órás átlagokon; a city_ids vesszővel elválasztott lista (pl. city_ids=1,2,3)."""
+    try:
+        ids = [int(i) for i in city_ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="A city_ids egész számok vesszővel elválasztott listája legyen.")
+    return await analytics_response(
+        request, db, [cache.city_tag(i) for i in set(ids)],
+        lambda session: analytics.correlation(session, ids, metric=metric, start=start, end=end, min_overlap=min_overlap),
+    )
+
+
+@app.get("/analytics/ranking")
+async def get_ranking(
+    request: Request,
+    metric: str = "temperature",
+    limit: int = 10,
+    order: str = "desc",
+    max_age_hours: float = 3,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Az összes város legfrissebb mérésének rangsora (pl. metric=wind_speed: a legszelesebb városok)."""
+    return await analytics_response(
+        request, db, cache.tags_for(None),
+        lambda session: analytics.ranking(session, metric=metric, limit=limit, order=order, max_age_hours=max_age_hours),
+    )
+
+
+@app.get("/dashboard", response_model=schemas.DashboardResponse)
+async def read_dashboard(
+    request: Request, city_id: int = None, limit: int = 20, layout: str = "rows", db: AsyncSession = Depends(get_async_db)
+):
+    """A frontend egy hívásban kapja meg a városlistát, a kiválasztott város statisztikáját és előzményeit.
+
+    city_id nélkül az első város adatait adja vissza (a válasz city_id mezője mutatja, melyikét).
+    A layout=columns az előzményeket oszlopos formában adja (lásd /weather/history).
+    """
+    if layout not in serialization.LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen elrendezés: {layout}")
+
+    async def produce():
+        dashboard = await services.get_dashboard_async(db, city_id=city_id, limit=limit)
+        with metrics.timer("dashboard_serialize"):
+            dashboard["cities"] = serialization.rows_payload(dashboard["cities"], serialization.CITY_FIELDS)
+            dashboard["history"] = serialization.payload(dashboard["history"], serialization.WEATHER_FIELDS, layout)
+            return serialization.dumps(dashboard), {}
+
+    tags = (cache.CITY_LIST_TAG, *cache.tags_for(city_id))
+    return await cache.cached_response(request, tags, produce)
 
 
 @app.post("/cities", response_model=schemas.CityResponse)
-def add_city(city: schemas.CityCreate, db: Session = Depends(get_db)):
-    return services.create_city(db, city)
+async def add_city(city: schemas.CityCreate, db: AsyncSession = Depends(get_async_db)):
+    return await services.create_city_async(db, city)
+
+@app.post("/cities/import")
+async def import_cities(request: Request, format: str = "csv", db: AsyncSession = Depends(get_async_db)):
+    """Tömeges városimport (csv fejléccel, ndjson vagy geonames dump) a törzs folyamatos olvasásával.
+
+    A városok név szerint upsertelődnek egyetlen tranzakcióban; bármely hibás sor esetén semmi sem íródik ki.
+    """
+    if format not in city_import.IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen formátum: {format}")
+    parser = city_import.CityParser(format)
+    try:
+        async for chunk in request.stream():
+            parser.feed(chunk)
+        cities = parser.close()
+    except city_import.CityImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await db.run_sync(city_import.import_cities, cities)
+
+@app.get("/cities/nearest")
+async def nearest_cities(lat: float, lon: float, k: int = 5, db: AsyncSession = Depends(get_async_db)):
+    """A ponthoz legközelebbi k város a memóriabeli térbeli indexből, gömbi távolsággal (km)."""
+    if not geo.city_index.loaded:
+        await db.run_sync(geo.city_index.load)
+    elif geo.city_index.needs_refresh():
+        await db.run_sync(geo.city_index.refresh)
+    try:
+        found = geo.city_index.nearest(lat, lon, k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    body = [
+        {"id": city.id, "city_name": city.city_name, "latitude": city.latitude, "longitude": city.longitude, "distance_km": round(km, 3)}
+        for city, km in found
+    ]
+    return Response(serialization.dumps(body), media_type="application/json")
 
 @app.get("/cities", response_model=list[schemas.CityResponse])
-def list_cities(db: Session = Depends(get_db)):
-    return services.get_cities(db)
+async def list_cities(request: Request, layout: str = "rows", db: AsyncSession = Depends(get_async_db)):
+    if layout not in serialization.LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen elrendezés: {layout}")
+
+    async def produce():
+        cities = await services.get_city_rows_async(db)
+        with metrics.timer("cities_serialize"):
+            return serialization.encode(cities, serialization.CITY_FIELDS, layout), {}
+
+    return await cache.cached_response(request, (cache.CITY_LIST_TAG,), produce)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """A válasz-gyorsítótár számlálói (találat, hiány, kiszorítás, érvénytelenítés)."""
+    return cache.response_cache.stats()
+
+
+@app.get("/cities/index/stats")
+def city_index_stats():
+    """A térbeli városindex mérete (városok, foglalt cellák) és lekérdezésszámlálói."""
+    return geo.city_index.stats()
+
+
+@app.get("/hotstore/stats")
+def hotstore_stats():
+    """A memóriabeli tár mérete (városok, sorok, bájtok) és találati aránya."""
+    return hotstore.hot_store.stats()
+
+
+@app.get("/stream/stats")
+def stream_stats():
+    """Az élő frissítések állapota: feliratkozók, kiküldött és (lassú kliens miatt) eldobott események."""
+    return pubsub.broker.stats()
+
+
+@app.get("/scheduler/status")
+def scheduler_status():
+    """Az ütemező állapota: vezető-e ez a worker, sorhossz (esedékes városok), késés, visszalépő városok."""
+    return scheduler.status()
+
+
+@app.get("/retention/status")
+def retention_status():
+    """A megőrzési szabály és a legutóbbi tömörítés eredménye (törölt sorok, archív fájlok, visszaadott lapok)."""
+    return retention_job.status()
+
+
+@app.get("/forecast/status")
+def forecast_status():
+    """Az előrejelzés-frissítő állapota (várt és legutóbbi modellfuttatás, utolsó kör) és a gyorsítótár számlálói."""
+    return forecast_refresher.status()
+
+
+@app.get("/upstream/stats")
+def upstream_stats():
+    """A megosztott upstream kapcsolatkészlet állapota (nyitott kapcsolatok, várakozók, késleltetés-hisztogram) és a manuális frissítések gyorsítótára."""
+    client = upstream.current()
+    if client is None:
+        raise HTTPException(status_code=503, detail="Az upstream kliens még nem indult el.")
+    return {**client.stats(), "current_weather_cache": services.current_weather_cache.stats()}
+
+
+@app.get("/metrics")
+def read_metrics():
+    """Prometheus szöveges formátumú mérőszámok (kérésidők, DB, upstream, ütemező, gyorsítótárak)."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="A mérőszámok gyűjtése ki van kapcsolva.")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def runtime_metrics():
+    """A lekérdezés pillanatában kiolvasott állapotok (a meglévő /…/stats végpontok adataiból)."""
+    families = []
+    status = scheduler.status()
+    families += [
+        metrics.gauge("weather_scheduler_leader", "1, ha ez a worker birtokolja az ütemező bérletét.", status["leader"]),
+        metrics.gauge("weather_scheduler_queue_depth", "Esedékes, még le nem kért városok száma.", status["queue_depth"]),
+        metrics.gauge("weather_scheduler_lag_seconds", "A legrégebben esedékes város késése.", status["lag_seconds"]),
+        metrics.gauge("weather_scheduler_backoff_cities", "Hiba miatt visszalépő (backoff) városok száma.", status["in_backoff"]),
+        metrics.counter("weather_scheduler_cycles_total", "Lefutott frissítési körök.", status["cycles"]),
+    ]
+
+    cache_stats = cache.response_cache.stats()
+    families += [
+        metrics.gauge("weather_response_cache_entries", "Bejegyzések a válasz-gyorsítótárban.", cache_stats["entries"]),
+        metrics.counter("weather_response_cache_hits_total", "Válasz-gyorsítótár találatok.", cache_stats["hits"]),
+        metrics.counter("weather_response_cache_misses_total", "Válasz-gyorsítótár hiányok.", cache_stats["misses"]),
+        metrics.counter("weather_response_cache_evictions_total", "Kiszorított bejegyzések.", cache_stats["evictions"]),
+    ]
+
+    hot_stats = hotstore.hot_store.stats()
+    families += [
+        metrics.gauge("weather_hotstore_rows", "Sorok a memóriabeli tárban.", hot_stats["rows"]),
+        metrics.gauge("weather_hotstore_bytes", "A memóriabeli tár tömbjeinek mérete.", hot_stats["bytes"]),
+        metrics.counter("weather_hotstore_hits_total", "A memóriabeli tárból kiszolgált olvasások.", hot_stats["hits"]),
+        metrics.counter("weather_hotstore_misses_total", "Az adatbázishoz továbbított olvasások.", hot_stats["misses"]),
+    ]
+
+    families.append(metrics.gauge("weather_city_index_cities", "Városok a térbeli indexben.", geo.city_index.stats()["cities"]))
+
+    forecast_stats = forecast.forecast_cache.stats()
+    families += [
+        metrics.gauge("weather_forecast_cache_entries", "Városelőrejelzések a memóriában.", forecast_stats["entries"]),
+        metrics.gauge("weather_forecast_cache_bytes", "Az előrejelzés-gyorsítótár tömbjeinek mérete.", forecast_stats["bytes"]),
+        metrics.counter("weather_forecast_cache_hits_total", "Memóriából kiszolgált előrejelzések.", forecast_stats["hits"]),
+        metrics.counter("weather_forecast_cache_misses_total", "Adatbázisból olvasott előrejelzések.", forecast_stats["misses"]),
+    ]
+
+    stream_stats = pubsub.broker.stats()
+    families += [
+        metrics.gauge("weather_stream_subscribers", "Nyitott /weather/stream kapcsolatok.", stream_stats["subscribers"]),
+        metrics.counter("weather_stream_events_total", "Kiküldésre sorba tett élő események.", stream_stats["queued"]),
+        metrics.counter("weather_stream_dropped_total", "Lassú kliens miatt eldobott élő események.", stream_stats["dropped"]),
+        metrics.counter("weather_stream_rejected_total", "Kapacitás miatt elutasított feliratkozások.", stream_stats["rejected"]),
+    ]
+
+    pool = database.engine.pool
+    if hasattr(pool, "checkedout"):
+        families.append(metrics.gauge("weather_db_pool_checked_out", "Kiadott kapcsolatok a szinkron DB készletből.", pool.checkedout()))
+
+    client = upstream.current()
+    if client is not None:
+        upstream_stats = client.stats()
+        families += [
+            metrics.gauge("weather_upstream_open_connections", "Nyitott upstream kapcsolatok.", upstream_stats["open_connections"]),
+            metrics.gauge("weather_upstream_in_flight", "Folyamatban lévő upstream kérések.", upstream_stats["in_flight"]),
+            metrics.gauge("weather_upstream_waiters", "Párhuzamossági korlátra várakozó kérések.", upstream_stats["waiters"]),
+            metrics.counter("weather_upstream_errors_total", "Hibával végződött upstream kérések.", upstream_stats["errors"]),
+            metrics.histogram("weather_upstream_request_duration_seconds", "Upstream kérések ideje.", client.latency),
+        ]
+    return families
+
+
+metrics.register_collector(runtime_metrics)
+
+
+@app.on_event("startup")
+def prepare_schema():
+    """Fejlesztői módban (SQLite) létrehozza a hiányzó táblákat, oszlopokat és indexeket.
+
+    Több workeres / PostgreSQL telepítésnél a sémát az Alembic kezeli (alembic upgrade head), itt csak ellenőrizzük.
+    """
+    if database.AUTO_CREATE_SCHEMA:
+        models.create_schema(engine)
+    elif not inspect(engine).has_table(models.WeatherData.__tablename__):
+        logger.error("Hiányzik az adatbázisséma; futtasd: alembic upgrade head")
+
+
+@app.on_event("startup")
+async def open_upstream_client():
+    await upstream.startup()
+
+
+@app.on_event("shutdown")
+async def close_upstream_client():
+    await upstream.shutdown()
+
+
+@app.on_event("startup")
+async def prepare_rollups():
+    """Ha az aggregátum táblák újak, egyszer feltöltjük őket a meglévő nyers adatokból."""
+    async with database.AsyncSessionLocal() as db:
+        if await db.run_sync(rollups.needs_rebuild):
+            await db.run_sync(rollups.rebuild)
+            cache.response_cache.clear()
 
 
 @app.on_event("startup")
-async def schedule_weather_updates():
-    async def run_updates():
-        while True:
-            # Rövid várakozás, hogy a backend teljesen elinduljon
-            await asyncio.sleep(5)
-            db = database.SessionLocal()
-            try:
-                cities = services.get_cities(db)
-                # Ha üres az adatbázis, adjunk hozzá egy alapértelmezettet
-                if not cities:
-
-                    default_cities = [
-                        {"city_name": "Budapest", "latitude": 47.49, "longitude": 19.04},
-                        {"city_name": "Debrecen", "latitude": 47.53, "longitude": 21.62},
-                        {"city_name": "Szeged", "latitude": 46.25, "longitude": 20.14},
-                        {"city_name": "Miskolc", "latitude": 48.10, "longitude": 20.78},
-                        {"city_name": "Pécs", "latitude": 46.07, "longitude": 18.23},
-                        {"city_name": "Győr", "latitude": 47.68, "longitude": 17.63},
-                        {"city_name": "Nyíregyháza", "latitude": 47.95, "longitude": 21.72},
-                        {"city_name": "Kecskemét", "latitude": 46.89, "longitude": 19.69},
-                        {"city_name": "Székesfehérvár", "latitude": 47.19, "longitude": 18.41},
-                        {"city_name": "Eger", "latitude": 47.90, "longitude": 20.37}
-                    ]
-                    cities = []
-                    for city_data in default_cities:
-                        city_schema = schemas.CityCreate(**city_data)
-                        new_city = services.create_city(db, city_schema)
-                        cities.append(new_city)
-                
-                for city in cities:
-                    # Most már a city egy models.City objektum, aminek van .id attribútuma
-                    data = await services.fetch_weather_data(city)
-                    if data:
-                        services.save_weather(db, schemas.WeatherCreate(**data))
-                logger.info(f"Sikeres frissítés: {len(cities)} város.")
-            except Exception as e:
-                logger.error(f"Hiba a háttérfolyamatban: {e}")
-            finally:
-                db.close()
-            # várakozás a következő frissítésig (default 30 perc), .env-ben állítható
-            data_refetch_minutes = os.getenv("WEATHER_DATA_FETCH_MINUTES", 30)
-
-            await asyncio.sleep(data_refetch_minutes * 60)
-
-    asyncio.create_task(run_updates())
\ No newline at end of file
+async def load_hot_store():
+    """A legfrissebb mérések betöltése a memóriába, még az ütemező indulása előtt."""
+    async with database.AsyncSessionLocal() as db:
+        await db.run_sync(hotstore.hot_store.load)
+
+
+@app.on_event("startup")
+async def load_city_index():
+    """A városok térbeli indexének felépítése (/cities/nearest); utána az új városok egyenként kerülnek be."""
+    async with database.AsyncSessionLocal() as db:
+        count = await db.run_sync(geo.city_index.load)
+    logger.info("Városindex betöltve: %d város", count)
+
+
+@app.on_event("startup")
+async def start_scheduler():
+    scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
+
+
+@app.on_event("shutdown")
+def close_streams():
+    """A nyitott SSE folyamok lezárása, hogy a leállás ne várjon a kliensekre."""
+    pubsub.broker.close()
+
+
+@app.on_event("startup")
+async def start_forecast_refresher():
+    forecast_refresher.start()
+
+
+@app.on_event("shutdown")
+async def stop_forecast_refresher():
+    await forecast_refresher.stop()
+
+
+@app.on_event("startup")
+async def start_retention_job():
+    retention_job.start()
+
+
+@app.on_event("shutdown")
+async def stop_retention_job():
+    await retention_job.stop()
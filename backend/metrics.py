@@ -0,0 +1,373 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Mérőszámok gyűjtése (.env-ben kikapcsolható). Kikapcsolva a dekorátorok az eredeti függvényt adják vissza,
+# az eseménykezelők és a middleware nem települnek, a mérőszám-objektumok pedig üres műveletek.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no", "off")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Egy mérőszám-család a Prometheus szöveges formátumhoz: mintánként (név, címkék, érték)
+MetricFamily = namedtuple("MetricFamily", "name type documentation samples")
+
+
+class LatencyHistogram:
+    """Kumulatív késleltetés-hisztogram (másodpercben)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.count += 1
+
+    def snapshot(self) -> Dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {"buckets": cumulative, "count": self.count, "sum": round(self.total, 6)}
+
+
+def histogram_samples(name: str, labels: Dict[str, str], histogram: LatencyHistogram) -> List[Tuple]:
+    snapshot = histogram.snapshot()
+    samples = [(f"{name}_bucket", {**labels, "le": le}, count) for le, count in snapshot["buckets"].items()]
+    samples.append((f"{name}_sum", labels, histogram.total))
+    samples.append((f"{name}_count", labels, histogram.count))
+    return samples
+
+
+class Metric:
+    """Címkézett mérőszám; a címkeértékeket a labelnames sorrendjében, pozicionálisan kell megadni."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, values: Tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, map(str, values)))
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            items = list(self._values.items())
+        return MetricFamily(self.name, self.type, self.documentation, self._samples(items))
+
+    def _samples(self, items) -> List[Tuple]:
+        return [(self.name, self._labels(labels), value) for labels, value in items]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            histogram = self._values.get(labels)
+            if histogram is None:
+                histogram = self._values[labels] = LatencyHistogram(self.buckets)
+            histogram.observe(value)
+
+    def _samples(self, items) -> List[Tuple]:
+        samples = []
+        for labels, histogram in items:
+            samples += histogram_samples(self.name, self._labels(labels), histogram)
+        return samples
+
+
+class _NullMetric:
+    """Kikapcsolt gyűjtésnél minden mérőszám helyén ez áll: a hívások nem csinálnak semmit."""
+
+    def inc(self, *labels, amount: float = 1.0):
+        pass
+
+    def set(self, value: float, *labels):
+        pass
+
+    def observe(self, value: float, *labels):
+        pass
+
+
+_registry: List[Metric] = []
+_collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+
+def register(metric: Metric):
+    if not METRICS_ENABLED:
+        return _NullMetric()
+    _registry.append(metric)
+    return metric
+
+
+def register_collector(collector: Callable[[], Iterable[MetricFamily]]):
+    """Lekérdezéskor kiértékelt mérőszámok (pl. gyorsítótár- és készletállapot) forrása."""
+    if METRICS_ENABLED:
+        _collectors.append(collector)
+
+
+HTTP_REQUEST_DURATION = register(Histogram(
+    "weather_http_request_duration_seconds", "HTTP kérések feldolgozási ideje útvonalanként.",
+    ("method", "route", "status"), REQUEST_BUCKETS,
+))
+FUNCTION_DURATION = register(Histogram(
+    "weather_function_duration_seconds", "Mért szolgáltatásfüggvények és kódszakaszok futási ideje.",
+    ("function",), REQUEST_BUCKETS,
+))
+DB_QUERY_DURATION = register(Histogram(
+    "weather_db_query_duration_seconds", "SQL utasítások végrehajtási ideje utasítástípusonként.",
+    ("statement",), DB_BUCKETS,
+))
+DB_COMMIT_DURATION = register(Histogram(
+    "weather_db_commit_duration_seconds", "Session commit ideje (a függő flush-sal együtt).", (), DB_BUCKETS,
+))
+UPSTREAM_FETCHES = register(Counter(
+    "weather_upstream_fetches_total", "Városonkénti upstream lekérések kimenetel szerint (ok, error, rate_limited).",
+    # Városnév címke nélkül: tömeges városimportnál városonként egy idősor keletkezne; a városonkénti
+    # hibák az ütemező állapotában (/scheduler/status) látszanak
+    ("outcome",),
+))
+REFRESH_CYCLE_DURATION = register(Histogram(
+    "weather_refresh_cycle_duration_seconds", "Egy ütemezői frissítési kör (lekérés + mentés) ideje.",
+))
+
+
+def render() -> str:
+    """Az összes mérőszám Prometheus szöveges formátumban."""
+    families = [metric.collect() for metric in _registry]
+    for collector in _collectors:
+        families.extend(collector())
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.documentation}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for name, labels, value in family.samples:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def gauge(name: str, documentation: str, value, labels: Optional[Dict[str, str]] = None) -> MetricFamily:
+    return MetricFamily(name, "gauge", documentation, [(name, labels or {}, value)])
+
+
+def counter(name: str, documentation: str, value) -> MetricFamily:
+    return MetricFamily(name, "counter", documentation, [(name, {}, value)])
+
+
+def histogram(name: str, documentation: str, source: LatencyHistogram) -> MetricFamily:
+    return MetricFamily(name, "histogram", documentation, histogram_samples(name, {}, source))
+
+
+# --- időmérés ---
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        FUNCTION_DURATION.observe(time.perf_counter() - self.start, self.name)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str):
+    """Kódszakasz időmérése: with metrics.timer("history_serialize"): ..."""
+    return _Timer(name) if METRICS_ENABLED else _NULL_TIMER
+
+
+def timed(name: Optional[str] = None):
+    """Függvény (szinkron vagy korutin) futási idejének mérése; kikapcsolt gyűjtésnél változatlanul adja vissza a függvényt."""
+
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        label = name or fn.__name__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    FUNCTION_DURATION.observe(time.perf_counter() - start, label)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                FUNCTION_DURATION.observe(time.perf_counter() - start, label)
+        return wrapper
+
+    return decorate
+
+
+# --- SQLAlchemy és ASGI horgok ---
+
+def _statement_type(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA") else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if starts:
+        DB_QUERY_DURATION.observe(time.perf_counter() - starts.pop(), _statement_type(statement))
+
+
+def _handle_error(context):
+    starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine):
+    """SQL utasítások időmérése egy (szinkron) engine-en; async engine esetén a sync_engine-t kell átadni."""
+    if not METRICS_ENABLED:
+        return engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+def _before_commit(session):
+    session.info["metrics_commit_start"] = time.perf_counter()
+
+
+def _after_commit(session):
+    start = session.info.pop("metrics_commit_start", None)
+    if start is not None:
+        DB_COMMIT_DURATION.observe(time.perf_counter() - start)
+
+
+def _after_rollback(session):
+    session.info.pop("metrics_commit_start", None)
+
+
+_sessions_instrumented = False
+
+
+def instrument_sessions():
+    """Commit időmérés minden Session-re (az AsyncSession is ezt használja a háttérben)."""
+    global _sessions_instrumented
+    if not METRICS_ENABLED or _sessions_instrumented:
+        return
+    event.listen(Session, "before_commit", _before_commit)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _sessions_instrumented = True
+
+
+class MetricsMiddleware:
+    """ASGI middleware: kérésidő útvonal-sablononként (pl. /weather/history), metódus és státuszkód szerint."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # A route-ot a router teszi a scope-ba; ismeretlen útvonalnál egy közös címkét használunk
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, scope["method"], route, status)
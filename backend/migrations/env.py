@@ -0,0 +1,56 @@
+"""Alembic környezet: a backend modelljeiből és a DATABASE_URL-ből dolgozik.
+
+Használat: alembic upgrade head (új adatbázis), alembic stamp head (create_all-lal létrehozott meglévő
+adatbázis átvétele), alembic revision --autogenerate -m "..." (új migráció a modellváltozásokból).
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from backend import models
+from backend.database import DATABASE_URL, configure_sqlite
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+
+def database_url() -> str:
+    # Tesztekből / programból a config sqlalchemy.url beállítása felülírja a környezeti változót
+    return config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def run_migrations_offline():
+    url = database_url()
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=url.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = configure_sqlite(create_engine(database_url(), poolclass=NullPool))
+    with engine.connect() as connection:
+        # SQLite-on az ALTER TABLE korlátai miatt batch módban (tábla újraépítéssel) migrálunk
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,91 @@
+"""Kiinduló séma: városok, mérések (observed_at egyedi indexszel), órás/napi aggregátumok, ütemező bérlet
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+ROLLUP_METRICS = ("temperature", "humidity", "precipitation", "wind_speed")
+
+
+def _rollup_table(name: str):
+    op.create_table(
+        name,
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        *[
+            sa.Column(f"{metric}_{agg}", sa.Float(), nullable=True)
+            for metric in ROLLUP_METRICS
+            for agg in ("sum", "min", "max")
+        ],
+        sa.Column("city_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["city_id"], ["cities.id"]),
+        sa.PrimaryKeyConstraint("bucket_start", "city_id"),
+    )
+
+
+def upgrade():
+    op.create_table(
+        "cities",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("city_name", sa.String(), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_cities_id", "cities", ["id"])
+    op.create_index("ix_cities_city_name", "cities", ["city_name"], unique=True)
+
+    op.create_table(
+        "weather_history",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("city_id", sa.Integer(), nullable=True),
+        sa.Column("temperature", sa.Float(), nullable=True),
+        sa.Column("humidity", sa.Integer(), nullable=True),
+        sa.Column("apparent_temperature", sa.Float(), nullable=True),
+        sa.Column("precipitation", sa.Float(), nullable=True),
+        sa.Column("cloud_cover", sa.Integer(), nullable=True),
+        sa.Column("is_day", sa.Integer(), nullable=True),
+        sa.Column("weather_code", sa.Integer(), nullable=True),
+        sa.Column("wind_speed", sa.Float(), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("observed_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["city_id"], ["cities.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_weather_history_id", "weather_history", ["id"])
+    op.create_index("ix_weather_history_timestamp", "weather_history", ["timestamp"])
+    op.create_index("ix_weather_history_city_timestamp", "weather_history", ["city_id", "timestamp"])
+    op.create_index("ux_weather_history_city_observed", "weather_history", ["city_id", "observed_at"], unique=True)
+
+    _rollup_table("weather_rollup_hourly")
+    _rollup_table("weather_rollup_daily")
+
+    op.create_table(
+        "scheduler_lease",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("owner", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade():
+    op.drop_table("scheduler_lease")
+    op.drop_table("weather_rollup_daily")
+    op.drop_table("weather_rollup_hourly")
+    op.drop_index("ux_weather_history_city_observed", table_name="weather_history")
+    op.drop_index("ix_weather_history_city_timestamp", table_name="weather_history")
+    op.drop_index("ix_weather_history_timestamp", table_name="weather_history")
+    op.drop_index("ix_weather_history_id", table_name="weather_history")
+    op.drop_table("weather_history")
+    op.drop_index("ix_cities_city_name", table_name="cities")
+    op.drop_index("ix_cities_id", table_name="cities")
+    op.drop_table("cities")
@@ -0,0 +1,43 @@
+"""Órás előrejelzések: városonként egy sor, változónként tömörített float32 tömb
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+FORECAST_VARIABLES = (
+    "temperature",
+    "apparent_temperature",
+    "humidity",
+    "precipitation",
+    "precipitation_probability",
+    "cloud_cover",
+    "weather_code",
+    "wind_speed",
+)
+
+
+def upgrade():
+    op.create_table(
+        "forecasts",
+        sa.Column("city_id", sa.Integer(), nullable=False),
+        sa.Column("model_run", sa.DateTime(), nullable=False),
+        sa.Column("start", sa.DateTime(), nullable=False),
+        sa.Column("interval_seconds", sa.Integer(), nullable=False),
+        sa.Column("hours", sa.Integer(), nullable=False),
+        sa.Column("fetched_at", sa.DateTime(), nullable=False),
+        *[sa.Column(name, sa.LargeBinary(), nullable=True) for name in FORECAST_VARIABLES],
+        sa.ForeignKeyConstraint(["city_id"], ["cities.id"]),
+        sa.PrimaryKeyConstraint("city_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("forecasts")
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, LargeBinary, inspect, text
+from sqlalchemy.orm import relationship, declarative_base, declared_attr
 from datetime import datetime
 
 Base = declarative_base()
@@ -17,6 +17,12 @@ class City(Base):
 
 class WeatherData(Base):
     __tablename__ = "weather_history"
+    # Városra szűrt, idő szerint csökkenő lekérdezésekhez (előzmények, lapozás, statisztika)
+    # Az egyedi index kiszűri ugyanannak az upstream mérésnek az ismételt mentését (a NULL értékek nem ütköznek)
+    __table_args__ = (
+        Index("ix_weather_history_city_timestamp", "city_id", "timestamp"),
+        Index("ux_weather_history_city_observed", "city_id", "observed_at", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     city_id = Column(Integer, ForeignKey("cities.id"))
@@ -28,6 +34,96 @@ class WeatherData(Base):
     is_day = Column(Integer)  # (1 = nappal, 0 = éjjel)
     weather_code = Column(Integer)
     wind_speed = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    observed_at = Column(DateTime, nullable=True)  # az upstream mérés ideje (UTC); régi soroknál NULL
 
-    city_rel = relationship("City", back_populates="weather_records")
\ No newline at end of file
+    city_rel = relationship("City", back_populates="weather_records")
+
+
+class RollupMixin:
+    """Közös oszlopok az órás és napi aggregátum táblákhoz.
+
+    Az összeg és a darabszám tárolásával az átlag inkrementálisan frissíthető.
+    """
+    bucket_start = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    temperature_sum = Column(Float)
+    temperature_min = Column(Float)
+    temperature_max = Column(Float)
+    humidity_sum = Column(Float)
+    humidity_min = Column(Float)
+    humidity_max = Column(Float)
+    precipitation_sum = Column(Float)
+    precipitation_min = Column(Float)
+    precipitation_max = Column(Float)
+    wind_speed_sum = Column(Float)
+    wind_speed_min = Column(Float)
+    wind_speed_max = Column(Float)
+
+    @declared_attr
+    def city_id(cls):
+        return Column(Integer, ForeignKey("cities.id"), primary_key=True)
+
+class WeatherHourly(RollupMixin, Base):
+    __tablename__ = "weather_rollup_hourly"
+
+class WeatherDaily(RollupMixin, Base):
+    __tablename__ = "weather_rollup_daily"
+
+
+class SchedulerLease(Base):
+    """Bérleti sor: több uvicorn worker közül mindig csak a bérlet birtokosa futtatja az ütemezőt."""
+    __tablename__ = "scheduler_lease"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class Forecast(Base):
+    """Egy város legutóbbi órás előrejelzése egyetlen sorban.
+
+    Változónként egy tömörített float32 tömb (little-endian bájtsor); az i. elem ideje start + i * interval_seconds.
+    A hiányzó upstream értékek NaN-ként szerepelnek.
+    """
+    __tablename__ = "forecasts"
+
+    city_id = Column(Integer, ForeignKey("cities.id"), primary_key=True)
+    model_run = Column(DateTime, nullable=False)  # a modellfuttatás (UTC), amelyből az előrejelzés származik
+    start = Column(DateTime, nullable=False)
+    interval_seconds = Column(Integer, nullable=False, default=3600)
+    hours = Column(Integer, nullable=False)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    temperature = Column(LargeBinary)
+    apparent_temperature = Column(LargeBinary)
+    humidity = Column(LargeBinary)
+    precipitation = Column(LargeBinary)
+    precipitation_probability = Column(LargeBinary)
+    cloud_cover = Column(LargeBinary)
+    weather_code = Column(LargeBinary)
+    wind_speed = Column(LargeBinary)
+
+
+def create_schema(engine):
+    """Létrehozza a hiányzó táblákat és indexeket.
+
+    A create_all meglévő táblákhoz nem ad hozzá új oszlopot és indexet, ezért régi weather.db
+    fájloknál ezeket külön pótoljuk.
+    """
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def add_missing_columns(engine):
+    """A modellben szereplő, de a meglévő táblából hiányzó (nullázható) oszlopok hozzáadása ALTER TABLE-lel."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import threading
+from collections import defaultdict
+from typing import AsyncIterator, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from . import models, serialization
+
+# Élő frissítések beállításai (.env-ben felülírhatók)
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 100))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", 1000))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", 15))
+# Megszakadt kapcsolat után ennyi idő múlva csatlakozzon újra a böngésző (EventSource)
+STREAM_RETRY_MS = 5000
+
+class SubscriberLimitError(RuntimeError):
+    """Elérte a feliratkozók számának felső korlátját."""
+
+
+def weather_event(record: models.WeatherData) -> bytes:
+    """Egy mérés SSE eseményként; az id a rekord azonosítója, az adat a WeatherResponse JSON-ja."""
+    body = serialization.dumps({name: getattr(record, name) for name in serialization.WEATHER_FIELDS})
+    return b"id: %d\nevent: weather\ndata: %s\n\n" % (record.id, body)
+
+
+class Subscription:
+    """Egy kliens feliratkozása korlátos sorral.
+
+    A küldő sosem vár: ha a kliens lemarad és a sor megtelt, a legrégebbi eseményt dobjuk el, a kliens pedig
+    egy dropped eseményből tudja meg, hogy újra kell töltenie az előzményeket.
+    """
+
+    def __init__(self, city_ids: Optional[FrozenSet[int]], maxsize: int, loop: asyncio.AbstractEventLoop):
+        self.city_ids = city_ids
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, event: Optional[bytes]) -> bool:
+        """Sorba teszi az eseményt (None: a folyam vége); False, ha közben egy régit el kellett dobni."""
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+        return not dropped
+
+
+class WeatherBroker:
+    """Folyamaton belüli publish/subscribe az új mérésekhez.
+
+    A save_weather és save_weather_batch a commit után publikál (bármelyik szálból); az eseményt rekordonként
+    egyszer szerializáljuk, majd a feliratkozók eseményhurkába egy call_soon_threadsafe hívással juttatjuk el.
+    Több worker esetén minden folyamat csak a saját írásait látja.
+    """
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE, max_subscribers: int = STREAM_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscription] = set()
+        # Városonkénti index; a None kulcs alatt az összes városra feliratkozottak vannak
+        self._by_city: Dict[Optional[int], Set[Subscription]] = defaultdict(set)
+        self.published = 0
+        self.queued = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def subscribe(self, city_ids: Optional[Iterable[int]] = None) -> Subscription:
+        """Feliratkozás a megadott városokra (None: mindre); az aktuális eseményhurokban kell hívni.
+
+        A korlát ellenőrzése és a feliratkozó felvétele egy zárolás alatt történik; teli brókernél
+        SubscriberLimitError (és a kérést elutasítottként számoljuk).
+        """
+        cities = frozenset(city_ids) if city_ids else None
+        subscription = Subscription(cities, self.queue_size, asyncio.get_running_loop())
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                raise SubscriberLimitError(f"Legfeljebb {self.max_subscribers} élő kapcsolat lehet.")
+            self._subscribers.add(subscription)
+            for city_id in cities or (None,):
+                self._by_city[city_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            for city_id in subscription.city_ids or (None,):
+                subscribers = self._by_city.get(city_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_city[city_id]
+
+    def publish(self, records: Iterable[models.WeatherData]):
+        """Az elmentett mérések kiküldése az érintett feliratkozóknak; feliratkozó nélkül nem szerializál."""
+        if not self._subscribers:
+            return
+        deliveries: Dict[asyncio.AbstractEventLoop, List[Tuple[Subscription, bytes]]] = defaultdict(list)
+        with self._lock:
+            everyone = tuple(self._by_city.get(None, ()))
+            for record in records:
+                targets = everyone + tuple(self._by_city.get(record.city_id, ()))
+                if not targets:
+                    continue
+                event = weather_event(record)
+                self.published += 1
+                for subscription in targets:
+                    deliveries[subscription.loop].append((subscription, event))
+        for loop, items in deliveries.items():
+            try:
+                loop.call_soon_threadsafe(self._deliver, items)
+            except RuntimeError:
+                # A feliratkozók eseményhurka már leállt
+                for subscription, _ in items:
+                    self.unsubscribe(subscription)
+
+    def _deliver(self, items: List[Tuple[Subscription, bytes]]):
+        for subscription, event in items:
+            if subscription.offer(event):
+                self.queued += 1
+            else:
+                self.dropped += 1
+
+    async def stream(self, city_ids: Optional[Iterable[int]] = None, heartbeat: float = STREAM_HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+        """Server-Sent Events folyam: az első sor lekérésekor feliratkozik, a végén (kliens bontott, leállás) leiratkozik.
+
+        Teli brókernél már az első lekérés SubscriberLimitError-t dob; a végpont ezért a válasz előtt kéri le
+        (lásd prepend), így az elutasítás még 503-as státusszal mehet ki.
+
+        A várakozó eseményeket egy darabban küldi, csend esetén heartbeat másodpercenként megjegyzéssel jelez,
+        így a halott kapcsolatok is kiderülnek.
+        """
+        subscription = self.subscribe(city_ids)
+        reported = 0
+        try:
+            yield b"retry: %d\n\n" % STREAM_RETRY_MS
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                events = [event]
+                while events[-1] is not None and not subscription.queue.empty():
+                    events.append(subscription.queue.get_nowait())
+                finished = events[-1] is None
+                if finished:
+                    events.pop()
+                if subscription.dropped > reported:
+                    events.insert(0, b"event: dropped\ndata: %d\n\n" % (subscription.dropped - reported))
+                    reported = subscription.dropped
+                if events:
+                    yield b"".join(events)
+                if finished:
+                    return
+        finally:
+            self.unsubscribe(subscription)
+
+    def close(self):
+        """Leállításkor minden nyitott folyamot lezár, hogy a szerver ne várjon rájuk."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, None)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "max_subscribers": self.max_subscribers,
+                "queue_size": self.queue_size,
+                "published": self.published,
+                "queued": self.queued,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+            }
+
+
+async def prepend(first: bytes, events: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """A már lekért első sor, majd a folyam többi része; a végén a folyamot is lezárja (leiratkozás)."""
+    try:
+        yield first
+        async for chunk in events:
+            yield chunk
+    finally:
+        await events.aclose()
+
+
+# Folyamaton belüli, megosztott példány
+broker = WeatherBroker()
@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from . import cache, export, hotstore, models, rollups
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Megőrzési szabályok (.env-ben felülírhatók). A nyers mérések RETENTION_RAW_DAYS napig maradnak meg
+# (0 = korlátlanul), az órás és napi aggregátumok mindig.
+RETENTION_RAW_DAYS = int(os.getenv("RETENTION_RAW_DAYS", 30))
+# Ennyi sort töröl egy tranzakcióban, hogy az írási zár rövid maradjon
+RETENTION_BATCH_ROWS = int(os.getenv("RETENTION_BATCH_ROWS", 2000))
+# A háttérfeladat ilyen gyakran fut (0 = csak a parancssorból)
+RETENTION_INTERVAL_MINUTES = float(os.getenv("RETENTION_INTERVAL_MINUTES", 360))
+# Egy futás legfeljebb ennyi szabad lapot ad vissza az operációs rendszernek (SQLite)
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", 2000))
+# A lejárt nyers sorok havi partíciói ide kerülnek (üres = archiválás nélkül törlünk)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_FORMAT = os.getenv("ARCHIVE_FORMAT", "parquet" if export.PYARROW_AVAILABLE else "csv")
+
+ARCHIVE_FORMATS = ("parquet", "csv")
+ARCHIVE_EXTENSIONS = {"parquet": "parquet", "csv": "csv.gz"}
+
+
+def cutoff_for(now: datetime, days: int = RETENTION_RAW_DAYS) -> Optional[datetime]:
+    """Az ennél régebbi nyers mérések lejártak; napra kerekítve, hogy a napi aggregátumok egészben maradjanak."""
+    if days <= 0:
+        return None
+    return rollups.truncate(now - timedelta(days=days), "day")
+
+
+def month_ranges(start: datetime, end: datetime) -> Iterator[Tuple[datetime, datetime]]:
+    """A [start, end) időszak hónaphatárokon felbontva."""
+    while start < end:
+        next_month = (start.replace(day=1, hour=0, minute=0, second=0, microsecond=0) + timedelta(days=32)).replace(day=1)
+        yield start, min(next_month, end)
+        start = next_month
+
+
+def day_ranges(start: datetime, end: datetime) -> Iterator[Tuple[datetime, datetime]]:
+    while start < end:
+        yield start, min(start + timedelta(days=1), end)
+        start += timedelta(days=1)
+
+
+def archive_path(directory: str, start: datetime, end: datetime, file_format: str) -> str:
+    """Determinisztikus fájlnév: {directory}/year=YYYY/month=MM/weather_history-KEZDET-VÉGE.kiterjesztés"""
+    partition = os.path.join(directory, f"year={start:%Y}", f"month={start:%m}")
+    return os.path.join(partition, f"weather_history-{start:%Y%m%d}-{end:%Y%m%d}.{ARCHIVE_EXTENSIONS[file_format]}")
+
+
+def archive_range(db: Session, start: datetime, end: datetime, directory: str, file_format: str) -> Optional[str]:
+    """A [start, end) nyers sorait egy tömörített partícióba írja (lásd archive_path); a fájl útvonalát adja vissza.
+
+    A fájl atomikusan (ideiglenes fájl + átnevezés) jön létre, és a szelet törlése csak utána kezdődik. Ha a fájl
+    már létezik, egy megszakadt futás folytatódik: a megmaradt sorok mind benne vannak, ezért nem írjuk újra
+    (az újraírás a már törölt sorokat veszítené el, egy második fájl pedig duplikálná a megmaradtakat).
+    Üres időszaknál nem készül fájl.
+    """
+    path = archive_path(directory, start, end, file_format)
+    if os.path.exists(path):
+        return None
+    partition = os.path.dirname(path)
+    os.makedirs(partition, exist_ok=True)
+    temp_path = os.path.join(partition, f".weather_history-{start:%Y%m%d}.tmp")
+
+    rows = 0
+    result = db.execute(export.export_query(start=start, end=end).execution_options(yield_per=export.EXPORT_BATCH_ROWS))
+    try:
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            schema = export.arrow_schema()
+            with pq.ParquetWriter(temp_path, schema, compression="zstd") as writer:
+                for batch in result.partitions(export.EXPORT_BATCH_ROWS):
+                    rows += len(batch)
+                    writer.write_batch(export.record_batch(schema, batch))
+        else:
+            with gzip.open(temp_path, "wt", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(export.EXPORT_COLUMNS)
+                for batch in result.partitions(export.EXPORT_BATCH_ROWS):
+                    rows += len(batch)
+                    writer.writerows(export.row_dict(row).values() for row in batch)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if rows == 0:
+        os.remove(temp_path)
+        return None
+    os.replace(temp_path, path)
+    return path
+
+
+def delete_range(db: Session, start: datetime, end: datetime, batch_rows: int = RETENTION_BATCH_ROWS) -> int:
+    """Kötegenként (külön tranzakciókban) törli a [start, end) nyers sorait; a törölt sorok számát adja vissza.
+
+    A legrégebbi soroktól halad, így megszakadás után csak a legrégebbi megmaradt nap lehet hiányos.
+    """
+    raw = models.WeatherData
+    deleted = 0
+    while True:
+        ids = list(db.scalars(
+            select(raw.id).where(raw.timestamp >= start, raw.timestamp < end).order_by(raw.timestamp, raw.id).limit(batch_rows)
+        ))
+        if not ids:
+            return deleted
+        db.execute(delete(raw).where(raw.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+
+
+def incremental_vacuum(db: Session, pages: int = RETENTION_VACUUM_PAGES) -> Optional[int]:
+    """SQLite-on legfeljebb pages szabad lapot ad vissza; a visszaadott lapok száma, vagy None, ha nem alkalmazható."""
+    connection = db.connection()
+    if connection.dialect.name != "sqlite":
+        return None
+    if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+        logger.info("Az adatbázis nem inkrementális auto_vacuum módú; egyszeri átállítás: python -m backend.retention --full-vacuum")
+        return None
+    before = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+    connection.exec_driver_sql(f"PRAGMA incremental_vacuum({int(pages)})")
+    db.commit()
+    return before - db.connection().exec_driver_sql("PRAGMA freelist_count").scalar()
+
+
+def full_vacuum(engine):
+    """Egyszeri teljes VACUUM, amely a meglévő SQLite fájlt inkrementális auto_vacuum módba állítja.
+
+    A teljes adatbázist újraírja és közben kizárólagosan zárol, ezért karbantartási ablakban futtassuk.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+@timed()
+def compact(
+    db: Session,
+    now: Optional[datetime] = None,
+    days: int = RETENTION_RAW_DAYS,
+    archive_dir: Optional[str] = ARCHIVE_DIR,
+    archive_format: str = ARCHIVE_FORMAT,
+    batch_rows: int = RETENTION_BATCH_ROWS,
+    vacuum_pages: int = RETENTION_VACUUM_PAGES,
+) -> Dict:
+    """A lejárt nyers mérések tömörítése: archiválás, kötegelt törlés, majd inkrementális VACUUM.
+
+    Naponként halad: előbb archiválja, utána törli a nap lejárt sorait. Az aggregátumokat nem számolja újra;
+    azokat a mentés (rollups.apply) már naprakészen tartja, egy részben törölt nap újraszámolása pedig
+    a törölt sorokat hagyná ki belőlük. Megszakadt futás után egyszerűen újraindítható.
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Ismeretlen archív formátum: {archive_format}")
+    if archive_format == "parquet" and archive_dir and not export.PYARROW_AVAILABLE:
+        raise ValueError("A Parquet archiváláshoz a pyarrow csomag szükséges.")
+
+    cutoff = cutoff_for(now or datetime.utcnow(), days)
+    report = {"cutoff": cutoff.isoformat() if cutoff else None, "deleted_rows": 0, "archive_files": [], "vacuumed_pages": None}
+    oldest = db.scalar(select(func.min(models.WeatherData.timestamp))) if cutoff else None
+    if oldest is None or oldest >= cutoff:
+        return report
+
+    for month_start, month_end in month_ranges(rollups.truncate(oldest, "day"), cutoff):
+        for day_start, day_end in day_ranges(month_start, month_end):
+            if archive_dir:
+                path = archive_range(db, day_start, day_end, archive_dir, archive_format)
+                if path:
+                    report["archive_files"].append(path)
+            report["deleted_rows"] += delete_range(db, day_start, day_end, batch_rows)
+        logger.info(f"Tömörítés: {month_start:%Y-%m} kész, eddig {report['deleted_rows']} sor törölve.")
+
+    # A memóriabeli tár és a gyorsítótárazott válaszok se mutassanak már törölt sorokat
+    hotstore.hot_store.drop_before(cutoff)
+    cache.response_cache.clear()
+    report["vacuumed_pages"] = incremental_vacuum(db, vacuum_pages)
+    return report
+
+
+class RetentionJob:
+    """Háttérfeladat, amely időközönként egy külön szálon futtatja a tömörítést.
+
+    Több worker esetén csak az fut, amelyiknél a should_run igaz (az ütemező bérletének birtokosa).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval_seconds: float = RETENTION_INTERVAL_MINUTES * 60,
+        should_run: Callable[[], bool] = lambda: True,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval_seconds
+        self.should_run = should_run
+        self.runs = 0
+        self.last_run: Optional[datetime] = None
+        self.last_report: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> Dict:
+        with self.session_factory() as db:
+            return compact(db)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.should_run():
+                continue
+            try:
+                # Saját szinkron session egy szálon: a fájlírás és a törlés nem foglalja az eseményhurkot
+                self.last_report = await asyncio.to_thread(self.run_once)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Hiba a tömörítés közben: {e}")
+            self.runs += 1
+            self.last_run = datetime.utcnow()
+
+    def start(self):
+        if self._task is None and self.interval > 0 and RETENTION_RAW_DAYS > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict:
+        return {
+            "raw_days": RETENTION_RAW_DAYS,
+            "interval_seconds": self.interval,
+            "running": self._task is not None,
+            "archive_dir": ARCHIVE_DIR or None,
+            "archive_format": ARCHIVE_FORMAT,
+            "runs": self.runs,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_report": self.last_report,
+            "last_error": self.last_error,
+        }
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Lejárt nyers mérések aggregálása, archiválása és törlése, majd VACUUM.")
+    parser.add_argument("--days", type=int, default=RETENTION_RAW_DAYS, help="Ennyi napnyi nyers adat marad meg")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Archív könyvtár (üres = archiválás nélkül)")
+    parser.add_argument("--format", choices=ARCHIVE_FORMATS, default=ARCHIVE_FORMAT)
+    parser.add_argument("--batch-rows", type=int, default=RETENTION_BATCH_ROWS)
+    parser.add_argument("--vacuum-pages", type=int, default=RETENTION_VACUUM_PAGES)
+    parser.add_argument("--full-vacuum", action="store_true", help="Egyszeri teljes VACUUM (inkrementális módba állítja a fájlt)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        models.create_schema(session.get_bind())
+        result = compact(
+            session, days=args.days, archive_dir=args.archive_dir, archive_format=args.format,
+            batch_rows=args.batch_rows, vacuum_pages=args.vacuum_pages,
+        )
+    finally:
+        session.close()
+    if args.full_vacuum:
+        full_vacuum(engine)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
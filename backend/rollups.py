@@ -0,0 +1,267 @@
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import bucket_value, dialect_insert, scalar_max, scalar_min, time_bucket
+
+logger = logging.getLogger(__name__)
+
+# Felbontás -> aggregátum tábla
+RESOLUTIONS = {"hour": models.WeatherHourly, "day": models.WeatherDaily}
+RESOLUTION_STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# Az aggregátum táblákban tárolt mezők
+ROLLUP_METRICS = ("temperature", "humidity", "precipitation", "wind_speed")
+
+REBUILD_CHUNK = 5000
+DEFAULT_SERIES_DAYS = 7
+DEFAULT_MAX_POINTS = 500
+
+
+def truncate(timestamp: datetime, resolution: str) -> datetime:
+    """Az időbélyeg órára vagy napra csonkolva."""
+    if resolution == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _empty_bucket(city_id: int, bucket_start: datetime) -> Dict:
+    row = {"city_id": city_id, "bucket_start": bucket_start, "count": 0}
+    for metric in ROLLUP_METRICS:
+        row.update({f"{metric}_sum": 0.0, f"{metric}_min": None, f"{metric}_max": None})
+    return row
+
+
+def _accumulate(row: Dict, record):
+    row["count"] += 1
+    for metric in ROLLUP_METRICS:
+        value = getattr(record, metric)
+        if value is None:
+            continue
+        row[f"{metric}_sum"] += value
+        row[f"{metric}_min"] = value if row[f"{metric}_min"] is None else min(row[f"{metric}_min"], value)
+        row[f"{metric}_max"] = value if row[f"{metric}_max"] is None else max(row[f"{metric}_max"], value)
+
+
+def _upsert(db: Session, model, rows: List[Dict]):
+    """Összevonja az új részaggregátumokat a meglévő sorokkal (ON CONFLICT DO UPDATE)."""
+    bind = db.get_bind()
+    table = model.__table__
+    stmt = dialect_insert(bind, table).values(rows)
+    excluded = stmt.excluded
+    updates = {"count": table.c.count + excluded.count}
+    for metric in ROLLUP_METRICS:
+        current_min, current_max = table.c[f"{metric}_min"], table.c[f"{metric}_max"]
+        updates[f"{metric}_sum"] = func.coalesce(table.c[f"{metric}_sum"], 0) + func.coalesce(excluded[f"{metric}_sum"], 0)
+        updates[f"{metric}_min"] = func.coalesce(scalar_min(bind, current_min, excluded[f"{metric}_min"]), current_min, excluded[f"{metric}_min"])
+        updates[f"{metric}_max"] = func.coalesce(scalar_max(bind, current_max, excluded[f"{metric}_max"]), current_max, excluded[f"{metric}_max"])
+    db.execute(stmt.on_conflict_do_update(index_elements=["city_id", "bucket_start"], set_=updates))
+
+
+def apply(db: Session, records: Iterable[models.WeatherData]):
+    """Inkrementálisan hozzáadja az újonnan mentett mérési sorokat az órás és napi aggregátumokhoz.
+
+    A hívó tranzakciójában fut, így a nyers sorokkal együtt kerül commitra.
+    """
+    records = [r for r in records if r.timestamp is not None]
+    if not records:
+        return
+    for resolution, model in RESOLUTIONS.items():
+        buckets = {}
+        for record in records:
+            key = (record.city_id, truncate(record.timestamp, resolution))
+            if key not in buckets:
+                buckets[key] = _empty_bucket(*key)
+            _accumulate(buckets[key], record)
+        rows = list(buckets.values())
+        for start in range(0, len(rows), REBUILD_CHUNK):
+            _upsert(db, model, rows[start:start + REBUILD_CHUNK])
+
+
+def partially_compacted(db: Session, day: datetime) -> bool:
+    """Igaz, ha a nap aggregátuma több mérést tartalmaz, mint amennyi nyers sor még megvan belőle."""
+    raw = models.WeatherData
+    end = day + timedelta(days=1)
+    raw_count = db.scalar(select(func.count(raw.id)).where(raw.timestamp >= day, raw.timestamp < end))
+    rolled = db.scalar(select(func.coalesce(func.sum(models.WeatherDaily.count), 0)).where(
+        models.WeatherDaily.bucket_start >= day, models.WeatherDaily.bucket_start < end
+    ))
+    return rolled > raw_count
+
+
+def rebuild(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """Újraszámolja az aggregátumokat a nyers adatokból (teljesen, vagy egy [start, end) időszakra).
+
+    A határokat teljes napokra kerekíti, hogy a napi aggregátumok se maradjanak félig számolva.
+    Kezdőidő nélkül a legrégebbi nyers mérés napjától számol, így a már törölt nyers adatok
+    aggregátumai megmaradnak. Visszaadja a feldolgozott nyers sorok számát.
+    """
+    if start is None:
+        # A megőrzési idő miatt törölt nyers sorok aggregátumai a legrégebbi megmaradt nap előtt érintetlenek maradnak
+        oldest = db.scalar(select(func.min(models.WeatherData.timestamp)))
+        if oldest is None:
+            return 0
+        start = truncate(oldest, "day")
+        if partially_compacted(db, start):
+            # Megszakadt tömörítés: a nap nyers sorainak egy része már törölve, az aggregátuma marad
+            start += timedelta(days=1)
+    start = truncate(start, "day")
+    if end is not None:
+        end = truncate(end, "day") + (timedelta(days=1) if end != truncate(end, "day") else timedelta(0))
+
+    bind = db.get_bind()
+    raw = models.WeatherData
+    for resolution, model in RESOLUTIONS.items():
+        purge = delete(model)
+        if start is not None:
+            purge = purge.where(model.bucket_start >= start)
+        if end is not None:
+            purge = purge.where(model.bucket_start < end)
+        db.execute(purge)
+
+        bucket = time_bucket(bind, raw.timestamp, resolution)
+        columns = [raw.city_id, bucket.label("bucket_start"), func.count(raw.id).label("count")]
+        for metric in ROLLUP_METRICS:
+            column = getattr(raw, metric)
+            columns += [func.sum(column).label(f"{metric}_sum"), func.min(column).label(f"{metric}_min"), func.max(column).label(f"{metric}_max")]
+        stmt = select(*columns).group_by(raw.city_id, bucket)
+        if start is not None:
+            stmt = stmt.where(raw.timestamp >= start)
+        if end is not None:
+            stmt = stmt.where(raw.timestamp < end)
+
+        chunk, processed = [], 0
+        for row in db.execute(stmt.execution_options(yield_per=REBUILD_CHUNK)).mappings():
+            chunk.append({**row, "bucket_start": bucket_value(row["bucket_start"])})
+            processed += row["count"]
+            if len(chunk) >= REBUILD_CHUNK:
+                db.execute(dialect_insert(bind, model.__table__).values(chunk))
+                chunk = []
+        if chunk:
+            db.execute(dialect_insert(bind, model.__table__).values(chunk))
+    db.commit()
+    logger.info(f"Aggregátumok újraszámolva: {processed} nyers sor.")
+    return processed
+
+
+def needs_rebuild(db: Session) -> bool:
+    """Igaz, ha vannak nyers adatok, de az aggregátum táblák még üresek (pl. frissen bevezetett tábláknál)."""
+    has_raw = db.execute(select(models.WeatherData.id).limit(1)).first() is not None
+    has_rollup = db.execute(select(models.WeatherHourly.city_id).limit(1)).first() is not None
+    return has_raw and not has_rollup
+
+
+def _raw_points(db: Session, city_id: int, metric: str, start: datetime, end: datetime) -> List[Dict]:
+    column = getattr(models.WeatherData, metric)
+    rows = db.execute(
+        select(models.WeatherData.timestamp, column)
+        .where(models.WeatherData.city_id == city_id, models.WeatherData.timestamp >= start, models.WeatherData.timestamp < end)
+        .order_by(models.WeatherData.timestamp)
+    )
+    return [{"timestamp": ts, "avg": value, "min": value, "max": value, "count": 1} for ts, value in rows]
+
+
+def _rollup_points(db: Session, resolution: str, city_id: int, metric: str, start: datetime, end: datetime) -> List[Dict]:
+    model = RESOLUTIONS[resolution]
+    rows = db.execute(
+        select(model.bucket_start, model.count, model.__table__.c[f"{metric}_sum"], model.__table__.c[f"{metric}_min"], model.__table__.c[f"{metric}_max"])
+        .where(model.city_id == city_id, model.bucket_start >= truncate(start, resolution), model.bucket_start < end)
+        .order_by(model.bucket_start)
+    )
+    return [
+        {"timestamp": bucket, "avg": (total / count) if count else None, "min": low, "max": high, "count": count}
+        for bucket, count, total, low, high in rows
+    ]
+
+
+def downsample(points: List[Dict], max_points: int) -> List[Dict]:
+    """Min/max megőrző vödrös ritkítás: egymást követő pontokat von össze legfeljebb max_points vödörbe.
+
+    A vödör átlaga darabszámmal súlyozott, a szélsőértékek megmaradnak, így a csúcsok nem tűnnek el a diagramról.
+    """
+    if len(points) <= max_points:
+        return points
+    merged = []
+    for i in range(max_points):
+        group = points[i * len(points) // max_points:(i + 1) * len(points) // max_points]
+        if not group:
+            continue
+        count = sum(p["count"] for p in group)
+        weighted = [(p["avg"], p["count"]) for p in group if p["avg"] is not None]
+        lows = [p["min"] for p in group if p["min"] is not None]
+        highs = [p["max"] for p in group if p["max"] is not None]
+        merged.append({
+            "timestamp": group[0]["timestamp"],
+            "avg": sum(v * c for v, c in weighted) / sum(c for _, c in weighted) if weighted else None,
+            "min": min(lows) if lows else None,
+            "max": max(highs) if highs else None,
+            "count": count,
+        })
+    return merged
+
+
+def raw_data_start(db: Session) -> datetime:
+    """Az az időpont, amelytől a nyers mérések teljesek.
+
+    Ha a tömörítés (retention.py) már törölt nyers sorokat, az aggregátumok korábbra nyúlnak vissza,
+    mint a legrégebbi nyers mérés; ilyenkor az előtte kezdődő idősorok csak aggregátumból jöhetnek.
+    """
+    oldest_raw = db.scalar(select(func.min(models.WeatherData.timestamp)))
+    oldest_rollup = db.scalar(select(func.min(models.WeatherHourly.bucket_start)))
+    if oldest_raw is None or oldest_rollup is None or oldest_rollup >= truncate(oldest_raw, "hour"):
+        return datetime.min
+    return oldest_raw
+
+
+def get_series(
+    db: Session,
+    city_id: int,
+    metric: str = "temperature",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> Dict:
+    """Diagramhoz való idősor: a kért időtartam és pontkeret alapján választ nyers, órás vagy napi felbontást."""
+    if metric not in ROLLUP_METRICS:
+        raise ValueError(f"Ismeretlen mező: {metric}")
+    if max_points < 2:
+        raise ValueError("A max_points legalább 2 legyen.")
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=DEFAULT_SERIES_DAYS)
+
+    raw_count = db.scalar(
+        select(func.count(models.WeatherData.id))
+        .where(models.WeatherData.city_id == city_id, models.WeatherData.timestamp >= start, models.WeatherData.timestamp < end)
+    )
+    if raw_count <= max_points and start >= raw_data_start(db):
+        resolution, points = "raw", _raw_points(db, city_id, metric, start, end)
+    else:
+        resolution = "hour" if (end - start) / RESOLUTION_STEPS["hour"] <= max_points else "day"
+        points = downsample(_rollup_points(db, resolution, city_id, metric, start, end), max_points)
+
+    for point in points:
+        point["timestamp"] = point["timestamp"].isoformat()
+        if point["avg"] is not None:
+            point["avg"] = round(point["avg"], 2)
+    return {"city_id": city_id, "metric": metric, "resolution": resolution, "points": points}
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Órás és napi aggregátumok újraszámolása a nyers adatokból.")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        models.create_schema(session.get_bind())
+        rebuild(session, args.start, args.end)
+    finally:
+        session.close()
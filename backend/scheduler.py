@@ -0,0 +1,394 @@
+import asyncio
+import hashlib
+import heapq
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, or_, select, text
+from sqlalchemy.orm import Session
+
+from . import models, schemas, services
+from .database import AsyncSessionLocal, dialect_insert
+from .metrics import REFRESH_CYCLE_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Ütemező beállításai (.env-ben felülírhatók)
+WEATHER_DATA_FETCH_MINUTES = float(os.getenv("WEATHER_DATA_FETCH_MINUTES", 30))
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", 10))
+SCHEDULER_JITTER_SECONDS = float(os.getenv("SCHEDULER_JITTER_SECONDS", 30))
+SCHEDULER_BACKOFF_BASE_SECONDS = float(os.getenv("SCHEDULER_BACKOFF_BASE_SECONDS", 30))
+SCHEDULER_MAX_BACKOFF_SECONDS = float(os.getenv("SCHEDULER_MAX_BACKOFF_SECONDS", 3600))
+# Újonnan felvett (vagy régóta esedékes) városok első lekérése ennyi idő alatt oszlik szét
+SCHEDULER_STARTUP_SPREAD_SECONDS = float(os.getenv("SCHEDULER_STARTUP_SPREAD_SECONDS", 60))
+SCHEDULER_MAX_BATCH = int(os.getenv("SCHEDULER_MAX_BATCH", 500))
+SCHEDULER_CITY_SYNC_SECONDS = float(os.getenv("SCHEDULER_CITY_SYNC_SECONDS", 60))
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", 60))
+
+# Vezetőválasztás: auto = PostgreSQL-en advisory lock, máshol (SQLite) a bérleti tábla; lease / advisory kényszeríti
+SCHEDULER_LEADER_ELECTION = os.getenv("SCHEDULER_LEADER_ELECTION", "auto").lower()
+
+LEASE_NAME = "weather-scheduler"
+# Aranymetszés alapú fázis: a városok id-juk alapján stabilan és egyenletesen oszlanak el az intervallumban
+GOLDEN_RATIO_CONJUGATE = 0.6180339887498949
+
+
+def _to_epoch(timestamp: datetime) -> float:
+    # Az adatbázisban naiv UTC időbélyegek vannak
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+def try_acquire_lease(db: Session, owner: str, ttl_seconds: float, name: str = LEASE_NAME, now: Optional[datetime] = None) -> bool:
+    """Megszerzi vagy meghosszabbítja a bérletet, ha szabad, lejárt, vagy már a miénk. Igazat ad, ha a miénk lett."""
+    now = now or datetime.utcnow()
+    table = models.SchedulerLease.__table__
+    stmt = dialect_insert(db.get_bind(), table).values(name=name, owner=owner, expires_at=now + timedelta(seconds=ttl_seconds))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"owner": stmt.excluded.owner, "expires_at": stmt.excluded.expires_at},
+        where=or_(table.c.owner == owner, table.c.expires_at < now),
+    )
+    db.execute(stmt)
+    db.commit()
+    return db.scalar(select(table.c.owner).where(table.c.name == name)) == owner
+
+
+def release_lease(db: Session, owner: str, name: str = LEASE_NAME):
+    """Leálláskor elengedi a bérletet, hogy egy másik worker azonnal átvehesse."""
+    table = models.SchedulerLease.__table__
+    db.execute(delete(table).where(table.c.name == name, table.c.owner == owner))
+    db.commit()
+
+
+class LeaseElection:
+    """Vezetőválasztás a scheduler_lease táblával (SQLite és minden más adatbázis): lejáró, megújítandó bérlet."""
+
+    kind = "lease"
+
+    def __init__(self, session_factory, ttl_seconds: float = SCHEDULER_LEASE_SECONDS, name: str = LEASE_NAME):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+
+    async def acquire(self, owner: str) -> bool:
+        async with self.session_factory() as db:
+            return await db.run_sync(lambda session: try_acquire_lease(session, owner, self.ttl_seconds, self.name))
+
+    async def release(self, owner: str):
+        async with self.session_factory() as db:
+            await db.run_sync(lambda session: release_lease(session, owner, self.name))
+
+
+def advisory_lock_key(name: str) -> int:
+    """Stabil, előjeles 64 bites kulcs a pg_advisory_lock számára."""
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+class AdvisoryLockElection:
+    """Vezetőválasztás PostgreSQL session-szintű advisory lockkal.
+
+    A zárat egy külön, nyitva tartott kapcsolat birtokolja; ha a worker vagy a kapcsolat meghal, a szerver
+    azonnal elengedi, így nincs lejárati idő, amit ki kellene várni. A megújítás csak a kapcsolat életét ellenőrzi.
+    """
+
+    kind = "advisory_lock"
+
+    def __init__(self, engine, name: str = LEASE_NAME):
+        self.engine = engine
+        self.key = advisory_lock_key(name)
+        self._connection = None
+
+    async def acquire(self, owner: str) -> bool:
+        if self._connection is not None:
+            try:
+                await self._connection.execute(text("SELECT 1"))
+                return True
+            except Exception as e:
+                logger.warning(f"Az advisory lock kapcsolata megszakadt: {e}")
+                await self._discard()
+        connection = await self.engine.connect()
+        try:
+            locked = (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})).scalar()
+            # A session-szintű zár túléli a tranzakciót; nem hagyunk nyitott ("idle in transaction") tranzakciót
+            await connection.commit()
+        except Exception:
+            await connection.close()
+            raise
+        if locked:
+            self._connection = connection
+            return True
+        await connection.close()
+        return False
+
+    async def release(self, owner: str):
+        if self._connection is None:
+            return
+        try:
+            await self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            await self._connection.commit()
+        finally:
+            await self._discard()
+
+    async def _discard(self):
+        connection, self._connection = self._connection, None
+        try:
+            await connection.close()
+        except Exception:
+            pass
+
+
+def default_election(session_factory, lease_seconds: float = SCHEDULER_LEASE_SECONDS):
+    """A sessiongyár adatbázisához illő vezetőválasztás (SCHEDULER_LEADER_ELECTION alapján)."""
+    bind = getattr(session_factory, "kw", {}).get("bind")
+    dialect = bind.dialect.name if bind is not None else None
+    if SCHEDULER_LEADER_ELECTION == "advisory" or (SCHEDULER_LEADER_ELECTION == "auto" and dialect == "postgresql"):
+        return AdvisoryLockElection(bind)
+    return LeaseElection(session_factory, lease_seconds)
+
+
+@dataclass
+class CitySchedule:
+    city: models.City
+    next_due: float
+    failures: int = 0
+    last_success: Optional[float] = None
+    last_error: Optional[str] = None
+
+
+class WeatherScheduler:
+    """Városonkénti esedékességi időkkel dolgozó ütemező.
+
+    A városok fázisa az intervallumon belül egyenletesen oszlik el, így nincs ciklusonkénti
+    csúcsterhelés; a hibás városok exponenciálisan visszalépnek, 429 esetén pedig az egész
+    ütemező szünetel a Retry-After idejéig. Több worker esetén csak a megválasztott vezető dolgozik
+    (PostgreSQL-en advisory lock, egyébként DB bérlet).
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        interval_seconds: float = WEATHER_DATA_FETCH_MINUTES * 60,
+        tick_seconds: float = SCHEDULER_TICK_SECONDS,
+        jitter_seconds: float = SCHEDULER_JITTER_SECONDS,
+        backoff_base_seconds: float = SCHEDULER_BACKOFF_BASE_SECONDS,
+        max_backoff_seconds: float = SCHEDULER_MAX_BACKOFF_SECONDS,
+        startup_spread_seconds: float = SCHEDULER_STARTUP_SPREAD_SECONDS,
+        max_batch: int = SCHEDULER_MAX_BATCH,
+        lease_seconds: float = SCHEDULER_LEASE_SECONDS,
+        clock: Callable[[], float] = time.time,
+        rng: Optional[random.Random] = None,
+        owner: Optional[str] = None,
+        election=None,
+    ):
+        self.session_factory = session_factory
+        self.election = election or default_election(session_factory, lease_seconds)
+        self.interval = interval_seconds
+        self.tick_seconds = tick_seconds
+        # A jitter legfeljebb az intervallum tizede, hogy a fázisok ne keveredjenek össze
+        self.jitter = min(jitter_seconds, interval_seconds / 10)
+        self.backoff_base = backoff_base_seconds
+        self.max_backoff = max_backoff_seconds
+        self.startup_spread = min(startup_spread_seconds, interval_seconds)
+        self.max_batch = max_batch
+        self.lease_seconds = lease_seconds
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._entries: Dict[int, CitySchedule] = {}
+        self._heap: List = []
+        self.is_leader = False
+        self.paused_until = 0.0
+        self._lease_renew_at = 0.0
+        self._next_city_sync = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.last_batch_size = 0
+        self.last_tick_seconds = 0.0
+
+    # --- ütemezési logika ---
+
+    def _phase(self, city_id: int) -> float:
+        return (city_id * GOLDEN_RATIO_CONJUGATE) % 1.0
+
+    def _jitter(self) -> float:
+        return self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+
+    def _push(self, entry: CitySchedule):
+        heapq.heappush(self._heap, (entry.next_due, entry.city.id))
+
+    def add_city(self, city: models.City, last_timestamp: Optional[datetime] = None):
+        """Felvesz egy várost; az első esedékesség az utolsó mérésből, annak hiányában a fázisából adódik."""
+        if city.id in self._entries:
+            self._entries[city.id].city = city
+            return
+        now = self._clock()
+        spread = now + self._phase(city.id) * self.startup_spread
+        if last_timestamp is not None:
+            next_due = max(_to_epoch(last_timestamp) + self.interval, spread)
+        else:
+            next_due = spread
+        entry = CitySchedule(city=city, next_due=next_due)
+        self._entries[city.id] = entry
+        self._push(entry)
+
+    def remove_missing(self, city_ids):
+        for city_id in set(self._entries) - set(city_ids):
+            del self._entries[city_id]
+
+    def pop_due(self, now: float) -> List[CitySchedule]:
+        """Kiveszi az esedékes városokat (legfeljebb max_batch darabot)."""
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.max_batch:
+            next_due, city_id = heapq.heappop(self._heap)
+            entry = self._entries.get(city_id)
+            # Elavult kupacelem (törölt város vagy újraütemezett bejegyzés)
+            if entry is None or entry.next_due != next_due:
+                continue
+            due.append(entry)
+        return due
+
+    def mark_success(self, entry: CitySchedule, now: float):
+        entry.failures = 0
+        entry.last_success = now
+        entry.last_error = None
+        # A fázis megtartása: az előző esedékességhez adjuk az intervallumot, ha nem csúsztunk túl sokat
+        base = entry.next_due if now - entry.next_due < self.interval else now
+        entry.next_due = base + self.interval + self._jitter()
+        self._push(entry)
+
+    def mark_failure(self, entry: CitySchedule, now: float, error: str, retry_after: Optional[float] = None):
+        entry.failures += 1
+        entry.last_error = error
+        delay = min(self.max_backoff, self.backoff_base * 2 ** (entry.failures - 1))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        entry.next_due = now + delay + abs(self._jitter())
+        self._push(entry)
+
+    # --- futtatás ---
+
+    async def sync_cities(self):
+        """Frissíti a városlistát az adatbázisból (új városok felvétele, töröltek eltávolítása)."""
+        async with self.session_factory() as db:
+            cities = await db.run_sync(services.get_cities)
+            latest = await db.run_sync(services.get_latest_timestamps)
+        self.remove_missing(city.id for city in cities)
+        for city in cities:
+            self.add_city(city, latest.get(city.id))
+
+    async def _renew_lease(self):
+        was_leader = self.is_leader
+        self.is_leader = await self.election.acquire(self.owner)
+        if self.is_leader and not was_leader:
+            logger.info(f"Az ütemező vezető lett ({self.owner}, {self.election.kind}).")
+            async with self.session_factory() as db:
+                await db.run_sync(services.seed_default_cities)
+            self._next_city_sync = 0.0
+        elif was_leader and not self.is_leader:
+            logger.warning("Az ütemező elvesztette a bérletet, leáll a lekérés.")
+
+    async def tick(self):
+        """Egy ütemezési lépés: bérlet megújítása, városlista szinkron, esedékes városok lekérése és mentése."""
+        now = self._clock()
+        if now >= self._lease_renew_at:
+            await self._renew_lease()
+            self._lease_renew_at = now + self.lease_seconds / 3
+        if not self.is_leader:
+            return
+        if now >= self._next_city_sync:
+            await self.sync_cities()
+            self._next_city_sync = now + SCHEDULER_CITY_SYNC_SECONDS
+        if now < self.paused_until:
+            return
+
+        due = self.pop_due(now)
+        if not due:
+            return
+        started = time.perf_counter()
+        retry_after = None
+        try:
+            results = await services.fetch_weather_data_batch([entry.city for entry in due])
+        except services.RateLimitedError as e:
+            results, retry_after = e.results, e.retry_after
+            self.paused_until = now + e.retry_after
+            logger.warning(f"Upstream rate limit: szünet {e.retry_after:.0f} mp-ig.")
+
+        saved = False
+        if results:
+            try:
+                async with self.session_factory() as db:
+                    await services.save_weather_batch_async(db, [schemas.WeatherCreate(**data) for data in results.values()])
+                saved = True
+            except Exception as e:
+                logger.error(f"Hiba a mérések mentésekor: {e}")
+
+        for entry in due:
+            if saved and entry.city.id in results:
+                self.mark_success(entry, now)
+            else:
+                error = "rate limit" if retry_after is not None else "sikertelen lekérés vagy mentés"
+                self.mark_failure(entry, now, error, retry_after)
+
+        self.cycles += 1
+        self.last_batch_size = len(due)
+        self.last_tick_seconds = time.perf_counter() - started
+        REFRESH_CYCLE_DURATION.observe(self.last_tick_seconds)
+        logger.info(f"Sikeres frissítés: {len(results) if saved else 0}/{len(due)} város.")
+
+    async def run(self):
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Hiba a háttérfolyamatban: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await self.election.release(self.owner)
+            self.is_leader = False
+
+    def status(self) -> Dict:
+        now = self._clock()
+        overdue = [now - entry.next_due for entry in self._entries.values() if entry.next_due <= now]
+        upcoming = [entry.next_due for entry in self._entries.values()]
+        return {
+            "leader": self.is_leader,
+            "owner": self.owner,
+            "election": self.election.kind,
+            "interval_seconds": self.interval,
+            "cities": len(self._entries),
+            "queue_depth": len(overdue),
+            "lag_seconds": round(max(overdue), 3) if overdue else 0.0,
+            "next_due": _from_epoch(min(upcoming)).isoformat() if upcoming else None,
+            "in_backoff": sum(1 for entry in self._entries.values() if entry.failures),
+            "rate_limited_until": _from_epoch(self.paused_until).isoformat() if self.paused_until > now else None,
+            "cycles": self.cycles,
+            "last_batch_size": self.last_batch_size,
+            "last_tick_seconds": round(self.last_tick_seconds, 4),
+        }
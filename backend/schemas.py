@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Union
 
 class WeatherBase(BaseModel):
     temperature: float
@@ -26,10 +26,22 @@ class CityResponse(CityBase):
 
 class WeatherCreate(WeatherBase):
     city_id: int
+    observed_at: Optional[datetime] = None  # az upstream 'current.time' (UTC); ugyanaz a mérés csak egyszer kerül mentésre
 
 class WeatherResponse(WeatherBase):
     id: int
     city_id: int
     timestamp: datetime
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+# layout=columns: a sorok helyett mezőnként egy lista (mezőnév -> értékek)
+WeatherColumns = Dict[str, list]
+
+class DashboardResponse(BaseModel):
+    city_id: Optional[int]
+    cities: List[CityResponse]
+    stats: Dict[str, Union[int, float]]
+    history: Union[List[WeatherResponse], WeatherColumns]  # a layout paramétertől függően
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,55 @@
+import importlib.util
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Sequence
+
+from . import schemas
+
+# Opcionális gyorsító: orjson nélkül a szabványos json modullal, azonos kimenettel dolgozunk
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+if ORJSON_AVAILABLE:
+    import orjson
+
+# A válaszsémák mezői és sorrendje; a gyors út pontosan ezeket az oszlopokat kérdezi le
+WEATHER_FIELDS = tuple(schemas.WeatherResponse.model_fields)
+CITY_FIELDS = tuple(schemas.CityResponse.model_fields)
+# rows: objektumok listája (a response_model szerinti szerződés); columns: {"mező": [értékek...]}
+LAYOUTS = ("rows", "columns")
+
+
+def _default(value):
+    # PostgreSQL-en a numeric aggregátumok (pl. egész oszlop átlaga) Decimal-ként érkeznek
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Nem JSON-kódolható típus: {type(value).__name__}")
+
+
+def dumps(data) -> bytes:
+    """JSON bájtok; a datetime ISO 8601 formában, ahogy a Pydantic is kiírja."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def rows_payload(rows: Iterable[Sequence], fields: Sequence[str]) -> List[Dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def columns_payload(rows: Sequence[Sequence], fields: Sequence[str]) -> Dict[str, list]:
+    """Oszlopos elrendezés: mezőnként egy lista, így a kliens (pl. pandas) soronkénti szótárak nélkül tölti be."""
+    columns = zip(*rows) if rows else [()] * len(fields)
+    return {field: list(column) for field, column in zip(fields, columns)}
+
+
+def payload(rows: Sequence[Sequence], fields: Sequence[str], layout: str = "rows"):
+    if layout not in LAYOUTS:
+        raise ValueError(f"Ismeretlen elrendezés: {layout}")
+    return columns_payload(rows, fields) if layout == "columns" else rows_payload(rows, fields)
+
+
+def encode(rows: Sequence[Sequence], fields: Sequence[str], layout: str = "rows") -> bytes:
+    """Sima oszlop-tuple-ök (Core Row, HotRecord) közvetlen JSON kódolása, ORM objektum és Pydantic validálás nélkül."""
+    return dumps(payload(rows, fields, layout))
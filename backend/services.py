@@ -1,13 +1,26 @@
-import httpx
+import asyncio
+import os
 import logging
-from typing import List, Dict
-from . import models, schemas
+from typing import Callable, List, Dict, Optional, Tuple
+from . import cache, geo, hotstore, models, pubsub, rollups, schemas, serialization, upstream
+from .database import bucket_value, dialect_insert, time_bucket
+from .metrics import UPSTREAM_FETCHES, timed
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from sqlalchemy import func, literal, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 # Logolás beállítása
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Open-Meteo beállítások (.env-ben felülírhatók)
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+# Ennyi várost kérünk le egyetlen HTTP kérésben
+OPEN_METEO_BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", 100))
+CURRENT_FIELDS = "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m,cloud_cover,is_day"
+
 def celsius_to_fahrenheit(celsius: float) -> float:
     """Kiszámítja a Fahrenheit értéket Celsiusból."""
     return (celsius * 9/5) + 32
@@ -28,55 +41,472 @@ def translate_weather_code(code: int) -> str:
     }
     return mapping.get(code, f"Ismeretlen ({code})")
 
-async def fetch_weather_data(city: models.City) -> Dict:
-    """Aszinkron módon lekéri az aktuális időjárási adatokat az Open-Meteo API-tól egy adott város koordinátái alapján."""
-    url = (
-        f"https://api.open-meteo.com/v1/forecast?"
-        f"latitude={city.latitude}&longitude={city.longitude}&"
-        f"current=temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m,cloud_cover,is_day"
-    )
-    async with httpx.AsyncClient() as client:
+class RateLimitedError(Exception):
+    """Az upstream 429-cel válaszolt; retry_after másodperc múlva érdemes újra próbálni."""
+
+    def __init__(self, retry_after: float, results: Optional[Dict[int, Dict]] = None):
+        super().__init__(f"Upstream rate limit, újrapróbálás {retry_after:.0f} mp múlva")
+        self.retry_after = retry_after
+        # A kötegelt lekérés többi csoportjának sikeres eredményei
+        self.results = results or {}
+
+def parse_retry_after(value: Optional[str], default: float = 60.0) -> float:
+    """A Retry-After fejléc értelmezése (másodpercek vagy HTTP dátum)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+def _parse_current(city: models.City, data: Dict) -> Dict:
+    """Az Open-Meteo 'current' blokkját a WeatherCreate sémának megfelelő szótárrá alakítja."""
+    return {
+        "city_id": city.id,
+        "temperature": data["temperature_2m"],
+        "humidity": int(data["relative_humidity_2m"]),
+        "apparent_temperature": data["apparent_temperature"],
+        "precipitation": data["precipitation"],
+        "cloud_cover": data["cloud_cover"],
+        "is_day": data["is_day"],
+        "weather_code": data["weather_code"],
+        "wind_speed": data["wind_speed_10m"],
+        # Az Open-Meteo 'time' mezője (timezone paraméter nélkül GMT), a 'current' blokk 15 percenként frissül
+        "observed_at": datetime.fromisoformat(data["time"]) if data.get("time") else None,
+    }
+
+def _parse_current_item(city: models.City, item: Dict) -> Dict:
+    return _parse_current(city, item["current"])
+
+async def _fetch_chunk(
+    client: upstream.UpstreamClient,
+    chunk: List[models.City],
+    query: Optional[Dict] = None,
+    parse: Callable[[models.City, Dict], Dict] = _parse_current_item,
+) -> Dict[int, Dict]:
+    """Egyetlen kérésben lekéri egy városcsoport adatait (vesszővel elválasztott koordináta-listák).
+
+    A query a lekért blokkot adja meg (alapból a 'current' mezők), a parse egy helyszín válaszát alakítja át.
+    """
+    params = {
+        "latitude": ",".join(str(city.latitude) for city in chunk),
+        "longitude": ",".join(str(city.longitude) for city in chunk),
+        **(query or {"current": CURRENT_FIELDS}),
+    }
+    try:
+        response = await client.get(OPEN_METEO_URL, params=params)
+        if response.status_code == 429:
+            raise RateLimitedError(parse_retry_after(response.headers.get("Retry-After")))
+        response.raise_for_status()
+        payload = response.json()
+    except RateLimitedError:
+        _count_fetches(chunk, "rate_limited")
+        raise
+    except Exception as e:
+        logger.error(f"Hiba {len(chunk)} város kötegelt lekérésekor: {e}")
+        _count_fetches(chunk, "error")
+        return {}
+
+    # Egy helyszín esetén objektumot, több esetén a kérés sorrendjét követő listát kapunk
+    if isinstance(payload, dict):
+        payload = [payload]
+    if len(payload) != len(chunk):
+        logger.error(f"Váratlan válaszméret: {len(payload)} elem {len(chunk)} városra.")
+        _count_fetches(chunk, "error")
+        return {}
+
+    results = {}
+    for city, item in zip(chunk, payload):
         try:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()["current"]
-            
-            return {
-                "city_id": city.id,
-                "temperature": data["temperature_2m"],
-                "humidity": int(data["relative_humidity_2m"]),
-                "apparent_temperature": data["apparent_temperature"],
-                "precipitation": data["precipitation"],
-                "cloud_cover": data["cloud_cover"],
-                "is_day": data["is_day"],
-                "weather_code": data["weather_code"],
-                "wind_speed": data["wind_speed_10m"]
-            }
-        except Exception as e:
+            results[city.id] = parse(city, item)
+            UPSTREAM_FETCHES.inc("ok")
+        except (KeyError, TypeError, ValueError) as e:
             logger.error(f"Hiba {city.city_name} lekérésekor: {e}")
-            return None
+            UPSTREAM_FETCHES.inc("error")
+    return results
+
+def _count_fetches(chunk: List[models.City], outcome: str):
+    UPSTREAM_FETCHES.inc(outcome, amount=len(chunk))
+
+@timed()
+async def fetch_weather_data_batch(
+    cities: List[models.City],
+    chunk_size: Optional[int] = None,
+    client: Optional[upstream.UpstreamClient] = None,
+    query: Optional[Dict] = None,
+    parse: Callable[[models.City, Dict], Dict] = _parse_current_item,
+) -> Dict[int, Dict]:
+    """Kötegelten lekéri több város aktuális időjárását (vagy a query szerinti blokkot), City.id szerint.
+
+    A csoportok párhuzamosan, a megosztott kliens párhuzamossági korlátja alatt mennek ki.
+    A hiányzó kulcsok a sikertelen lekéréseket jelzik. Ha az upstream 429-cel válaszol,
+    RateLimitedError-t dob, amely a többi csoport eredményét is tartalmazza.
+    """
+    chunk_size = chunk_size or OPEN_METEO_BATCH_SIZE
+    client = client or upstream.current()
+    if client is None:
+        # Alkalmazáson kívüli használat (tesztek, szkriptek): ideiglenes kliens
+        async with upstream.UpstreamClient() as temp_client:
+            return await fetch_weather_data_batch(cities, chunk_size, temp_client, query, parse)
+
+    chunks = [cities[start:start + chunk_size] for start in range(0, len(cities), chunk_size)]
+    results, rate_limit = {}, None
+    for part in await asyncio.gather(*(_fetch_chunk(client, chunk, query, parse) for chunk in chunks), return_exceptions=True):
+        if isinstance(part, RateLimitedError):
+            rate_limit = max(rate_limit or 0, part.retry_after)
+        elif isinstance(part, BaseException):
+            raise part
+        else:
+            results.update(part)
+    if rate_limit is not None:
+        raise RateLimitedError(rate_limit, results)
+    return results
+
+# Manuális (/weather/update) lekérések: városonként egy folyamatban lévő kérés és rövid ideig tárolt válasz
+current_weather_cache = upstream.SingleFlightCache()
+
+async def fetch_weather_data(city: models.City) -> Optional[Dict]:
+    """Aszinkron módon lekéri az aktuális időjárási adatokat az Open-Meteo API-tól egy adott város koordinátái alapján.
+
+    Az egyidejű hívások ugyanarra a városra egyetlen upstream kérést osztanak meg, a friss választ pedig
+    UPSTREAM_CACHE_SECONDS ideig újra felhasználjuk.
+    """
+    async def fetch():
+        results = await fetch_weather_data_batch([city])
+        return results.get(city.id)
+
+    return await current_weather_cache.get(city.id, fetch)
 
 def get_cities(db: Session):
     """Lekéri az összes mentett várost az adatbázisból."""
     return db.query(models.City).all()
 
+# A válaszsémák mezőinek megfelelő oszlopok a gyors (ORM és Pydantic nélküli) szerializáláshoz
+CITY_COLUMNS = tuple(getattr(models.City, name) for name in serialization.CITY_FIELDS)
+WEATHER_COLUMNS = tuple(getattr(models.WeatherData, name) for name in serialization.WEATHER_FIELDS)
+
+def get_city_rows(db: Session) -> List[Tuple]:
+    """A get_cities gyors változata: a CityResponse mezőinek sorai (Core végrehajtás, ORM objektumok nélkül)."""
+    return db.connection().execute(select(*CITY_COLUMNS)).all()
+
+# Alapértelmezett városok, amelyekkel az üres adatbázis feltöltődik
+DEFAULT_CITIES = [
+    {"city_name": "Budapest", "latitude": 47.49, "longitude": 19.04},
+    {"city_name": "Debrecen", "latitude": 47.53, "longitude": 21.62},
+    {"city_name": "Szeged", "latitude": 46.25, "longitude": 20.14},
+    {"city_name": "Miskolc", "latitude": 48.10, "longitude": 20.78},
+    {"city_name": "Pécs", "latitude": 46.07, "longitude": 18.23},
+    {"city_name": "Győr", "latitude": 47.68, "longitude": 17.63},
+    {"city_name": "Nyíregyháza", "latitude": 47.95, "longitude": 21.72},
+    {"city_name": "Kecskemét", "latitude": 46.89, "longitude": 19.69},
+    {"city_name": "Székesfehérvár", "latitude": 47.19, "longitude": 18.41},
+    {"city_name": "Eger", "latitude": 47.90, "longitude": 20.37}
+]
+
+def seed_default_cities(db: Session) -> List[models.City]:
+    """Ha üres az adatbázis, felveszi az alapértelmezett városokat."""
+    if db.query(models.City.id).first() is not None:
+        return []
+    return [create_city(db, schemas.CityCreate(**city_data)) for city_data in DEFAULT_CITIES]
+
+def get_latest_timestamps(db: Session) -> Dict[int, datetime]:
+    """Városonként a legutolsó mérés időpontja (az ütemező ebből számolja a következő esedékességet)."""
+    rows = db.execute(select(models.WeatherData.city_id, func.max(models.WeatherData.timestamp)).group_by(models.WeatherData.city_id))
+    return {city_id: timestamp for city_id, timestamp in rows}
+
+def get_city_by_name(db: Session, city_name: str) -> Optional[models.City]:
+    """Név alapján keres meg egy várost."""
+    return db.query(models.City).filter(models.City.city_name == city_name).first()
+
 def create_city(db: Session, city: schemas.CityCreate):
     """Új várost hoz létre az adatbázisban."""
-    db_city = models.City(**city.dict())
+    db_city = models.City(**city.model_dump())
     db.add(db_city)
     db.commit()
     db.refresh(db_city)
+    cache.response_cache.invalidate(cache.CITY_LIST_TAG)
+    geo.city_index.add([db_city])
     return db_city
 
 # DB logika
+@timed()
 def save_weather(db: Session, weather_data: schemas.WeatherCreate):
-    """Elment egy időjárási mérési rekordot az adatbázisba."""
-    db_weather = models.WeatherData(**weather_data.dict())
-    db.add(db_weather)
+    """Elment egy időjárási mérési rekordot az adatbázisba.
+
+    Ha ugyanannak a városnak ugyanez az upstream mérése (observed_at) már szerepel, nem ír új sort,
+    hanem a meglévőt adja vissza.
+    """
+    saved = _insert_new_weather(db, [weather_data.model_dump()])
+    if not saved:
+        return db.scalars(
+            select(models.WeatherData).where(
+                models.WeatherData.city_id == weather_data.city_id,
+                models.WeatherData.observed_at == weather_data.observed_at,
+            )
+        ).one()
+    db_weather = saved[0]
+    rollups.apply(db, saved)
     db.commit()
     db.refresh(db_weather)
+    cache.response_cache.invalidate_cities([db_weather.city_id])
+    hotstore.hot_store.append([db_weather])
+    pubsub.broker.publish([db_weather])
     return db_weather
 
-def get_history(db: Session, limit: int = 20):
-    """Lekéri a legfrissebb időjárási előzményeket az adatbázisból."""
-    return db.query(models.WeatherData).order_by(models.WeatherData.timestamp.desc()).limit(limit).all()
\ No newline at end of file
+@timed()
+def save_weather_batch(db: Session, weather_items: List[schemas.WeatherCreate]) -> List[models.WeatherData]:
+    """Egy teljes frissítési ciklus mérési rekordjait egyetlen tranzakcióban, egy többsoros INSERT ... RETURNING utasítással menti el.
+
+    A már tárolt (city_id, observed_at) mérések kimaradnak; csak az új sorokat adja vissza.
+    """
+    if not weather_items:
+        return []
+    saved = _insert_new_weather(db, [item.model_dump() for item in weather_items])
+    # Leválasztjuk a betöltött objektumokat, így a commit nem jelöli őket lejártnak (nincs soronkénti újraolvasás)
+    for record in saved:
+        db.expunge(record)
+    if not saved:
+        db.commit()
+        return []
+    rollups.apply(db, saved)
+    db.commit()
+    cache.response_cache.invalidate_cities(record.city_id for record in saved)
+    hotstore.hot_store.append(saved)
+    pubsub.broker.publish(saved)
+    return saved
+
+def _insert_new_weather(db: Session, rows: List[Dict]) -> List[models.WeatherData]:
+    """INSERT ... ON CONFLICT (city_id, observed_at) DO NOTHING RETURNING: a duplikált mérések nem kerülnek vissza."""
+    stmt = (
+        dialect_insert(db.get_bind(), models.WeatherData)
+        .on_conflict_do_nothing(index_elements=[models.WeatherData.city_id, models.WeatherData.observed_at])
+        .returning(models.WeatherData)
+    )
+    if len(rows) == 1:
+        return list(db.scalars(stmt.values(**rows[0])))
+    return list(db.scalars(stmt, rows))
+
+# Statisztikázható mezők és a válaszkulcsokban használt rövid nevük (a temperature -> temp a régi kulcsok miatt)
+STAT_METRICS = {
+    "temperature": "temp",
+    "apparent_temperature": "apparent_temp",
+    "humidity": "humidity",
+    "precipitation": "precipitation",
+    "cloud_cover": "cloud_cover",
+    "wind_speed": "wind_speed",
+}
+STAT_GROUP_BY = ("city", "hour", "day")
+
+def filter_weather(stmt, city_id: Optional[int], start: Optional[datetime], end: Optional[datetime]):
+    """Város és [start, end) időtartomány szűrés a weather_history táblára."""
+    if city_id is not None:
+        stmt = stmt.where(models.WeatherData.city_id == city_id)
+    if start is not None:
+        stmt = stmt.where(models.WeatherData.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(models.WeatherData.timestamp < end)
+    return stmt
+
+def _percentile_values(db: Session, column, group_expr, percentiles, city_id, start, end) -> Dict:
+    """Legközelebbi rang szerinti percentilisek ablakfüggvényekkel, csoportonként: {csoport: {p: érték}}.
+
+    Soronként csak a rangot számolja az adatbázis, Pythonba csak a kért rangú sorok jönnek át.
+    """
+    partition = [group_expr] if group_expr is not None else []
+    group_col = group_expr if group_expr is not None else literal(None)
+    ranked = filter_weather(
+        select(
+            group_col.label("grp"),
+            column.label("value"),
+            func.row_number().over(partition_by=partition, order_by=column).label("rn"),
+            func.count().over(partition_by=partition).label("n"),
+        ).where(column.isnot(None)),
+        city_id, start, end,
+    ).subquery()
+    # rang = ceil(n * p / 100), egész aritmetikával, hogy SQLite-on és PostgreSQL-en is ugyanúgy működjön
+    targets = [(ranked.c.n * p + 99) // 100 for p in percentiles]
+    rows = db.execute(
+        select(ranked.c.grp, ranked.c.n, ranked.c.rn, ranked.c.value).where(or_(*(ranked.c.rn == t for t in targets)))
+    )
+
+    values = {}
+    for grp, n, rn, value in rows:
+        for p in percentiles:
+            if (n * p + 99) // 100 == rn:
+                values.setdefault(grp, {})[p] = value
+    return values
+
+@timed()
+def get_weather_stats(
+    db: Session,
+    city_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    metrics: List[str] = ("temperature",),
+    percentiles: List[int] = (),
+    group_by: Optional[str] = None,
+):
+    """SQL oldali aggregáció (count/avg/min/max és percentilisek) a mérési adatokon.
+
+    Csoportosítás nélkül egyetlen szótárat ad vissza (avg_temp, min_temp, ... kulcsokkal),
+    group_by=city|hour|day esetén csoportonként egy-egy szótárat tartalmazó listát.
+    """
+    unknown = [m for m in metrics if m not in STAT_METRICS]
+    if unknown:
+        raise ValueError(f"Ismeretlen mező: {', '.join(unknown)}")
+    if group_by is not None and group_by not in STAT_GROUP_BY:
+        raise ValueError(f"Ismeretlen csoportosítás: {group_by}")
+    if any(not 1 <= p <= 100 for p in percentiles):
+        raise ValueError("A percentilisnek 1 és 100 közé kell esnie.")
+
+    if group_by is None:
+        # A legfrissebb mérésekre vonatkozó kérdéseket a memóriabeli tár szolgálja ki, ha lefedi a tartományt
+        stats = hotstore.hot_store.weather_stats(city_id, start, end, {m: STAT_METRICS[m] for m in metrics}, percentiles)
+        if stats is not None:
+            return stats
+
+    if group_by == "city":
+        group_expr, group_key = models.WeatherData.city_id, "city_id"
+    elif group_by in ("hour", "day"):
+        group_expr, group_key = time_bucket(db.get_bind(), models.WeatherData.timestamp, group_by), "bucket"
+    else:
+        group_expr, group_key = None, None
+
+    columns = [func.count(models.WeatherData.id).label("count")]
+    for metric in metrics:
+        column, alias = getattr(models.WeatherData, metric), STAT_METRICS[metric]
+        columns += [
+            func.avg(column).label(f"avg_{alias}"),
+            func.max(column).label(f"max_{alias}"),
+            func.min(column).label(f"min_{alias}"),
+        ]
+    if group_expr is not None:
+        stmt = select(group_expr.label("grp"), *columns).group_by(group_expr).order_by(group_expr)
+    else:
+        stmt = select(literal(None).label("grp"), *columns)
+    rows = db.execute(filter_weather(stmt, city_id, start, end)).mappings().all()
+
+    pct = {}
+    if percentiles:
+        for metric in metrics:
+            column = getattr(models.WeatherData, metric)
+            pct[metric] = _percentile_values(db, column, group_expr, percentiles, city_id, start, end)
+
+    groups = []
+    for row in rows:
+        stats = {"count": row["count"]}
+        for metric in metrics:
+            alias = STAT_METRICS[metric]
+            for agg in ("avg", "max", "min"):
+                value = row[f"{agg}_{alias}"]
+                # Üres halmaznál a régi végponthoz hasonlóan 0-t adunk vissza
+                stats[f"{agg}_{alias}"] = 0 if value is None else (round(value, 2) if agg == "avg" else value)
+            for p in percentiles:
+                stats[f"p{p}_{alias}"] = pct[metric].get(row["grp"], {}).get(p, 0)
+        if group_key == "bucket":
+            stats = {"bucket": bucket_value(row["grp"]).isoformat(), **stats}
+        elif group_key:
+            stats = {group_key: row["grp"], **stats}
+        groups.append(stats)
+
+    if group_expr is None:
+        return groups[0]
+    return groups
+
+@timed()
+def get_history(
+    db: Session,
+    city_id: Optional[int] = None,
+    limit: int = 20,
+    before: Optional[Tuple[datetime, int]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[models.WeatherData]:
+    """Lekéri a legfrissebb időjárási előzményeket az adatbázisból (timestamp, id) szerint csökkenő sorrendben.
+
+    A before egy (timestamp, id) kurzor: csak az annál régebbi sorok jönnek vissza, így a
+    lapozás az indexen folytatódik, és mélyen a múltban sem kell átugrani sorokat (keyset lapozás).
+    """
+    return list(db.scalars(history_query(city_id, limit, before, start, end)))
+
+@timed()
+def get_history_rows(
+    db: Session,
+    city_id: Optional[int] = None,
+    limit: int = 20,
+    before: Optional[Tuple[datetime, int]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Tuple]:
+    """A get_history gyors változata: a WeatherResponse mezőinek sorai (Core végrehajtás, ORM objektumok nélkül)."""
+    return db.connection().execute(history_query(city_id, limit, before, start, end, columns=WEATHER_COLUMNS)).all()
+
+def history_query(city_id=None, limit=20, before=None, start=None, end=None, columns=None):
+    """A get_history SELECT utasítása (külön, hogy a lekérdezési terv tesztelhető legyen); columns esetén csak azokat az oszlopokat kéri le."""
+    stmt = filter_weather(select(*columns) if columns else select(models.WeatherData), city_id, start, end)
+    if before is not None:
+        stmt = stmt.where(tuple_(models.WeatherData.timestamp, models.WeatherData.id) < tuple_(*before))
+    return stmt.order_by(models.WeatherData.timestamp.desc(), models.WeatherData.id.desc()).limit(limit)
+
+@timed()
+def get_dashboard(db: Session, city_id: Optional[int] = None, limit: int = 20) -> Dict:
+    """A dashboard egy kéréses adatcsomagja: városlista, a kiválasztott város statisztikája és előzményei.
+
+    Ha nincs megadva város, az első várost választja, így a kliens első betöltéskor sem kérdez kétszer.
+    A városok és az előzmények sima sorok (CITY_FIELDS, illetve WEATHER_FIELDS sorrendben), a JSON-t a serialization modul készíti.
+    """
+    cities = get_city_rows(db)
+    if city_id is None and cities:
+        city_id = cities[0].id
+    history = hotstore.hot_store.history(city_id, limit)
+    return {
+        "city_id": city_id,
+        "cities": cities,
+        "stats": get_weather_stats(db, city_id=city_id),
+        "history": history if history is not None else get_history_rows(db, city_id=city_id, limit=limit),
+    }
+
+def encode_cursor(record: models.WeatherData) -> str:
+    """Lapozási kurzor a következő oldalhoz: '<ISO időbélyeg>,<id>'."""
+    return f"{record.timestamp.isoformat()},{record.id}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """A kurzor visszaalakítása; hibás formátumnál ValueError-t dob."""
+    timestamp, record_id = cursor.rsplit(",", 1)
+    return datetime.fromisoformat(timestamp), int(record_id)
+
+# Aszinkron változatok: a szinkron logikát az AsyncSession.run_sync futtatja greenletben, így az
+# adatbázis I/O az aszinkron driveren (aiosqlite / asyncpg) megy, és nem blokkolja az eseményhurkot.
+async def get_cities_async(db: AsyncSession) -> List[models.City]:
+    return await db.run_sync(get_cities)
+
+async def get_city_by_name_async(db: AsyncSession, city_name: str) -> Optional[models.City]:
+    return await db.run_sync(get_city_by_name, city_name)
+
+async def create_city_async(db: AsyncSession, city: schemas.CityCreate) -> models.City:
+    return await db.run_sync(create_city, city)
+
+async def save_weather_async(db: AsyncSession, weather_data: schemas.WeatherCreate) -> models.WeatherData:
+    return await db.run_sync(save_weather, weather_data)
+
+async def save_weather_batch_async(db: AsyncSession, weather_items: List[schemas.WeatherCreate]) -> List[models.WeatherData]:
+    return await db.run_sync(save_weather_batch, weather_items)
+
+async def get_history_async(db: AsyncSession, **filters) -> List[models.WeatherData]:
+    return await db.run_sync(lambda session: get_history(session, **filters))
+
+async def get_history_rows_async(db: AsyncSession, **filters) -> List[Tuple]:
+    return await db.run_sync(lambda session: get_history_rows(session, **filters))
+
+async def get_city_rows_async(db: AsyncSession) -> List[Tuple]:
+    return await db.run_sync(get_city_rows)
+
+async def get_weather_stats_async(db: AsyncSession, **options):
+    return await db.run_sync(lambda session: get_weather_stats(session, **options))
+
+async def get_dashboard_async(db: AsyncSession, city_id: Optional[int] = None, limit: int = 20) -> Dict:
+    return await db.run_sync(get_dashboard, city_id, limit)
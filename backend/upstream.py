@@ -0,0 +1,185 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from .metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Kapcsolatkészlet beállításai (.env-ben felülírhatók)
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", 8))
+UPSTREAM_MAX_PER_HOST = int(os.getenv("UPSTREAM_MAX_PER_HOST", 4))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", 20))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", 10))
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", 10))
+# Ennyi ideig szolgáljuk ki ugyanannak a kulcsnak (pl. városnak) a legutóbbi upstream válaszát
+UPSTREAM_CACHE_SECONDS = float(os.getenv("UPSTREAM_CACHE_SECONDS", 60))
+
+# HTTP/2 csak akkor, ha a h2 csomag telepítve van
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class UpstreamClient:
+    """Alkalmazás-élettartamú, keep-alive kapcsolatkészletet használó httpx kliens korlátozott párhuzamossággal."""
+
+    def __init__(
+        self,
+        max_concurrency: int = UPSTREAM_MAX_CONCURRENCY,
+        max_per_host: int = UPSTREAM_MAX_PER_HOST,
+        max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive: int = UPSTREAM_MAX_KEEPALIVE,
+        timeout: float = UPSTREAM_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.latency = LatencyHistogram()
+        self.waiting = 0
+        self.in_flight = 0
+        self.errors = 0
+
+    async def start(self):
+        # A szemaforokat a futó eseményhurokban hozzuk létre
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout, http2=HTTP2_AVAILABLE)
+        return self
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_semaphores[host]
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET kérés a globális és a hosztonkénti párhuzamossági korlát alatt."""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            async with self._host_semaphore(url):
+                self.in_flight += 1
+                start = time.perf_counter()
+                try:
+                    return await self._client.get(url, **kwargs)
+                except Exception:
+                    self.errors += 1
+                    raise
+                finally:
+                    self.in_flight -= 1
+                    self.latency.observe(time.perf_counter() - start)
+        finally:
+            self._semaphore.release()
+
+    def _connections(self) -> List:
+        # A httpx nem ad nyilvános API-t a készlethez, ezért óvatosan érjük el a httpcore poolt
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+    def stats(self) -> Dict:
+        connections = self._connections()
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "max_concurrency": self.max_concurrency,
+            "max_per_host": self.max_per_host,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "in_flight": self.in_flight,
+            "waiters": self.waiting,
+            "errors": self.errors,
+            "latency_seconds": self.latency.snapshot(),
+        }
+
+
+class SingleFlightCache:
+    """Rövid életű, kulcsonkénti upstream gyorsítótár egyesített (single-flight) lekéréssel.
+
+    Ugyanarra a kulcsra egyszerre érkező hívások egyetlen folyamatban lévő lekérést várnak meg; a nem üres
+    eredményt ttl másodpercig a további hívások is megkapják. Hibát és üres eredményt nem tárolunk.
+    """
+
+    def __init__(self, ttl: float = UPSTREAM_CACHE_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._values: Dict[Hashable, Tuple[float, object]] = {}
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.fetches = 0
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        cached = self._values.get(key)
+        if cached is not None and cached[0] > self._clock():
+            self.hits += 1
+            return cached[1]
+        task = self._in_flight.get(key)
+        if task is None:
+            self.fetches += 1
+            task = self._in_flight[key] = asyncio.ensure_future(fetch())
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # A shield miatt egy megszakított (pl. bontott kapcsolatú) hívó nem szakítja meg a többiek lekérését
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled() and task.exception() is None and task.result():
+            self._values[key] = (self._clock() + self.ttl, task.result())
+
+    def clear(self):
+        self._values.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "ttl_seconds": self.ttl,
+            "entries": len(self._values),
+            "in_flight": len(self._in_flight),
+            "fetches": self.fetches,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+        }
+
+
+# Az alkalmazás által birtokolt megosztott kliens (FastAPI startup/shutdown kezeli)
+_shared_client: Optional[UpstreamClient] = None
+
+
+def current() -> Optional[UpstreamClient]:
+    """Visszaadja a megosztott klienst, ha az alkalmazás már elindította."""
+    return _shared_client
+
+
+async def startup():
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = await UpstreamClient().start()
+        logger.info(f"Upstream kapcsolatkészlet elindítva (HTTP/2: {HTTP2_AVAILABLE}).")
+
+
+async def shutdown():
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.close()
+        _shared_client = None
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# A backend.main importálásakor létrejövő alapértelmezett adatbázis ne a munkakönyvtárba kerüljön
+# (a csomag importja minden benchmark szkript előtt, még a backend modulok betöltése előtt lefut)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'weather.db')}")
@@ -0,0 +1,127 @@
+"""/analytics: soronkénti Python ciklus ORM objektumokon vs. numpy/pandas oszlopos számítás.
+
+Futtatás: python -m benchmarks.bench_analytics --cities 1000 --rows-per-city 1000
+"""
+import argparse
+import math
+import statistics
+from datetime import datetime, timedelta
+
+from backend import analytics, models
+from benchmarks.common import emit, fill_history, make_cities, temp_database, timer
+
+START = datetime(2024, 1, 1)
+STEP = timedelta(minutes=30)
+
+
+def _window(rows, i, seconds, include_current):
+    """A korábbi város-szintű ciklusok mintája: visszafelé lépked a sor saját városának ablakán."""
+    row, values = rows[i], [rows[i].temperature] if include_current else []
+    j = i - 1
+    while j >= 0 and rows[j].city_id == row.city_id and (row.timestamp - rows[j].timestamp).total_seconds() <= seconds:
+        values.append(rows[j].temperature)
+        j -= 1
+    return values
+
+
+def _load(db, start, end, city_id=None):
+    query = db.query(models.WeatherData).filter(models.WeatherData.timestamp >= start, models.WeatherData.timestamp < end)
+    if city_id is not None:
+        query = query.filter(models.WeatherData.city_id == city_id)
+    return query.order_by(models.WeatherData.city_id, models.WeatherData.timestamp).all()
+
+
+def naive_trend(db, city_id, start, end, window_hours):
+    rows = _load(db, start - timedelta(hours=window_hours), end, city_id)
+    return [statistics.fmean(_window(rows, i, window_hours * 3600, True)) for i, row in enumerate(rows) if row.timestamp >= start]
+
+
+def naive_anomalies(db, start, end, baseline_hours, threshold, min_samples):
+    rows = _load(db, start - timedelta(hours=baseline_hours), end)
+    flagged = 0
+    for i, row in enumerate(rows):
+        if row.timestamp < start:
+            continue
+        window = _window(rows, i, baseline_hours * 3600, False)
+        if len(window) < min_samples:
+            continue
+        std = statistics.stdev(window)
+        if std > 0 and abs(row.temperature - statistics.fmean(window)) / std >= threshold:
+            flagged += 1
+    return flagged
+
+
+def naive_ranking(db, now, max_age_hours, limit):
+    latest = {}
+    for row in _load(db, now - timedelta(hours=max_age_hours), now + timedelta(days=1)):
+        latest[row.city_id] = row.temperature
+    return sorted(latest.values(), reverse=True)[:limit]
+
+
+def measure(fn, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        with timer() as elapsed:
+            result = fn()
+        best = min(best, elapsed["seconds"])
+    return round(best, 4), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--rows-per-city", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=1.5, help="Z-score küszöb (az egyenletes szintetikus adatban 3 felett alig van anomália)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal):
+        db = SessionLocal()
+        try:
+            city_ids = [c.id for c in make_cities(db, args.cities)]
+            with timer() as load:
+                total = fill_history(db, city_ids, args.rows_per_city, START, STEP)
+            end = START + args.rows_per_city * STEP
+            day = end - timedelta(days=1)
+            results = {"rows": total, "cities": args.cities, "load_seconds": round(load["seconds"], 2)}
+
+            def compare(name, naive, vectorized, same):
+                naive_seconds, expected = measure(lambda: (naive(), db.expunge_all())[0], args.repeat)
+                vector_seconds, actual = measure(vectorized, args.repeat)
+                results[name] = {
+                    "naive_seconds": naive_seconds,
+                    "vectorized_seconds": vector_seconds,
+                    "speedup": round(naive_seconds / vector_seconds, 1) if vector_seconds else None,
+                    "results_match": same(expected, actual),
+                }
+
+            compare(
+                "trend_single_city",
+                lambda: naive_trend(db, city_ids[0], day, end, 24),
+                lambda: analytics.trend(db, city_ids[0], start=day, end=end, window_hours=24),
+                lambda expected, actual: all(
+                    math.isclose(e, p["rolling_mean"], abs_tol=0.006) for e, p in zip(expected, actual["points"])
+                ) and len(expected) == len(actual["points"]),
+            )
+            compare(
+                "anomalies_all_cities",
+                lambda: naive_anomalies(db, day, end, 168, args.threshold, 24),
+                lambda: analytics.anomalies(db, start=day, end=end, baseline_hours=168, threshold=args.threshold, limit=10),
+                lambda expected, actual: expected == actual["flagged"],
+            )
+            compare(
+                "ranking_all_cities",
+                lambda: naive_ranking(db, end, 3, 10),
+                lambda: analytics.ranking(db, limit=10, now=end),
+                lambda expected, actual: expected == [row["value"] for row in actual["ranking"]],
+            )
+            with timer() as corr:
+                analytics.correlation(db, city_ids[: analytics.ANALYTICS_MAX_CORRELATION_CITIES], start=end - timedelta(days=7), end=end)
+            results["correlation_seconds"] = round(corr["seconds"], 4)
+        finally:
+            db.close()
+    emit("analytics", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""/weather/history késleltetése (p50/p95/p99) párhuzamos olvasókkal, miközben egy frissítési ciklus ír.
+
+Két írási módot hasonlít össze:
+  sync  - a korábbi viselkedés: a szinkron save_weather_batch közvetlenül az eseményhurkon fut
+  async - save_weather_batch_async (AsyncSession + aiosqlite), az eseményhurok szabad marad
+
+Futtatás: python -m benchmarks.bench_async_latency --cities 500 --readers 20 --seconds 5
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from backend import cache, services
+from benchmarks.common import app_client, emit, latency_summary, make_cities, synthetic_weather, temp_database
+
+
+async def run_mode(mode: str, cities: int, readers: int, seconds: float) -> dict:
+    with temp_database() as (engine, SessionLocal):
+        sync_db = SessionLocal()
+        city_ids = [c.id for c in make_cities(sync_db, cities)]
+        services.save_weather_batch(sync_db, [synthetic_weather(city_id) for city_id in city_ids])
+
+        # A gyorsítótár nélküli, adatbázist érő utat mérjük
+        cache.response_cache.ttl = 0
+        deadline = time.perf_counter() + seconds
+        latencies, cycles = [], 0
+
+        async def writer(AsyncSession):
+            nonlocal cycles
+            rng = random.Random(7)
+            async with AsyncSession() as async_db:
+                while time.perf_counter() < deadline:
+                    items = [synthetic_weather(city_id, rng) for city_id in city_ids]
+                    if mode == "sync":
+                        services.save_weather_batch(sync_db, items)
+                    else:
+                        await services.save_weather_batch_async(async_db, items)
+                    cycles += 1
+                    await asyncio.sleep(0)
+
+        async def reader(client):
+            rng = random.Random()
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get("/weather/history", params={"city_id": rng.choice(city_ids), "limit": 50})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        try:
+            async with app_client(engine) as (client, AsyncSession):
+                await asyncio.gather(writer(AsyncSession), *(reader(client) for _ in range(readers)))
+        finally:
+            cache.response_cache.ttl = cache.RESPONSE_CACHE_TTL_SECONDS
+            sync_db.close()
+
+    return {"write_cycles": cycles, "rows_per_cycle": cities, **latency_summary(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    emit("history_latency_during_refresh", {
+        mode: asyncio.run(run_mode(mode, args.cities, args.readers, args.seconds)) for mode in ("sync", "async")
+    })
+
+
+if __name__ == "__main__":
+    main()
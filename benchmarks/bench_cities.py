@@ -0,0 +1,110 @@
+"""Tömeges városimport és legközelebbi város keresés: rácsindex vs. numpy teljes átnézés vs. soronkénti Python ciklus.
+
+A szintetikus városok GeoNames-szerűen csomósak (sűrű foltok városok körül, szórványos pontok a szárazföldeken),
+a lekérdezések fele a foltokba, fele véletlenszerűen a földgömbre esik.
+
+Futtatás: python -m benchmarks.bench_cities --cities 100000 --queries 2000
+"""
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from backend import city_import, geo
+from benchmarks.common import emit, latency_summary, temp_database, timer
+
+
+def synthetic_csv(count: int, rng: random.Random) -> bytes:
+    centers = [(rng.uniform(-45, 65), rng.uniform(-130, 150)) for _ in range(200)]
+    lines = ["city_name,latitude,longitude"]
+    for i in range(count):
+        if i % 4:
+            lat, lon = rng.choice(centers)
+            lat, lon = lat + rng.gauss(0, 1.5), lon + rng.gauss(0, 2.0)
+        else:
+            lat, lon = rng.uniform(-60, 75), rng.uniform(-180, 180)
+        lines.append(f"Város {i},{max(-90.0, min(90.0, lat)):.5f},{(lon + 180) % 360 - 180:.5f}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def chunked(body: bytes, size: int = 64 * 1024):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def sample_latency(fn, queries) -> dict:
+    samples = []
+    for lat, lon in queries:
+        started = time.perf_counter()
+        fn(lat, lon)
+        samples.append(time.perf_counter() - started)
+    summary = latency_summary(samples)
+    summary["p50_us"] = round(sorted(samples)[len(samples) // 2] * 1e6, 1)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--naive-queries", type=int, default=50, help="A soronkénti ciklus lassú, ennyi lekérdezéssel mérjük")
+    args = parser.parse_args()
+    rng = random.Random(42)
+    body = synthetic_csv(args.cities, rng)
+
+    with temp_database() as (engine, SessionLocal):
+        with SessionLocal() as db:
+            with timer() as parse:
+                cities = city_import.parse_all("csv", chunked(body))
+            with timer() as first:
+                report = city_import.import_cities(db, cities)
+            with timer() as again:
+                city_import.import_cities(db, cities)
+            with timer() as load:
+                geo.city_index.load(db)
+        results = {
+            "cities": args.cities,
+            "body_mb": round(len(body) / 2**20, 2),
+            "parse_seconds": round(parse["seconds"], 2),
+            "import_seconds": round(first["seconds"], 2),
+            "reimport_upsert_seconds": round(again["seconds"], 2),
+            "index_load_seconds": round(load["seconds"], 2),
+            "inserted": report["inserted"],
+        }
+
+    index = geo.city_index
+    rows = list(cities.values())
+    lat_rad, lon_rad = np.radians([r[0] for r in rows]), np.radians([r[1] for r in rows])
+    xyz = np.column_stack([np.cos(lat_rad) * np.cos(lon_rad), np.cos(lat_rad) * np.sin(lon_rad), np.sin(lat_rad)])
+    hotspots = [rows[rng.randrange(len(rows))] for _ in range(args.queries // 2)]
+    queries = [(lat + rng.uniform(-0.5, 0.5), lon) for lat, lon in hotspots]
+    queries = [(max(-90.0, min(90.0, lat)), lon) for lat, lon in queries]
+    queries += [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(args.queries - len(queries))]
+
+    def numpy_scan(lat, lon):
+        dots = xyz @ np.array(geo.unit_vector(lat, lon))
+        return np.argpartition(-dots, args.k)[:args.k]
+
+    def naive(lat, lon):
+        return sorted(((geo.distance_km(lat, lon, r[0], r[1]), i) for i, r in enumerate(rows)))[:args.k]
+
+    mismatches = 0
+    for lat, lon in queries[:200]:
+        expected = sorted(xyz[numpy_scan(lat, lon)] @ np.array(geo.unit_vector(lat, lon)), reverse=True)
+        found = [math.cos(km / geo.EARTH_RADIUS_KM) for _, km in index.nearest(lat, lon, args.k)]
+        mismatches += not np.allclose(found, expected, atol=1e-9)
+
+    results["index"] = index.stats()
+    results["nearest_grid"] = sample_latency(lambda lat, lon: index.nearest(lat, lon, args.k), queries)
+    results["nearest_numpy_scan"] = sample_latency(numpy_scan, queries)
+    results["nearest_python_loop"] = sample_latency(naive, queries[:args.naive_queries])
+    results["grid_vs_numpy_mismatches"] = mismatches
+    results["speedup_p50_vs_numpy"] = round(results["nearest_numpy_scan"]["p50_us"] / results["nearest_grid"]["p50_us"], 1)
+    emit("cities", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""A dashboard egy interakciójának adatlekérési ideje: a korábbi három külön kérés vs. egyetlen /dashboard hívás.
+
+A Streamlit minden widget-interakciónál újrafuttatja a szkriptet; régen ez /cities + /weather/stats +
+/weather/history kérést jelentett, most egy /dashboard kérést (vagy a kliensoldali gyorsítótár találatánál
+egyet sem). A --rtt-ms kérésenkénti hálózati késleltetést szimulál, a szerveroldali gyorsítótár ki van kapcsolva.
+
+Futtatás: python -m benchmarks.bench_dashboard --cities 50 --rows-per-city 2000 --rtt-ms 5
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from backend import cache
+from benchmarks.common import app_client, emit, fill_history, latency_summary, make_cities, temp_database
+
+
+async def separate_requests(client, city_id: int, limit: int):
+    for url, params in (("/cities", {}), ("/weather/stats", {"city_id": city_id}), ("/weather/history", {"city_id": city_id, "limit": limit})):
+        (await client.get(url, params=params)).raise_for_status()
+
+
+async def dashboard_request(client, city_id: int, limit: int):
+    (await client.get("/dashboard", params={"city_id": city_id, "limit": limit})).raise_for_status()
+
+
+async def run(cities: int, rows_per_city: int, interactions: int, rtt_ms: float, limit: int) -> dict:
+    with temp_database() as (engine, SessionLocal):
+        with SessionLocal() as db:
+            city_ids = [c.id for c in make_cities(db, cities)]
+            fill_history(db, city_ids, rows_per_city, datetime(2024, 1, 1), timedelta(minutes=30))
+
+        async def simulated_latency(request):
+            await asyncio.sleep(rtt_ms / 1000)
+
+        cache.response_cache.ttl = 0
+        results = {}
+        try:
+            async with app_client(engine) as (client, _):
+                client.event_hooks["request"].append(simulated_latency)
+                for name, interaction in (("separate_requests", separate_requests), ("dashboard", dashboard_request)):
+                    rng = random.Random(3)
+                    samples = []
+                    for _ in range(interactions):
+                        start = time.perf_counter()
+                        await interaction(client, rng.choice(city_ids), limit)
+                        samples.append(time.perf_counter() - start)
+                    results[name] = latency_summary(samples)
+        finally:
+            cache.response_cache.ttl = cache.RESPONSE_CACHE_TTL_SECONDS
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--rows-per-city", type=int, default=2000)
+    parser.add_argument("--interactions", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=5)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    emit("dashboard_interaction", asyncio.run(run(args.cities, args.rows_per_city, args.interactions, args.rtt_ms, args.limit)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Tömeges export: átviteli sebesség (sor/s) és memóriacsúcs (tracemalloc) formátumonként.
+
+Összehasonlítási alap a régi út: /weather/history egyetlen, nagy limitű kéréssel, ami minden
+sort ORM objektumként és egyben szerializálva tart a memóriában.
+
+Futtatás: python -m benchmarks.bench_export --rows 200000
+"""
+import argparse
+import asyncio
+import tracemalloc
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend import export, schemas, services
+from backend.database import async_database_url, configure_sqlite
+from benchmarks.common import emit, fill_history, make_cities, temp_database, timer
+
+
+async def measure_export(sessions, file_format: str, rows: int) -> dict:
+    size = 0
+    tracemalloc.start()
+    with timer() as elapsed:
+        async for chunk in export.stream_export(sessions, file_format):
+            size += len(chunk)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows_per_second": round(rows / elapsed["seconds"]),
+        "bytes": size,
+        "peak_memory_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+def measure_history(SessionLocal, rows: int) -> dict:
+    history_adapter = TypeAdapter(list[schemas.WeatherResponse])
+    tracemalloc.start()
+    with timer() as elapsed:
+        with SessionLocal() as db:
+            body = history_adapter.dump_json(history_adapter.validate_python(services.get_history(db, limit=rows)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows_per_second": round(rows / elapsed["seconds"]),
+        "bytes": len(body),
+        "peak_memory_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+async def run(rows: int, cities: int) -> dict:
+    with temp_database() as (engine, SessionLocal):
+        with SessionLocal() as db:
+            city_ids = [c.id for c in make_cities(db, cities)]
+            total = fill_history(db, city_ids, rows // cities, datetime(2024, 1, 1), timedelta(minutes=10))
+
+        async_engine = create_async_engine(async_database_url(str(engine.url)))
+        configure_sqlite(async_engine.sync_engine)
+        sessions = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        try:
+            formats = [f for f in export.MEDIA_TYPES if export.PYARROW_AVAILABLE or f in ("ndjson", "csv")]
+            results = {"rows": total, "history_json": measure_history(SessionLocal, total)}
+            for file_format in formats:
+                results[f"export_{file_format}"] = await measure_export(sessions, file_format, total)
+            return results
+        finally:
+            await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--cities", type=int, default=20)
+    args = parser.parse_args()
+
+    emit("bulk_export", asyncio.run(run(args.rows, args.cities)))
+
+
+if __name__ == "__main__":
+    main()
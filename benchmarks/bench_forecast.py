@@ -0,0 +1,133 @@
+"""Órás előrejelzések: kötegelt frissítés, tömörített tárolás és kiszolgálás a helyi Open-Meteo stubbal.
+
+- frissítés: az összes város lekérése (OPEN_METEO_BATCH_SIZE helyszín kérésenként), feldolgozás, upsert;
+- tárolás: a float32 bájtsorok mérete városonként, szemben az óránként egy sort tartalmazó táblával;
+- memória: városonkénti gyorsítótár-bejegyzés (numpy tömbök) vs. a nyers JSON 'hourly' blokk vs. óránkénti szótárak;
+- kiszolgálás: /weather/forecast gyorsítótárból, hideg gyorsítótárral (DB), illetve ha minden oldalnézet upstream hívás lenne.
+
+Futtatás: python -m benchmarks.bench_forecast --cities 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from backend import forecast, models, services, upstream
+from benchmarks.common import app_client, emit, latency_summary, make_cities, temp_database
+from benchmarks.openmeteo_stub import OpenMeteoStub
+
+
+def traced_bytes(build) -> int:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def measure_memory(stub_url: str, cities, repeat_cities: int) -> dict:
+    """Városonkénti memória a három ábrázolásban (ugyanazon stub válaszokból)."""
+    sample = cities[:repeat_cities]
+    items = asyncio.run(services.fetch_weather_data_batch(sample, query=forecast.forecast_query(), parse=lambda city, item: item))
+    raw = [json.dumps(items[city.id]).encode() for city in sample]
+    now = datetime.utcnow()
+
+    def entries():
+        return [forecast.entry_from_row({**forecast.parse_hourly(city, json.loads(body)), "model_run": now}, now) for city, body in zip(sample, raw)]
+
+    def json_blocks():
+        return [json.loads(body)["hourly"] for body in raw]
+
+    def hourly_dicts():
+        rows = []
+        for body in raw:
+            hourly = json.loads(body)["hourly"]
+            rows.append([{name: hourly[field][i] for name, field in forecast.FORECAST_FIELDS.items()} for i in range(len(hourly["time"]))])
+        return rows
+
+    per_city = {}
+    for name, build in (("packed_entry", entries), ("json_hourly_block", json_blocks), ("per_hour_dicts", hourly_dicts)):
+        per_city[f"{name}_bytes"] = round(traced_bytes(build) / len(sample))
+    per_city["upstream_json_bytes"] = round(sum(map(len, raw)) / len(raw))
+    return per_city
+
+
+async def measure_endpoint(engine, city_ids, requests: int, stub) -> dict:
+    results = {}
+    async with app_client(engine) as (client, _):
+        async def sample(params_for):
+            samples = []
+            for i in range(requests):
+                started = time.perf_counter()
+                response = await client.get("/weather/forecast", params=params_for(i))
+                response.raise_for_status()
+                samples.append(time.perf_counter() - started)
+            return latency_summary(samples)
+
+        forecast.forecast_cache.clear()
+        # Hideg: minden kérés más város, a gyorsítótár üres -> egy PK olvasás
+        results["cold_db"] = await sample(lambda i: {"city_id": city_ids[i % len(city_ids)], "hours": 48})
+        results["cached"] = await sample(lambda i: {"city_id": city_ids[i % len(city_ids)], "hours": 48})
+
+    # Összehasonlítás: oldalnézetenként upstream hívás egy városra (a korábbi megközelítés költsége)
+    samples = []
+    async with upstream.UpstreamClient() as client:
+        for i in range(min(requests, 200)):
+            city = models.City(id=city_ids[i % len(city_ids)], city_name="x", latitude=47.0, longitude=19.0)
+            started = time.perf_counter()
+            await services.fetch_weather_data_batch([city], client=client, query=forecast.forecast_query(), parse=forecast.parse_hourly)
+            samples.append(time.perf_counter() - started)
+    results["upstream_per_view"] = latency_summary(samples)
+    results["upstream_requests_total"] = stub.request_count
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--memory-cities", type=int, default=200)
+    args = parser.parse_args()
+
+    with OpenMeteoStub() as stub, temp_database() as (engine, SessionLocal):
+        services.OPEN_METEO_URL = stub.url
+        with SessionLocal() as db:
+            cities = make_cities(db, args.cities)
+            city_ids = [c.id for c in cities]
+            db.expunge_all()
+
+        refresher = forecast.ForecastRefresher(SessionLocal)
+        first = asyncio.run(refresher.refresh())
+        again = asyncio.run(refresher.refresh())
+        with Session(engine) as db:
+            blob_bytes = db.scalar(select(func.sum(
+                sum((func.length(getattr(models.Forecast, name)) for name in forecast.VARIABLES), 0)
+            )))
+        hours = forecast.FORECAST_DAYS * 24
+        results = {
+            "cities": args.cities,
+            "hours_per_city": hours,
+            "refresh": {**first, "upstream_requests": stub.request_count},
+            "refresh_noop_seconds": again["seconds"],
+            "storage": {
+                "rows": args.cities,
+                "blob_bytes_per_city": round(blob_bytes / args.cities),
+                "rows_if_one_per_hour": args.cities * hours,
+            },
+        }
+        results["memory_per_city"] = measure_memory(stub.url, cities, min(args.memory_cities, args.cities))
+        results["endpoint"] = asyncio.run(measure_endpoint(engine, city_ids, args.requests, stub))
+    emit("forecast", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Memóriabeli tár: memóriaigény 1000 városonként és olvasási késleltetés az adatbázisos úthoz képest.
+
+Az adatbázisos út a korábbi /weather/history és /weather/stats viselkedése (ORM + Pydantic, illetve SQL
+aggregáció), a memóriabeli út a HotStore history / weather_stats hívása JSON szerializálással együtt.
+
+Futtatás: python -m benchmarks.bench_hotstore --cities 1000 --rows-per-city 200 --capacity 96
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from backend import hotstore, schemas, serialization, services
+from benchmarks.common import emit, fill_history, latency_summary, make_cities, temp_database
+
+START = datetime(2024, 1, 1)
+STEP = timedelta(minutes=30)
+
+
+def sample(fn, city_ids, repeat: int) -> dict:
+    rng = random.Random(5)
+    samples = []
+    for _ in range(repeat):
+        city_id = rng.choice(city_ids)
+        started = time.perf_counter()
+        fn(city_id)
+        samples.append(time.perf_counter() - started)
+    return latency_summary(samples)
+
+
+def run(cities: int, rows_per_city: int, capacity: int, repeat: int) -> dict:
+    adapter = TypeAdapter(list[schemas.WeatherResponse])
+    with temp_database() as (engine, SessionLocal):
+        with SessionLocal() as db:
+            city_ids = [c.id for c in make_cities(db, cities)]
+            fill_history(db, city_ids, rows_per_city, START, STEP)
+
+            store = hotstore.HotStore(capacity=capacity)
+            tracemalloc.start()
+            load_started = time.perf_counter()
+            store.load(db)
+            load_seconds = time.perf_counter() - load_started
+            retained, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Az utolsó nap: a tár ezt teljes egészében lefedi
+            day_start = START + STEP * (rows_per_city - 1) - timedelta(days=1)
+            metrics = list(services.STAT_METRICS)
+            aliases = {m: services.STAT_METRICS[m] for m in metrics}
+
+            results = {
+                "cities": cities,
+                "capacity_per_city": capacity,
+                "load_seconds": round(load_seconds, 3),
+                "array_bytes_per_1k_cities": round(store.stats()["bytes"] / cities * 1000),
+                "python_heap_bytes_per_1k_cities": round(retained / cities * 1000),
+                "history_db": sample(lambda c: adapter.dump_json(adapter.validate_python(services.get_history(db, city_id=c, limit=50))), city_ids, repeat),
+                "history_hot": sample(lambda c: serialization.encode(store.history(c, limit=50), serialization.WEATHER_FIELDS), city_ids, repeat),
+                "stats_last_day_db": sample(lambda c: services.get_weather_stats(db, city_id=c, start=day_start, metrics=metrics, percentiles=[50, 90]), city_ids, repeat),
+                "stats_last_day_hot": sample(lambda c: store.weather_stats(c, day_start, None, aliases, [50, 90]), city_ids, repeat),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--rows-per-city", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=hotstore.HOT_STORE_SIZE)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    emit("hot_store", run(args.cities, args.rows_per_city, args.capacity, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
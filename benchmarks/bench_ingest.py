@@ -0,0 +1,48 @@
+"""Beírási áteresztőképesség: soronkénti save_weather (hangolatlan SQLite) vs. save_weather_batch (WAL, NORMAL).
+
+Futtatás: python -m benchmarks.bench_ingest --cities 500 --cycles 5
+"""
+import argparse
+import random
+
+from backend import services
+from benchmarks.common import emit, make_cities, synthetic_weather, temp_database, timer
+
+
+def run(cities: int, cycles: int, batched: bool) -> dict:
+    rng = random.Random(42)
+    with temp_database(tuned=batched) as (engine, SessionLocal):
+        db = SessionLocal()
+        try:
+            city_ids = [c.id for c in make_cities(db, cities)]
+            with timer() as elapsed:
+                for _ in range(cycles):
+                    items = [synthetic_weather(city_id, rng) for city_id in city_ids]
+                    if batched:
+                        services.save_weather_batch(db, items)
+                    else:
+                        for item in items:
+                            services.save_weather(db, item)
+        finally:
+            db.close()
+    rows = cities * cycles
+    return {"rows": rows, "seconds": round(elapsed["seconds"], 4), "rows_per_sec": round(rows / elapsed["seconds"], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+
+    before = run(args.cities, args.cycles, batched=False)
+    after = run(args.cities, args.cycles, batched=True)
+    emit("ingest", {
+        "per_row_save_weather": before,
+        "save_weather_batch": after,
+        "speedup": round(after["rows_per_sec"] / before["rows_per_sec"], 1),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Lista végpontok szerializálása: ORM + Pydantic validálás vs. Core oszlop-tuple-ök + közvetlen JSON kódolás.
+
+Méretenként (limit) a lekérdezés + szerializálás együttes ideje, a sima (rows) és az oszlopos (columns)
+elrendezésre, orjson-nal és a szabványos json modullal is; végül a /weather/history végpont késleltetése
+az alkalmazáson át (gyorsítótár nélkül).
+
+Futtatás: python -m benchmarks.bench_serialization --cities 2000 --rows-per-city 500
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from backend import cache, schemas, serialization, services
+from benchmarks.common import app_client, emit, fill_history, latency_summary, make_cities, temp_database
+
+START = datetime(2024, 1, 1)
+STEP = timedelta(minutes=30)
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+
+def measure_encoders(db, limit: int, repeat: int) -> dict:
+    weather_adapter = TypeAdapter(list[schemas.WeatherResponse])
+
+    def pydantic_path():
+        body = weather_adapter.dump_json(weather_adapter.validate_python(services.get_history(db, limit=limit)))
+        db.expunge_all()
+        return body
+
+    def fast_path(layout: str):
+        return serialization.encode(services.get_history_rows(db, limit=limit), serialization.WEATHER_FIELDS, layout)
+
+    results = {"pydantic_ms": best_of(pydantic_path, repeat)}
+    encoders = [True, False] if serialization.ORJSON_AVAILABLE else [False]
+    for use_orjson in encoders:
+        serialization.ORJSON_AVAILABLE = use_orjson
+        name = "orjson" if use_orjson else "json"
+        for layout in serialization.LAYOUTS:
+            results[f"{name}_{layout}_ms"] = best_of(lambda: fast_path(layout), repeat)
+    serialization.ORJSON_AVAILABLE = encoders[0]
+    fastest = "orjson" if encoders[0] else "json"
+    results["bytes_rows"] = len(fast_path("rows"))
+    results["bytes_columns"] = len(fast_path("columns"))
+    results["speedup_rows"] = round(results["pydantic_ms"] / results[f"{fastest}_rows_ms"], 1)
+    return results
+
+
+def measure_cities(db, repeat: int) -> dict:
+    city_adapter = TypeAdapter(list[schemas.CityResponse])
+
+    def pydantic_path():
+        body = city_adapter.dump_json(city_adapter.validate_python(services.get_cities(db)))
+        db.expunge_all()
+        return body
+
+    return {
+        "pydantic_ms": best_of(pydantic_path, repeat),
+        "fast_ms": best_of(lambda: serialization.encode(services.get_city_rows(db), serialization.CITY_FIELDS), repeat),
+    }
+
+
+async def measure_endpoint(engine, limit: int, requests: int) -> dict:
+    cache.response_cache.ttl = 0
+    results = {}
+    async with app_client(engine) as (client, _):
+        for layout in serialization.LAYOUTS:
+            samples = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = await client.get("/weather/history", params={"limit": limit, "layout": layout})
+                response.raise_for_status()
+                samples.append(time.perf_counter() - started)
+            results[layout] = latency_summary(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--rows-per-city", type=int, default=200)
+    parser.add_argument("--limits", default="100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    limits = [int(limit) for limit in args.limits.split(",")]
+
+    with temp_database() as (engine, SessionLocal):
+        with SessionLocal() as db:
+            city_ids = [c.id for c in make_cities(db, args.cities)]
+            total = fill_history(db, city_ids, args.rows_per_city, START, STEP)
+            results = {
+                "rows": total,
+                "orjson": serialization.ORJSON_AVAILABLE,
+                "cities": measure_cities(db, args.repeat),
+                **{f"history_limit_{limit}": measure_encoders(db, limit, args.repeat) for limit in limits},
+            }
+        results[f"endpoint_limit_{max(limits)}"] = asyncio.run(measure_endpoint(engine, max(limits), args.requests))
+    emit("serialization", results)
+
+
+if __name__ == "__main__":
+    main()
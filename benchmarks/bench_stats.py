@@ -0,0 +1,67 @@
+"""/weather/stats: a korábbi ORM + list comprehension megoldás vs. SQL oldali aggregáció.
+
+Futtatás: python -m benchmarks.bench_stats --rows 10000000 --cities 1000
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from backend import models, services
+from benchmarks.common import emit, fill_history, make_cities, temp_database, timer
+
+
+def naive_stats(db, city_id=None):
+    """A korábbi implementáció: minden ORM objektum betöltése és Pythonban számolás."""
+    query = db.query(models.WeatherData)
+    if city_id:
+        query = query.filter(models.WeatherData.city_id == city_id)
+    history = query.all()
+    if not history:
+        return {"avg_temp": 0, "count": 0, "max_temp": 0, "min_temp": 0}
+    temps = [w.temperature for w in history]
+    return {"avg_temp": round(sum(temps) / len(temps), 2), "count": len(history), "max_temp": max(temps), "min_temp": min(temps)}
+
+
+def measure(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        with timer() as elapsed:
+            fn()
+        best = min(best, elapsed["seconds"])
+    return round(best, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--cities", type=int, default=100)
+    parser.add_argument("--skip-naive-all", action="store_true", help="A teljes táblás naiv mérés kihagyása (nagy sorszámnál sok memóriát igényel)")
+    args = parser.parse_args()
+
+    with temp_database() as (engine, SessionLocal):
+        db = SessionLocal()
+        try:
+            city_ids = [c.id for c in make_cities(db, args.cities)]
+            with timer() as load:
+                total = fill_history(db, city_ids, max(1, args.rows // len(city_ids)), datetime(2024, 1, 1), timedelta(minutes=30))
+            one = city_ids[0]
+
+            results = {"rows": total, "cities": args.cities, "load_seconds": round(load["seconds"], 2)}
+            results["single_city"] = {
+                "naive_seconds": measure(lambda: (naive_stats(db, one), db.expunge_all())),
+                "sql_seconds": measure(lambda: services.get_weather_stats(db, city_id=one)),
+            }
+            if not args.skip_naive_all:
+                results["all_rows"] = {
+                    "naive_seconds": measure(lambda: (naive_stats(db), db.expunge_all()), repeat=1),
+                    "sql_seconds": measure(lambda: services.get_weather_stats(db), repeat=1),
+                }
+            results["group_by_city_with_p50_p90"] = {
+                "sql_seconds": measure(lambda: services.get_weather_stats(db, group_by="city", percentiles=[50, 90]), repeat=1),
+            }
+        finally:
+            db.close()
+    emit("stats", results)
+
+
+if __name__ == "__main__":
+    main()
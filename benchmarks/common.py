@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, schemas
+from backend.database import async_database_url, configure_sqlite, get_async_db, get_async_session_factory
+
+# Kérésenkénti httpx INFO naplók nélkül
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+INSERT_CHUNK = 50_000
+
+
+@contextmanager
+def temp_database(tuned: bool = True):
+    """Ideiglenes, fájl alapú SQLite adatbázis a benchmarkokhoz; (engine, SessionLocal) párt ad vissza."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        if tuned:
+            configure_sqlite(engine)
+        models.Base.metadata.create_all(bind=engine)
+        try:
+            yield engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        finally:
+            engine.dispose()
+
+
+def make_cities(db, count: int):
+    """Szintetikus városokat ment el és visszaadja őket."""
+    cities = [
+        models.City(city_name=f"Város {i}", latitude=45.7 + (i % 300) * 0.01, longitude=16.1 + (i // 300) * 0.01)
+        for i in range(count)
+    ]
+    db.add_all(cities)
+    db.commit()
+    return cities
+
+
+def synthetic_weather(city_id: int, rng: random.Random = random) -> schemas.WeatherCreate:
+    """Véletlen, de valószerű mérési rekord."""
+    temperature = rng.uniform(-15, 35)
+    return schemas.WeatherCreate(
+        city_id=city_id,
+        temperature=round(temperature, 1),
+        humidity=rng.randint(20, 100),
+        apparent_temperature=round(temperature - rng.uniform(0, 4), 1),
+        precipitation=round(max(0.0, rng.gauss(0, 1)), 1),
+        cloud_cover=rng.randint(0, 100),
+        is_day=rng.randint(0, 1),
+        weather_code=rng.choice([0, 1, 2, 3, 45, 61, 71, 95]),
+        wind_speed=round(rng.uniform(0, 60), 1),
+    )
+
+
+def synthetic_history_rows(city_ids, rows_per_city: int, start: datetime, step: timedelta, rng: random.Random = random):
+    """Nyers sorokat (szótárakat) generál időbélyeggel, tömeges betöltéshez."""
+    for city_id in city_ids:
+        for i in range(rows_per_city):
+            row = synthetic_weather(city_id, rng).model_dump()
+            row["timestamp"] = start + i * step
+            yield row
+
+
+def fill_history(db, city_ids, rows_per_city: int, start: datetime, step: timedelta, seed: int = 1, progress=None) -> int:
+    """Tömeges betöltés Core INSERT-tel, darabokban; a betöltött sorok számát adja vissza."""
+    chunk, total = [], 0
+    for row in synthetic_history_rows(city_ids, rows_per_city, start, step, random.Random(seed)):
+        chunk.append(row)
+        if len(chunk) >= INSERT_CHUNK:
+            db.execute(insert(models.WeatherData), chunk)
+            total += len(chunk)
+            chunk = []
+            if progress:
+                progress(total)
+    if chunk:
+        db.execute(insert(models.WeatherData), chunk)
+        total += len(chunk)
+    db.commit()
+    return total
+
+
+@asynccontextmanager
+async def app_client(engine):
+    """httpx kliens a FastAPI alkalmazáshoz (ASGI, hálózat nélkül), amely a megadott adatbázist használja.
+
+    (kliens, aszinkron sessiongyár) párt ad vissza.
+    """
+    from backend.main import app
+
+    async_engine = create_async_engine(async_database_url(str(engine.url)))
+    configure_sqlite(async_engine.sync_engine)
+    sessions = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with sessions() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: sessions
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            yield client, sessions
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+
+
+@contextmanager
+def timer():
+    """Eltelt idő mérése: a visszaadott szótár 'seconds' kulcsa a blokk végén töltődik ki."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+
+def peak_rss_mb() -> float:
+    """A folyamat eddigi legnagyobb rezidens memóriája (Linuxon KB-ban, macOS-en bájtban jelenti a rendszer)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_metadata() -> dict:
+    """A futás körülményei, hogy két eredményfájl összevetésekor látszódjon, mi változott."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def emit(name: str, results: dict, output: str = None):
+    """JSON formában kiírja a benchmark eredményét, hogy futások között összehasonlítható legyen (benchmarks.compare)."""
+    document = {"benchmark": name, "meta": {**run_metadata(), "peak_rss_mb": peak_rss_mb()}, "results": results}
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+    json.dump(document, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write("\n")
+
+
+def latency_summary(samples) -> dict:
+    """Késleltetési percentilisek ezredmásodpercben."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 2)
+
+    return {"count": len(ordered), "p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99), "max_ms": round(ordered[-1] * 1000, 2)}
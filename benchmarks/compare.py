@@ -0,0 +1,74 @@
+"""Két benchmark-eredményfájl (emit kimenet) összevetése: minden számszerű mező régi és új értéke, aránya.
+
+Regressziónak számít, ha egy késleltetés / időtartam / memória mező (…_ms, …seconds, …_mb) nő, vagy egy
+áteresztőképesség mező (…_per_sec) csökken a küszöbnél jobban. Regresszió esetén a kilépési kód 1.
+
+Futtatás: python -m benchmarks.compare baseline.json results.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ("_ms", "seconds", "_mb")
+HIGHER_IS_BETTER = ("_per_sec",)
+
+
+def flatten(value, prefix: str = ""):
+    """Beágyazott szótárból "a.b.c" kulcsú, csak számokat tartalmazó szótár."""
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else key))
+        return items
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def direction(key: str) -> int:
+    """+1, ha a nagyobb érték a jobb, -1, ha a kisebb, 0, ha a mező nem teljesítménymutató."""
+    if key.endswith(HIGHER_IS_BETTER):
+        return 1
+    if key.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline: dict, current: dict, threshold: float):
+    old, new = flatten(baseline.get("results", {})), flatten(current.get("results", {}))
+    rows, regressions = [], []
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = (after - before) / before * 100 if before else 0.0
+        sign = direction(key)
+        regressed = sign != 0 and -sign * change > threshold
+        rows.append((key, before, after, change, regressed))
+        if regressed:
+            regressions.append(key)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Megengedett romlás százalékban")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for key, before, after, change, regressed in rows:
+        marker = "  << REGRESSZIÓ" if regressed else ""
+        print(f"{key:<{width}}  {before:>12g}  {after:>12g}  {change:>+8.1f}%{marker}")
+    print(f"\n{len(regressions)} regresszió ({args.threshold:g}% küszöb), commit: "
+          f"{baseline.get('meta', {}).get('commit')} -> {current.get('meta', {}).get('commit')}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
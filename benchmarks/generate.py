@@ -0,0 +1,78 @@
+"""Szintetikus adatkészlet: városok és mérési előzmények tömeges betöltése egy (tartós) adatbázisba.
+
+Az előzmények a jelenből visszafelé, egyenletes lépésközzel készülnek, így a "legutóbbi napok"
+lekérdezések (memóriabeli tár, trend) is valósághű adatot látnak. Az aggregátum táblákat a
+betöltés végén újraszámolja (--skip-rollups kihagyja).
+
+Futtatás: python -m benchmarks.generate --database-url sqlite:///bench.db --cities 2000 --rows-per-city 2500
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, rollups
+from backend.database import configure_sqlite
+from benchmarks.common import emit, fill_history, make_cities
+
+
+def generate(engine, cities: int, rows_per_city: int, step: timedelta, seed: int = 1, build_rollups: bool = True) -> dict:
+    """Üres adatbázist tölt fel; a betöltési és aggregálási időket adja vissza."""
+    models.create_schema(engine)
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+        if db.scalar(select(func.count()).select_from(models.City)):
+            raise SystemExit("Az adatbázis már tartalmaz városokat; a generátor üres adatbázist vár.")
+
+        city_ids = [c.id for c in make_cities(db, cities)]
+        start = datetime.utcnow().replace(second=0, microsecond=0) - step * rows_per_city
+        total_rows = cities * rows_per_city
+
+        def progress(done: int):
+            sys.stderr.write(f"\r{done:,} / {total_rows:,} sor")
+
+        started = time.perf_counter()
+        rows = fill_history(db, city_ids, rows_per_city, start, step, seed=seed, progress=progress)
+        load_seconds = time.perf_counter() - started
+        sys.stderr.write("\n")
+
+        result = {
+            "cities": cities,
+            "rows": rows,
+            "load_seconds": round(load_seconds, 2),
+            "rows_per_sec": round(rows / load_seconds),
+        }
+        if build_rollups:
+            started = time.perf_counter()
+            rollups.rebuild(db)
+            result["rollup_seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///bench.db")
+    parser.add_argument("--cities", type=int, default=2000)
+    parser.add_argument("--rows-per-city", type=int, default=2500)
+    parser.add_argument("--step-minutes", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-rollups", action="store_true")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name == "sqlite":
+        configure_sqlite(engine)
+    try:
+        result = generate(
+            engine, args.cities, args.rows_per_city, timedelta(minutes=args.step_minutes),
+            seed=args.seed, build_rollups=not args.skip_rollups,
+        )
+    finally:
+        engine.dispose()
+    emit("generate", result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _current_block(latitude: float, longitude: float) -> dict:
+    """Determinisztikus 'current' blokk: a hőmérséklet a szélességből számolható, így a tesztek ellenőrizhetik a város-hozzárendelést."""
+    return {
+        "time": "2024-01-01T12:00",
+        "interval": 900,
+        "temperature_2m": round(latitude - 30, 2),
+        "relative_humidity_2m": 60,
+        "apparent_temperature": round(latitude - 31, 2),
+        "precipitation": 0.0,
+        "weather_code": 3,
+        "wind_speed_10m": round(longitude / 2, 2),
+        "cloud_cover": 75,
+        "is_day": 1,
+    }
+
+
+def _hourly_block(latitude: float, longitude: float, fields, days: int, unixtime: bool) -> dict:
+    """Determinisztikus 'hourly' blokk az aktuális UTC nap éjfelétől; a hőmérséklet a szélesség körül napi ciklust ír le."""
+    start = int(time.time()) // 86400 * 86400
+    hours = range(days * 24)
+    times = [start + 3600 * h for h in hours]
+    block = {"time": times if unixtime else [time.strftime("%Y-%m-%dT%H:%M", time.gmtime(t)) for t in times]}
+    for field in fields:
+        if field == "temperature_2m":
+            block[field] = [round(latitude - 30 + 5 * math.sin(h * math.pi / 12), 1) for h in hours]
+        elif field == "apparent_temperature":
+            block[field] = [round(latitude - 31 + 5 * math.sin(h * math.pi / 12), 1) for h in hours]
+        elif field == "weather_code":
+            block[field] = [3 if h % 24 < 12 else 61 for h in hours]
+        elif field == "wind_speed_10m":
+            block[field] = [round(abs(longitude) / 2 + h % 5, 1) for h in hours]
+        else:
+            block[field] = [(h * 7) % 100 for h in hours]
+    return block
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, hogy a kapcsolatkészlet újrafelhasználása mérhető legyen
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        latitudes = [float(v) for v in query["latitude"][0].split(",")]
+        longitudes = [float(v) for v in query["longitude"][0].split(",")]
+        self.server.stub.record_request(len(latitudes))
+        try:
+            if self.server.stub.delay:
+                time.sleep(self.server.stub.delay)
+            if self.server.stub.retry_after is not None:
+                self._rate_limited(self.server.stub.retry_after)
+            else:
+                self._respond(latitudes, longitudes, query)
+        finally:
+            self.server.stub.finish_request()
+
+    def _respond(self, latitudes, longitudes, query):
+        items = []
+        for lat, lon in zip(latitudes, longitudes):
+            item = {"latitude": lat, "longitude": lon}
+            if "current" in query:
+                item["current"] = _current_block(lat, lon)
+            if "hourly" in query:
+                days = int(query.get("forecast_days", ["7"])[0])
+                unixtime = query.get("timeformat", ["iso8601"])[0] == "unixtime"
+                item["hourly"] = _hourly_block(lat, lon, query["hourly"][0].split(","), days, unixtime)
+            items.append(item)
+        # Az Open-Meteo egyetlen helyszínnél objektumot, többnél listát ad vissza
+        payload = items[0] if len(items) == 1 else items
+        body = json.dumps(payload).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rate_limited(self, retry_after: int):
+        self.send_response(429)
+        self.send_header("Retry-After", str(retry_after))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OpenMeteoStub:
+    """Helyi, szálon futó Open-Meteo utánzat tesztekhez és benchmarkokhoz. Számolja a beérkező kéréseket."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+        self._lock = threading.Lock()
+        self.delay = delay
+        # Ha be van állítva, minden kérésre 429-cel és ezzel a Retry-After értékkel válaszol
+        self.retry_after = None
+        self.request_count = 0
+        self.location_count = 0
+        self.active = 0
+        self.peak_concurrency = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/forecast"
+
+    def record_request(self, locations: int):
+        with self._lock:
+            self.request_count += 1
+            self.location_count += locations
+            self.active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.active)
+
+    def finish_request(self):
+        with self._lock:
+            self.active -= 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,190 @@
+"""Teljes benchmark- és terheléses tesztcsomag egyetlen, reprodukálható futásban.
+
+Lépések:
+  1. adatkészlet  - szintetikus városok és előzmények (benchmarks.generate) ideiglenes adatbázisban,
+                    vagy egy korábban legenerált adatbázis (--database-url)
+  2. olvasás      - /weather/history, /weather/stats és /cities késleltetési percentilisei párhuzamos kliensekkel,
+                    gyorsítótár és memóriabeli tár nélkül ("db") és velük ("warm")
+  3. beírás       - soronkénti save_weather, save_weather_batch, teljes frissítési ciklus (ütemező + Open-Meteo stub);
+                    --database-url esetén ez a fázis a megadott adatbázisba ír
+  4. memória      - a folyamat legnagyobb RSS-e minden fázis után (a növekmény mutatja, melyik fázis emelte)
+
+Az eredmény JSON (--output fájlba is); két futás összevetése: python -m benchmarks.compare regi.json uj.json
+
+Futtatás: python -m benchmarks.suite --cities 1000 --rows-per-city 1000 --clients 16 --output results.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from backend import cache, hotstore, models, services, upstream
+from backend.database import configure_sqlite
+from backend.scheduler import WeatherScheduler
+from benchmarks.common import app_client, emit, latency_summary, peak_rss_mb, synthetic_weather, timer
+from benchmarks.generate import generate
+from benchmarks.openmeteo_stub import OpenMeteoStub
+
+
+def bench_save_weather(SessionLocal, city_ids, rows: int) -> dict:
+    rng = random.Random(11)
+    with SessionLocal() as db, timer() as elapsed:
+        for _ in range(rows):
+            services.save_weather(db, synthetic_weather(rng.choice(city_ids), rng))
+    return {"rows": rows, "seconds": round(elapsed["seconds"], 3), "rows_per_sec": round(rows / elapsed["seconds"], 1)}
+
+
+def bench_save_weather_batch(SessionLocal, city_ids, cycles: int) -> dict:
+    rng = random.Random(12)
+    with SessionLocal() as db, timer() as elapsed:
+        for _ in range(cycles):
+            services.save_weather_batch(db, [synthetic_weather(city_id, rng) for city_id in city_ids])
+    rows = cycles * len(city_ids)
+    return {"rows": rows, "seconds": round(elapsed["seconds"], 3), "rows_per_sec": round(rows / elapsed["seconds"], 1)}
+
+
+async def bench_refresh_cycle(sessions, city_count: int) -> dict:
+    """Egy teljes ütemezői kör: minden város esedékes, lekérés a helyi stubtól, tömeges mentés."""
+    original_url = services.OPEN_METEO_URL
+    with OpenMeteoStub() as stub:
+        services.OPEN_METEO_URL = stub.url
+        await upstream.startup()
+        interval = 1800
+        # Két intervallummal előrébb járó, álló óra: minden város esedékes
+        frozen_now = time.time() + 2 * interval
+        scheduler = WeatherScheduler(
+            session_factory=sessions,
+            interval_seconds=interval,
+            startup_spread_seconds=0,
+            jitter_seconds=0,
+            max_batch=city_count + len(services.DEFAULT_CITIES),
+            clock=lambda: frozen_now,
+        )
+        try:
+            with timer() as elapsed:
+                await scheduler.tick()
+        finally:
+            await scheduler.stop()
+            await upstream.shutdown()
+            services.OPEN_METEO_URL = original_url
+    return {
+        "cities": scheduler.last_batch_size,
+        "seconds": round(elapsed["seconds"], 3),
+        "cities_per_sec": round(scheduler.last_batch_size / elapsed["seconds"], 1),
+        "upstream_requests": stub.request_count,
+    }
+
+
+async def load_test(client, city_ids, clients: int, requests: int, make_request) -> dict:
+    """clients darab párhuzamos kliens összesen requests kérést küld; késleltetés-percentilisek és áteresztőképesség."""
+    latencies = []
+    remaining = requests
+
+    async def worker(seed: int):
+        nonlocal remaining
+        rng = random.Random(seed)
+        while remaining > 0:
+            remaining -= 1
+            url, params = make_request(rng, city_ids)
+            started = time.perf_counter()
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    with timer() as elapsed:
+        await asyncio.gather(*(worker(seed) for seed in range(clients)))
+    return {**latency_summary(latencies), "requests_per_sec": round(len(latencies) / elapsed["seconds"], 1)}
+
+
+def read_scenarios(now: datetime):
+    day_ago = (now - timedelta(days=1)).isoformat()
+    return {
+        "history": lambda rng, ids: ("/weather/history", {"city_id": rng.choice(ids), "limit": 50}),
+        "stats": lambda rng, ids: ("/weather/stats", {"city_id": rng.choice(ids)}),
+        "stats_last_day": lambda rng, ids: ("/weather/stats", {"city_id": rng.choice(ids), "from": day_ago, "percentiles": "50,90"}),
+        "cities": lambda rng, ids: ("/cities", {}),
+    }
+
+
+async def bench_reads(engine, SessionLocal, city_ids, clients: int, requests: int, warm: bool) -> dict:
+    cache.response_cache.clear()
+    hotstore.hot_store.clear()
+    if warm:
+        with SessionLocal() as db:
+            hotstore.hot_store.load(db)
+    else:
+        cache.response_cache.ttl = 0
+    results = {}
+    try:
+        async with app_client(engine) as (client, _):
+            for name, make_request in read_scenarios(datetime.utcnow()).items():
+                results[name] = await load_test(client, city_ids, clients, requests, make_request)
+    finally:
+        cache.response_cache.ttl = cache.RESPONSE_CACHE_TTL_SECONDS
+        cache.response_cache.clear()
+        hotstore.hot_store.clear()
+    return results
+
+
+async def run(args, engine) -> dict:
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    results = {"parameters": vars(args).copy(), "memory_peak_rss_mb": {"start": peak_rss_mb()}}
+    results["parameters"].pop("output", None)
+
+    if args.database_url is None:
+        results["dataset"] = generate(engine, args.cities, args.rows_per_city, timedelta(minutes=args.step_minutes))
+    else:
+        models.create_schema(engine)
+    results["memory_peak_rss_mb"]["dataset"] = peak_rss_mb()
+
+    with SessionLocal() as db:
+        city_ids = list(db.scalars(select(models.City.id)))
+
+    results["read_latency"] = {
+        mode: await bench_reads(engine, SessionLocal, city_ids, args.clients, args.requests, warm=mode == "warm")
+        for mode in ("db", "warm")
+    }
+    results["memory_peak_rss_mb"]["reads"] = peak_rss_mb()
+
+    async with app_client(engine) as (_, sessions):
+        results["ingest"] = {
+            "save_weather": bench_save_weather(SessionLocal, city_ids, args.ingest_rows),
+            "save_weather_batch": bench_save_weather_batch(SessionLocal, city_ids, args.batch_cycles),
+            "refresh_cycle": await bench_refresh_cycle(sessions, len(city_ids)),
+        }
+    results["memory_peak_rss_mb"]["ingest"] = peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Meglévő (benchmarks.generate-tel feltöltött) adatbázis; alapból ideiglenes SQLite")
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--rows-per-city", type=int, default=1000)
+    parser.add_argument("--step-minutes", type=float, default=30)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="Kérések száma végpontonként és módonként")
+    parser.add_argument("--ingest-rows", type=int, default=1000, help="Soronkénti save_weather hívások száma")
+    parser.add_argument("--batch-cycles", type=int, default=3, help="save_weather_batch körök (minden városra egy sor)")
+    parser.add_argument("--output", default=None, help="Az eredmény JSON mentése ide is")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.database_url or f"sqlite:///{os.path.join(tmp, 'suite.db')}")
+        if engine.dialect.name == "sqlite":
+            configure_sqlite(engine)
+        try:
+            results = asyncio.run(run(args, engine))
+        finally:
+            engine.dispose()
+    emit("suite", results, output=args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,157 @@
 import streamlit as st
 import requests
 import pandas as pd
+import json
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 load_dotenv()
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# Kliensoldali gyorsítótár élettartama és a backend hívások időkorlátja (másodperc)
+FRONTEND_CACHE_TTL_SECONDS = int(os.getenv("FRONTEND_CACHE_TTL_SECONDS", 30))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", 10))
+# Élő frissítés a /weather/stream folyamból (kikapcsolva a frissítés gomb újratölti az oldalt)
+LIVE_UPDATES = os.getenv("LIVE_UPDATES", "true").lower() in ("1", "true", "yes", "on")
+LIVE_REFRESH_SECONDS = float(os.getenv("LIVE_REFRESH_SECONDS", 2))
+# Városonként ennyi élő mérést őrzünk (a legnagyobb választható limit), legfeljebb LIVE_MAX_CITIES városra
+LIVE_BUFFER_SIZE = 100
+LIVE_MAX_CITIES = int(os.getenv("LIVE_MAX_CITIES", 200))
+# A backend ennél sűrűbben küld heartbeatet, így a néma kapcsolat halottnak tekinthető
+LIVE_READ_TIMEOUT_SECONDS = 60
+
+render_started = time.perf_counter()
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """Újrahasznosított kapcsolatokkal dolgozó HTTP munkamenet, amely a Streamlit újrafuttatásai között is él."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
+@st.cache_data(ttl=FRONTEND_CACHE_TTL_SECONDS, show_spinner=False)
+def load_dashboard(city_id, limit: int) -> dict:
+    """Városlista, statisztika és előzmények egyetlen kérésben; városra és limitre kulcsolva gyorsítótárazva."""
+    # layout=columns: az előzmények oszlopos JSON-ként jönnek, így soronkénti szótárak nélkül lesz belőlük DataFrame
+    res = http_session().get(
+        f"{BACKEND_URL}/dashboard", params={"city_id": city_id, "limit": limit, "layout": "columns"}, timeout=REQUEST_TIMEOUT_SECONDS
+    )
+    res.raise_for_status()
+    return res.json()
+
+@st.cache_data(ttl=FRONTEND_CACHE_TTL_SECONDS, show_spinner=False)
+def load_series(city_id: int, days: int) -> dict:
+    """Hosszú távú trend; a kezdőidőt percre kerekítjük, hogy a gyorsítótár-kulcs stabil maradjon."""
+    range_start = (datetime.utcnow() - timedelta(days=days)).replace(second=0, microsecond=0).isoformat()
+    res = http_session().get(
+        f"{BACKEND_URL}/weather/series",
+        params={"city_id": city_id, "from": range_start, "max_points": 300},
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    )
+    res.raise_for_status()
+    return res.json()
+
+class LiveFeed:
+    """Az összes város /weather/stream eseményei egyetlen háttérszálon és kapcsolaton; a Streamlit folyamat összes
+    munkamenete osztozik rajta, a városra szűrés a kliensen történik. Így a megnézett városok számától függetlenül
+    egy feliratkozás marad a backenden; a pufferek a legrégebben használt város eldobásával LIVE_MAX_CITIES városig nőnek.
+
+    A resets számláló egy megszakadt folyam utáni sikeres újracsatlakozáskor és eldobott (dropped) eseménynél nő:
+    ilyenkor kimaradhatott mérés, a munkamenetek ezért egyszer újratöltik az előzményeket. A sikertelen
+    próbálkozások (pl. amíg a backend nem fut) nem számítanak.
+    """
+
+    def __init__(self):
+        self.resets = 0
+        self.connected = False
+        self._records: "OrderedDict[int, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, name="live-feed", daemon=True).start()
+
+    def records(self, city_id: int) -> list:
+        with self._lock:
+            buffer = self._records.get(city_id)
+            if buffer is None:
+                return []
+            self._records.move_to_end(city_id)
+            return list(buffer)
+
+    def _append(self, record: dict):
+        with self._lock:
+            buffer = self._records.get(record["city_id"])
+            if buffer is None:
+                buffer = self._records[record["city_id"]] = deque(maxlen=LIVE_BUFFER_SIZE)
+                if len(self._records) > LIVE_MAX_CITIES:
+                    self._records.popitem(last=False)
+            else:
+                self._records.move_to_end(record["city_id"])
+            buffer.append(record)
+
+    def _run(self):
+        backoff, streamed = 1, False
+        while True:
+            try:
+                with requests.get(
+                    f"{BACKEND_URL}/weather/stream",
+                    stream=True, timeout=(REQUEST_TIMEOUT_SECONDS, LIVE_READ_TIMEOUT_SECONDS),
+                ) as res:
+                    res.raise_for_status()
+                    res.encoding = "utf-8"
+                    if streamed:
+                        # Egy korábbi, már élő folyam szakadt meg: közben kimaradhatott mérés
+                        with self._lock:
+                            self.resets += 1
+                    self.connected, backoff, streamed = True, 1, True
+                    # chunk_size=None: az adat érkezéskor azonnal feldolgozható, nem vár egy teljes blokkra
+                    self._consume(res.iter_lines(chunk_size=None, decode_unicode=True))
+            except Exception:
+                pass
+            self.connected = False
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _consume(self, lines):
+        event, data = "message", []
+        for line in lines:
+            if line:
+                field, _, value = line.partition(":")
+                if field == "event":
+                    event = value.strip()
+                elif field == "data":
+                    data.append(value[1:] if value.startswith(" ") else value)
+                continue
+            # Üres sor: az esemény vége (a ':' kezdetű heartbeat megjegyzések adat nélkül érkeznek)
+            if event == "weather" and data:
+                self._append(json.loads("\n".join(data)))
+            elif event == "dropped":
+                with self._lock:
+                    self.resets += 1
+            event, data = "message", []
+
+@st.cache_resource(show_spinner=False)
+def live_feed() -> LiveFeed:
+    """Egyetlen élő kapcsolat a backend felé, függetlenül a munkamenetek és a megnézett városok számától."""
+    return LiveFeed()
+
+def merge_live(history: pd.DataFrame, live: list, limit: int) -> pd.DataFrame:
+    """Az előzményekből még hiányzó (nagyobb azonosítójú) élő mérések elé fűzése, a legfrissebb limit darab."""
+    newest = 0 if history.empty else history["id"].max()
+    fresh = [record for record in live if record["id"] > newest]
+    if not fresh:
+        return history
+    fresh_df = pd.DataFrame(fresh).sort_values("timestamp", ascending=False)
+    return pd.concat([fresh_df, history], ignore_index=True).head(limit)
+
+def invalidate_cache():
+    """Írás (frissítés, új város) után a kliensoldali gyorsítótár ürítése, hogy a friss adat látszódjon."""
+    load_dashboard.clear()
+    load_series.clear()
 
 def translate_weather_code(code: int) -> str:
     """Időjárás kódok magyar nyelvű leírását adja vissza a UI számára."""
@@ -24,23 +169,71 @@ def translate_weather_code(code: int) -> str:
     }
     return mapping.get(code, f"Ismeretlen ({code})")
 
+@st.fragment(run_every=LIVE_REFRESH_SECONDS if LIVE_UPDATES else None)
+def render_history(city_id: int, history: dict, limit: int):
+    """Az előzmények diagramja és táblázata.
+
+    Élő módban a fragment LIVE_REFRESH_SECONDS másodpercenként csak önmagát futtatja újra, és az élő folyam
+    új méréseivel egészíti ki az előzményeket, backend hívás nélkül.
+    """
+    try:
+        df = pd.DataFrame(history)
+        if LIVE_UPDATES:
+            feed = live_feed()
+            # Kimaradhatott esemény (újracsatlakozás, lassú kliens): egyszer teljesen újratöltjük az oldalt
+            if st.session_state.setdefault("live_resets", feed.resets) != feed.resets:
+                st.session_state["live_resets"] = feed.resets
+                invalidate_cache()
+                st.rerun()
+            df = merge_live(df, feed.records(city_id), limit)
+        if not df.empty:
+            df['időpont'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M')
+            df['leírás'] = df['weather_code'].map(translate_weather_code)
+
+            # Diagram (itt az eredeti oszlopnevet használjuk a tengelyhez)
+            st.line_chart(df.set_index('timestamp')['temperature'])
+
+            # Oszlopok átnevezése a megjelenítéshez
+            df_display = df.rename(columns={
+                'temperature': 'Hőmérséklet (°C)',
+                'leírás': 'Állapot',
+                'cloud_cover': 'Felhőzet (%)',
+                'humidity': 'Páratartalom (%)',
+                'wind_speed': 'Szélsebesség (km/h)',
+                'apparent_temperature': 'Hőérzet (°C)',
+                'precipitation': 'Csapadék (mm)'
+            })
+
+            # Táblázat megjelenítése a magyar fejlécekkel
+            st.dataframe(df_display[['időpont', 'Hőmérséklet (°C)', 'Állapot', 'Felhőzet (%)', 'Páratartalom (%)', 'Szélsebesség (km/h)']], width='stretch')
+        else:
+            st.info("Még nincsenek adatok ehhez a városhoz.")
+    except Exception as e:
+        st.error(f"Hiba az adatok megjelenítésekor: {e}")
+
 st.set_page_config(page_title="Időjárás Dashboard", layout="wide")
 
 st.title("🌦️ Időjárás Figyelő Rendszer")
 
-# 1. Városok lekérése az oldalsávhoz
+# 1. Városok, statisztika és előzmények egy kérésben; a kiválasztott város és limit az előző futásból jön
+limit_options = [10, 25, 50, 100]
 try:
-    cities_res = requests.get(f"{BACKEND_URL}/cities")
-    cities = cities_res.json() if cities_res.status_code == 200 else []
-except Exception:
-    cities = []
+    dashboard = load_dashboard(st.session_state.get("selected_city_id"), st.session_state.get("selected_limit", 50))
+except Exception as e:
+    st.error(f"Nem sikerült az adatok lekérése: {e}")
+    dashboard = {"city_id": None, "cities": [], "stats": {}, "history": {}}
+cities = dashboard["cities"]
 
 # 2. Oldalsáv beállítása
 st.sidebar.header("📍 Város kiválasztása")
 if cities:
-    city_names = [c['city_name'] for c in cities]
-    selected_city_name = st.sidebar.selectbox("Város:", city_names)
-    selected_city_id = next(c['id'] for c in cities if c['city_name'] == selected_city_name)
+    city_names = {c['id']: c['city_name'] for c in cities}
+    selected_city_id = st.sidebar.selectbox(
+        "Város:", list(city_names), format_func=city_names.get,
+        index=list(city_names).index(dashboard["city_id"]) if dashboard["city_id"] in city_names else 0,
+        key="selected_city_id",
+    )
+    selected_city_name = city_names[selected_city_id]
 
 else:
     st.sidebar.warning("Nincsenek elérhető városok.")
@@ -58,8 +251,9 @@ with st.sidebar.expander("➕ Új város hozzáadása"):
         if new_city:
             try:
                 payload = {"city_name": new_city, "latitude": new_lat, "longitude": new_lon}
-                add_res = requests.post(f"{BACKEND_URL}/cities", json=payload)
+                add_res = http_session().post(f"{BACKEND_URL}/cities", json=payload, timeout=REQUEST_TIMEOUT_SECONDS)
                 if add_res.status_code == 200:
+                    invalidate_cache()
                     st.sidebar.success(f"{new_city} hozzáadva!")
                     st.rerun()
                 else:
@@ -74,17 +268,11 @@ with st.sidebar.expander("➕ Új város hozzáadása"):
 if selected_city_id:
     # --- STATISZTIKA SZEKCIÓ ---
     st.header(f"📊 Statisztika: {selected_city_name}")
-    try:
-        # Itt küldjük a city_id-t a backendnek!
-        stats_res = requests.get(f"{BACKEND_URL}/weather/stats?city_id={selected_city_id}")
-        if stats_res.status_code == 200:
-            stats = stats_res.json()
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Átlagos Hőmérséklet", f"{stats.get('avg_temp', 0)} °C")
-            col2.metric("Mérések száma", stats.get('count', 0))
-            col3.metric("Max hőmérséklet", f"{stats.get('max_temp', 0)} °C")
-    except Exception as e:
-        st.error(f"Nem sikerült a statisztikák lekérése: {e}")
+    stats = dashboard["stats"]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Átlagos Hőmérséklet", f"{stats.get('avg_temp', 0)} °C")
+    col2.metric("Mérések száma", stats.get('count', 0))
+    col3.metric("Max hőmérséklet", f"{stats.get('max_temp', 0)} °C")
 
 st.markdown("---")
 
@@ -98,43 +286,37 @@ if selected_city_id:
         if st.button("🔄 Adatok frissítése", use_container_width=True):
             with st.spinner("Lekérés..."):
                 try:
-                    res = requests.post(f"{BACKEND_URL}/weather/update?city_name={selected_city_name}")
+                    res = http_session().post(
+                        f"{BACKEND_URL}/weather/update", params={"city_name": selected_city_name}, timeout=REQUEST_TIMEOUT_SECONDS
+                    )
                     if res.status_code == 200:
+                        # Élő módban is: a statisztika és a városlista a gyorsítótárazott dashboardból jön
+                        invalidate_cache()
                         st.rerun()
                     else:
                         st.error("Sikertelen frissítés.")
                 except Exception as e:
                     st.error(f"Hiba: {e}")
-    # Limit kiválasztása
-    limit_options = [10, 25, 50, 100]
-    selected_limit = st.selectbox("Megjelenített rekordok száma:", limit_options, index=2)
+    # Limit kiválasztása (a következő futás ezzel kéri a dashboardot)
+    st.selectbox("Megjelenített rekordok száma:", limit_options, index=2, key="selected_limit")
+
+    render_history(selected_city_id, dashboard["history"], st.session_state.get("selected_limit", 50))
+    # --- HOSSZÚ TÁVÚ TREND (aggregált idősor) ---
+    st.subheader("📉 Hosszú távú trend")
+    range_options = {"1 nap": 1, "7 nap": 7, "30 nap": 30, "90 nap": 90, "1 év": 365}
+    selected_range = st.selectbox("Időtáv:", list(range_options), index=1)
 
     try:
-        history_res = requests.get(f"{BACKEND_URL}/weather/history?city_id={selected_city_id}&limit={selected_limit}")
-        if history_res.status_code == 200:
-            data = history_res.json()
-            if data:
-                df = pd.DataFrame(data)
-                df['időpont'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M')
-                df['leírás'] = df['weather_code'].map(translate_weather_code)
-
-                # Diagram (itt az eredeti oszlopnevet használjuk a tengelyhez)
-                st.line_chart(df.set_index('timestamp')['temperature'])
-
-                # Oszlopok átnevezése a megjelenítéshez
-                df_display = df.rename(columns={
-                    'temperature': 'Hőmérséklet (°C)',
-                    'leírás': 'Állapot',
-                    'cloud_cover': 'Felhőzet (%)',
-                    'humidity': 'Páratartalom (%)',
-                    'wind_speed': 'Szélsebesség (km/h)',
-                    'apparent_temperature': 'Hőérzet (°C)',
-                    'precipitation': 'Csapadék (mm)'
-                })
-
-                # Táblázat megjelenítése a magyar fejlécekkel
-                st.dataframe(df_display[['időpont', 'Hőmérséklet (°C)', 'Állapot', 'Felhőzet (%)', 'Páratartalom (%)', 'Szélsebesség (km/h)']], width='stretch')
-            else:
-                st.info("Még nincsenek adatok ehhez a városhoz.")
+        series = load_series(selected_city_id, range_options[selected_range])
+        if series["points"]:
+            series_df = pd.DataFrame(series["points"])
+            series_df['timestamp'] = pd.to_datetime(series_df['timestamp'])
+            st.line_chart(series_df.set_index('timestamp')[['avg', 'min', 'max']])
+            st.caption(f"Felbontás: {series['resolution']}, {len(series_df)} pont")
+        else:
+            st.info("Ebben az időtávban nincs adat.")
     except Exception as e:
-        st.error(f"Hiba az adatok megjelenítésekor: {e}")
\ No newline at end of file
+        st.error(f"Hiba a trend lekérésekor: {e}")
+
+# Interakciónkénti renderelési idő (gyorsítótár-találatnál nincs backend hívás)
+st.caption(f"⏱️ Renderelés: {(time.perf_counter() - render_started) * 1000:.0f} ms")
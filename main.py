@@ -8,7 +8,7 @@ def run_backend():
     print("Backend indítása...")
     return subprocess.Popen([
         sys.executable, "-m", "uvicorn", "backend.main:app", 
-        "--host", "127.0.0.1", "--port", "8000"
+        "--host", "127.0.0.1", "--port", "8000", "--timeout-graceful-shutdown", "5"
     ])
 
 def run_frontend():
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import pytest
+
+# A backend.main importálásakor létrejövő alapértelmezett adatbázis ne a munkakönyvtárba kerüljön
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'weather.db')}")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import sessionmaker
+from backend import cache, forecast, geo, hotstore, models, services
+from backend.database import async_database_url, configure_sqlite, get_async_db, get_async_session_factory
+
+@pytest.fixture(autouse=True)
+def reset_hot_store():
+    """A folyamatszintű memóriabeli tár és upstream gyorsítótár ne vigyen át adatot egyik tesztből a másikba."""
+    hotstore.hot_store.clear()
+    geo.city_index.clear()
+    forecast.forecast_cache.clear()
+    services.current_weather_cache.clear()
+    yield
+    hotstore.hot_store.clear()
+    geo.city_index.clear()
+    forecast.forecast_cache.clear()
+
+@pytest.fixture
+def engine(tmp_path):
+    """Tesztenként friss, fájl alapú SQLite adatbázis a hangolt beállításokkal."""
+    engine = configure_sqlite(create_engine(f"sqlite:///{tmp_path / 'test.db'}"))
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def async_sessions(engine):
+    """Aszinkron sessiongyár ugyanarra a teszt adatbázisra.
+
+    NullPool: a TestClient és az asyncio.run hívások más-más eseményhurkot használhatnak,
+    ezért nem tartunk nyitott kapcsolatot közöttük.
+    """
+    async_engine = create_async_engine(async_database_url(str(engine.url)), poolclass=NullPool)
+    configure_sqlite(async_engine.sync_engine)
+    yield async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    async_engine.sync_engine.dispose()
+
+@pytest.fixture
+def client(async_sessions):
+    """TestClient, amelynek végpontjai a teszt adatbázisát használják (startup események nélkül)."""
+    from backend.main import app
+
+    async def override_get_async_db():
+        async with async_sessions() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: async_sessions
+    cache.response_cache.clear()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    cache.response_cache.clear()
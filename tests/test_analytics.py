@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from backend import analytics, models
+
+START = datetime(2024, 3, 1)
+HOURS = 72
+
+@pytest.fixture
+def history(db):
+    """Három város óránkénti mérésekkel: az 1-es és 2-es ellentétes napi ciklussal, a 3-as egy kiugró értékkel."""
+    for city_id in (1, 2, 3):
+        db.add(models.City(id=city_id, city_name=f"Város {city_id}", latitude=47.0, longitude=19.0))
+    for hour in range(HOURS):
+        cycle = float(hour % 24)
+        values = {1: 10 + cycle, 2: 30 - cycle, 3: 5.0 + (hour % 2) + (40 if hour == HOURS - 1 else 0)}
+        for city_id, temperature in values.items():
+            db.add(models.WeatherData(
+                city_id=city_id, temperature=temperature, humidity=50, apparent_temperature=temperature, precipitation=0.0,
+                cloud_cover=10, is_day=1, weather_code=0, wind_speed=float(city_id), timestamp=START + timedelta(hours=hour),
+            ))
+    db.commit()
+
+def test_trailing_windows_match_naive_loop():
+    rng = np.random.default_rng(7)
+    city_id = np.repeat([1, 2, 5], [40, 1, 25])
+    epoch = np.concatenate([np.sort(rng.uniform(0, 86400 * 3, n)).round() for n in (40, 1, 25)])
+    values = rng.normal(10, 3, len(epoch))
+    columns = analytics.Columns(city_id, epoch, values)
+
+    lo, hi = analytics.trailing_bounds(columns, 6 * 3600, include_current=False)
+    count, mean, std = analytics.window_stats(values, lo, hi)
+    for i in range(len(epoch)):
+        window = [values[j] for j in range(len(epoch)) if city_id[j] == city_id[i] and epoch[i] - 6 * 3600 <= epoch[j] < epoch[i]]
+        assert count[i] == len(window)
+        if len(window) >= 2:
+            assert mean[i] == pytest.approx(np.mean(window))
+            assert std[i] == pytest.approx(np.std(window, ddof=1))
+
+def test_trend_rolling_mean_and_daily_deltas(db, history):
+    result = analytics.trend(db, 1, start=START, end=START + timedelta(hours=HOURS), window_hours=24)
+
+    assert len(result["points"]) == HOURS
+    assert result["points"][0] == {"timestamp": START.isoformat(), "value": 10.0, "rolling_mean": 10.0}
+    # Egy teljes nap után az ablak 25 mérést fed le (a két végpont is benne van)
+    assert result["points"][24]["rolling_mean"] == pytest.approx((sum(range(10, 34)) + 10) / 25, abs=0.01)
+    assert [day["count"] for day in result["daily"]] == [24, 24, 24]
+    assert [day["delta"] for day in result["daily"]] == [None, 0.0, 0.0]
+
+def test_anomalies_flag_the_outlier(db, history):
+    result = analytics.anomalies(db, start=START + timedelta(hours=48), end=START + timedelta(hours=HOURS), baseline_hours=24)
+
+    assert result["flagged"] == 1
+    anomaly = result["anomalies"][0]
+    assert (anomaly["city_id"], anomaly["city_name"]) == (3, "Város 3")
+    assert anomaly["timestamp"] == (START + timedelta(hours=HOURS - 1)).isoformat()
+    assert anomaly["z"] > 3
+
+def test_correlation_matrix(db, history):
+    result = analytics.correlation(db, [2, 1, 3], start=START, end=START + timedelta(hours=HOURS))
+
+    assert result["city_ids"] == [1, 2, 3]
+    assert result["matrix"][0][0] == 1.0
+    assert result["matrix"][0][1] == pytest.approx(-1.0)
+    assert result["hours"] == {1: HOURS, 2: HOURS, 3: HOURS}
+
+def test_ranking_uses_latest_value_per_city(db, history):
+    now = START + timedelta(hours=HOURS)
+    result = analytics.ranking(db, metric="temperature", now=now)
+    assert result["cities"] == 3
+    assert [row["city_id"] for row in result["ranking"]] == [3, 1, 2]
+    assert result["ranking"][0]["value"] == 46.0
+
+    windiest = analytics.ranking(db, metric="wind_speed", limit=1, order="asc", now=now)
+    assert windiest["ranking"] == [{"rank": 1, "city_id": 1, "city_name": "Város 1", "value": 1.0, "timestamp": (now - timedelta(hours=1)).isoformat()}]
+
+def test_analytics_endpoints(client, db, history):
+    end = (START + timedelta(hours=HOURS)).isoformat()
+    response = client.get("/analytics/correlation", params={"city_ids": "1,2", "from": START.isoformat(), "to": end})
+    assert response.status_code == 200
+    assert response.json()["city_ids"] == [1, 2]
+
+    assert client.get("/analytics/trend", params={"city_id": 1, "metric": "nope"}).status_code == 400
+    assert client.get("/analytics/correlation", params={"city_ids": "1,x"}).status_code == 400
+    assert client.get("/analytics/ranking", params={"order": "sideways"}).status_code == 400
+    assert client.get("/analytics/ranking", params={"limit": 0}).status_code == 400
+    assert client.get("/analytics/anomalies", params={"limit": -1}).status_code == 400
+    anomalies = client.get("/analytics/anomalies", params={"from": START.isoformat(), "to": end}).json()
+    assert [row["city_id"] for row in anomalies["anomalies"]] == [3]
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import pytest
+from backend import metrics, models, services, upstream
+from benchmarks.openmeteo_stub import OpenMeteoStub
+
+CITY_COUNT = 1000
+
+def make_cities(n: int):
+    """Memóriában létrehozott (nem mentett) City objektumok egyedi koordinátákkal."""
+    return [
+        models.City(id=i + 1, city_name=f"Város {i}", latitude=40 + i * 0.01, longitude=10 + i * 0.01)
+        for i in range(n)
+    ]
+
+@pytest.fixture
+def stub(monkeypatch):
+    with OpenMeteoStub() as server:
+        monkeypatch.setattr(services, "OPEN_METEO_URL", server.url)
+        yield server
+
+def test_batch_fetch_round_trips_and_wall_time(stub):
+    """1000 város egy frissítési ciklusa csak ceil(1000 / chunk) kérés legyen, és gyorsan lefusson."""
+    cities = make_cities(CITY_COUNT)
+
+    start = time.perf_counter()
+    results = asyncio.run(services.fetch_weather_data_batch(cities, chunk_size=100))
+    elapsed = time.perf_counter() - start
+
+    assert stub.request_count == 10
+    assert stub.location_count == CITY_COUNT
+    assert len(results) == CITY_COUNT
+    assert elapsed < 5.0
+    # A lekérések számlálója városszámtól független számú idősort tart fenn (csak kimenetel címke)
+    samples = metrics.UPSTREAM_FETCHES.collect().samples
+    assert {tuple(labels) for _, labels, _ in samples} == {("outcome",)}
+    assert {labels["outcome"]: value for _, labels, value in samples}["ok"] >= CITY_COUNT
+
+def test_batch_fetch_maps_results_to_city_ids(stub):
+    """A tömbös válasz elemei a kérés sorrendje alapján a megfelelő City.id-hoz kerülnek."""
+    cities = make_cities(7)
+    results = asyncio.run(services.fetch_weather_data_batch(cities, chunk_size=3))
+
+    assert stub.request_count == 3
+    for city in cities:
+        assert results[city.id]["city_id"] == city.id
+        assert results[city.id]["temperature"] == pytest.approx(city.latitude - 30)
+
+def test_single_city_fetch_uses_batch_path(stub):
+    """Egy városnál az Open-Meteo objektumot ad vissza, ezt is kezelni kell."""
+    city = make_cities(1)[0]
+    data = asyncio.run(services.fetch_weather_data(city))
+
+    assert stub.request_count == 1
+    assert data["city_id"] == city.id
+
+def test_shared_client_bounds_concurrency_and_reports_stats(monkeypatch):
+    """A csoportok párhuzamosan mennek ki, de legfeljebb max_concurrency kérés fut egyszerre."""
+    async def run():
+        async with upstream.UpstreamClient(max_concurrency=2, max_per_host=2) as client:
+            results = await services.fetch_weather_data_batch(make_cities(40), chunk_size=5, client=client)
+            return results, client.stats()
+
+    with OpenMeteoStub(delay=0.05) as server:
+        monkeypatch.setattr(services, "OPEN_METEO_URL", server.url)
+        results, stats = asyncio.run(run())
+
+    assert len(results) == 40
+    assert server.request_count == 8
+    assert server.peak_concurrency == 2
+    assert stats["latency_seconds"]["count"] == 8
+    assert stats["open_connections"] >= 1
+    assert stats["waiters"] == 0
@@ -0,0 +1,11 @@
+from benchmarks.compare import compare, flatten
+
+def test_flatten_keeps_only_numbers():
+    assert flatten({"a": {"p50_ms": 1.5, "label": "x", "ok": True}, "rows": 3}) == {"a.p50_ms": 1.5, "rows": 3}
+
+def test_regressions_respect_metric_direction():
+    baseline = {"results": {"read": {"p95_ms": 10.0, "requests_per_sec": 100.0}, "ingest": {"rows_per_sec": 1000, "rows": 5}}}
+    current = {"results": {"read": {"p95_ms": 10.5, "requests_per_sec": 80.0}, "ingest": {"rows_per_sec": 2000, "rows": 9}}}
+    _, regressions = compare(baseline, current, threshold=10)
+    # A késleltetés 5%-ot romlott (küszöb alatt), az áteresztőképesség 20%-ot, a sorszám nem teljesítménymutató
+    assert regressions == ["read.requests_per_sec"]
@@ -0,0 +1,65 @@
+from backend import cache, services
+from backend.cache import ResponseCache
+from backend.schemas import CityCreate, WeatherCreate
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def weather(city_id: int) -> WeatherCreate:
+    return WeatherCreate(
+        city_id=city_id, temperature=20.0, humidity=50, apparent_temperature=19.0,
+        precipitation=0.0, cloud_cover=10, is_day=1, weather_code=0, wind_speed=5.5,
+    )
+
+def test_ttl_expiry_and_lru_eviction():
+    clock = FakeClock()
+    c = ResponseCache(max_entries=2, ttl=10, clock=clock)
+    c.set("a", b"1")
+    c.set("b", b"2")
+    assert c.get("a").body == b"1"   # "a" lett a legutóbb használt
+    c.set("c", b"3")                 # "b" kiszorul
+    assert c.get("b") is None
+    clock.now = 11
+    assert c.get("a") is None
+    assert c.stats()["evictions"] == 1
+    assert c.stats()["hits"] == 1
+
+def test_invalidation_is_scoped_to_city_and_all_cities():
+    c = ResponseCache(max_entries=10, ttl=60)
+    c.set("city1", b"1", tags=cache.tags_for(1))
+    c.set("city2", b"2", tags=cache.tags_for(2))
+    c.set("all", b"3", tags=cache.tags_for(None))
+    c.invalidate_cities([1])
+    assert c.get("city1") is None and c.get("all") is None
+    assert c.get("city2") is not None
+
+def test_response_computed_during_invalidation_is_not_stored():
+    c = ResponseCache(max_entries=10, ttl=60)
+    generation = c.generation
+    c.invalidate_cities([1])
+    c.set("stale", b"old", tags=cache.tags_for(1), generation=generation)
+    assert c.get("stale") is None
+
+def test_etag_304_and_write_through_invalidation(client, db):
+    city = services.create_city(db, CityCreate(city_name="Sopron", latitude=47.68, longitude=16.58))
+
+    first = client.get(f"/weather/history?city_id={city.id}")
+    assert first.status_code == 200 and first.json() == []
+    etag = first.headers["etag"]
+
+    assert client.get(f"/weather/history?city_id={city.id}", headers={"If-None-Match": etag}).status_code == 304
+    assert cache.response_cache.stats()["hits"] == 1
+
+    services.save_weather(db, weather(city.id))
+    fresh = client.get(f"/weather/history?city_id={city.id}", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert len(fresh.json()) == 1
+    assert fresh.headers["etag"] != etag
+
+def test_city_list_invalidated_on_create(client, db):
+    assert client.get("/cities").json() == []
+    services.create_city(db, CityCreate(city_name="Eger", latitude=47.90, longitude=20.37))
+    assert [c["city_name"] for c in client.get("/cities").json()] == ["Eger"]
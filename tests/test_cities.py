@@ -0,0 +1,110 @@
+import random
+from collections import namedtuple
+import pytest
+from backend import city_import, geo, models, schemas, services
+
+City = namedtuple("City", "id city_name latitude longitude")
+
+def brute_force(cities, lat, lon, k):
+    return sorted(cities, key=lambda c: (geo.distance_km(lat, lon, c.latitude, c.longitude), c.id))[:k]
+
+@pytest.mark.parametrize("cell_degrees", [0.5, 5.0])
+def test_grid_search_matches_brute_force(monkeypatch, cell_degrees):
+    monkeypatch.setattr(geo, "BRUTE_FORCE_LIMIT", 0)
+    rnd = random.Random(7)
+    # Sűrű európai folt, szórványos városok a földön, és pontok a dátumválasztó vonal és a sarkok körül
+    cities = [City(i, f"c{i}", rnd.uniform(44, 50), rnd.uniform(15, 24)) for i in range(1500)]
+    cities += [City(2000 + i, f"w{i}", rnd.uniform(-90, 90), rnd.uniform(-180, 180)) for i in range(300)]
+    cities += [City(3000, "e", 10.0, 179.9), City(3001, "w", 10.0, -179.9), City(3002, "n", 89.9, 0.0), City(3003, "s", -89.95, 120.0)]
+    index = geo.CityIndex(cell_degrees)
+    index.add(cities)
+
+    queries = [(47.5, 19.0), (10.0, -179.99), (89.99, -170.0), (-89.9, -60.0), (0.0, 0.0), (-45.0, 170.0), (90.0, 180.0)]
+    queries += [(rnd.uniform(-90, 90), rnd.uniform(-180, 180)) for _ in range(40)]
+    for lat, lon in queries:
+        for k in (1, 7):
+            found = index.nearest(lat, lon, k)
+            assert [c.id for c, _ in found] == [c.id for c in brute_force(cities, lat, lon, k)]
+            assert [km for _, km in found] == sorted(km for _, km in found)
+
+def test_upsert_moves_city_between_cells():
+    index = geo.CityIndex()
+    index.add([City(1, "Budapest", 47.5, 19.0), City(2, "Sydney", -33.9, 151.2)])
+    assert index.nearest(-33.0, 151.0, 1)[0][0].id == 2
+
+    index.add([City(2, "Sydney", 47.6, 19.1)])
+    assert index.stats()["cells"] == 1
+    assert [c.id for c, _ in index.nearest(-33.0, 151.0, 5)] == [2, 1]
+    with pytest.raises(ValueError):
+        index.nearest(91, 0, 1)
+    with pytest.raises(ValueError):
+        index.nearest(0, 0, geo.CITY_NEAREST_MAX_K + 1)
+    assert geo.CityIndex().nearest(0, 0, 3) == []
+
+def test_parser_handles_chunk_boundaries_and_formats():
+    body = "﻿Name,Lon,Lat\r\nPécs,18.23,46.07\r\n\"Szeged, Tisza\",20.15,46.25\r\n\r\nPécs,18.24,46.08".encode()
+    # Bájtonként, akár egy többbájtos karakter közepén elvágva
+    cities = city_import.parse_all("csv", (body[i:i + 1] for i in range(len(body))))
+    assert cities == {"Pécs": (46.08, 18.24), "Szeged, Tisza": (46.25, 20.15)}
+
+    # Idézőjelek közti sortörés (RFC 4180), darabhatáron át is
+    quoted = 'city_name,latitude,longitude\r\n"Buda\r\n""Pest""",47.5,19.04\nEger,47.9,20.37\n'.encode()
+    cities = city_import.parse_all("csv", (quoted[i:i + 5] for i in range(0, len(quoted), 5)))
+    assert cities == {'Buda\n"Pest"': (47.5, 19.04), "Eger": (47.9, 20.37)}
+
+    ndjson = b'{"city_name": "Eger", "latitude": 47.9, "longitude": 20.37}\n\n{"name": "Gy\xc5\x91r", "lat": 47.68, "lng": 17.63}\n'
+    assert city_import.parse_all("ndjson", [ndjson]) == {"Eger": (47.9, 20.37), "Győr": (47.68, 17.63)}
+
+    geonames = b"3054643\tBudapest\tBudapest\tBuda,Pest\t47.49801\t19.03991\tP\tPPLC\tHU\n"
+    assert city_import.parse_all("geonames", [geonames]) == {"Budapest": (47.49801, 19.03991)}
+
+    for fmt, bad, message in (
+        ("csv", b"city_name,latitude\nX,1", "fejl"),
+        ("csv", b"city_name,latitude,longitude\nA,1,2\nB,95,2", "3. sor"),
+        ("csv", b'city_name,latitude,longitude\n"A\nB",1,2\nC,95,2', "4. sor"),
+        ("csv", b'city_name,latitude,longitude\nA,1,2\n"B,1,2\n', "3. sor: lezáratlan"),
+        ("ndjson", b'{"city_name": "A", "latitude": 1, "longitude": 2}\n[1]', "2. sor"),
+        ("geonames", b"1\tA\tA", "1. sor"),
+    ):
+        with pytest.raises(city_import.CityImportError, match=message):
+            city_import.parse_all(fmt, [bad])
+
+def test_import_endpoint_upserts_and_updates_index(client, db):
+    db.add(models.City(city_name="Pécs", latitude=0.0, longitude=0.0))
+    db.commit()
+    assert client.get("/cities").json()[0]["latitude"] == 0.0
+
+    body = "city_name,latitude,longitude\nPécs,46.07,18.23\nSzeged,46.25,20.15\nDebrecen,47.53,21.63\n"
+    report = client.post("/cities/import", content=body.encode(), headers={"Content-Type": "text/csv"}).json()
+    assert report == {"cities": 3, "inserted": 2, "updated": 1}
+
+    cities = {city["city_name"]: city for city in client.get("/cities").json()}
+    assert cities["Pécs"]["latitude"] == 46.07 and len(cities) == 3
+    nearest = client.get("/cities/nearest", params={"lat": 46.3, "lon": 20.0, "k": 2}).json()
+    assert [city["city_name"] for city in nearest] == ["Szeged", "Pécs"]
+    assert nearest[0]["distance_km"] == pytest.approx(geo.distance_km(46.3, 20.0, 46.25, 20.15), abs=1e-3)
+
+    # Hibás sor: az egész import elmarad
+    bad = client.post("/cities/import", params={"format": "ndjson"}, content=b'{"city_name": "Eger", "latitude": 47.9, "longitude": 20.37}\n{"city_name": "X"}')
+    assert bad.status_code == 400 and "2. sor" in bad.json()["detail"]
+    assert services.get_city_by_name(db, "Eger") is None
+    assert client.post("/cities/import", params={"format": "xml"}, content=b"").status_code == 400
+
+def test_nearest_loads_index_lazily_and_validates(client, db):
+    services.create_city(db, schemas.CityCreate(city_name="Eger", latitude=47.9, longitude=20.37))
+    geo.city_index.clear()
+    assert client.get("/cities/nearest", params={"lat": 47.0, "lon": 20.0}).json()[0]["city_name"] == "Eger"
+    assert client.get("/cities/index/stats").json()["cities"] == 1
+    assert client.get("/cities/nearest", params={"lat": 100, "lon": 0}).status_code == 400
+    assert client.get("/cities/nearest", params={"lat": 0, "lon": 0, "k": 0}).status_code == 400
+
+def test_refresh_picks_up_cities_added_elsewhere(db):
+    index = geo.CityIndex()
+    db.add(models.City(city_name="Eger", latitude=47.9, longitude=20.37))
+    db.commit()
+    assert index.load(db) == 1 and not index.needs_refresh(0)
+
+    db.add(models.City(city_name="Miskolc", latitude=48.1, longitude=20.78))
+    db.commit()
+    assert index.refresh(db) == 1 and index.refresh(db) == 0
+    assert index.nearest(48.1, 20.8, 1)[0][0].city_name == "Miskolc"
@@ -0,0 +1,36 @@
+from backend import services
+from backend.schemas import CityCreate, WeatherCreate
+
+def weather(city_id: int, temperature: float) -> WeatherCreate:
+    return WeatherCreate(
+        city_id=city_id, temperature=temperature, humidity=50, apparent_temperature=temperature,
+        precipitation=0.0, cloud_cover=10, is_day=1, weather_code=0, wind_speed=5.5,
+    )
+
+def test_dashboard_defaults_to_first_city(client, db):
+    pecs = services.create_city(db, CityCreate(city_name="Pécs", latitude=46.07, longitude=18.23))
+    services.create_city(db, CityCreate(city_name="Győr", latitude=47.68, longitude=17.63))
+    services.save_weather(db, weather(pecs.id, 10.0))
+
+    body = client.get("/dashboard").json()
+    assert body["city_id"] == pecs.id
+    assert [c["city_name"] for c in body["cities"]] == ["Pécs", "Győr"]
+    assert body["stats"]["count"] == 1
+    assert len(body["history"]) == 1
+
+def test_dashboard_matches_individual_endpoints_and_is_invalidated(client, db):
+    city = services.create_city(db, CityCreate(city_name="Vác", latitude=47.78, longitude=19.13))
+    for t in (5.0, 15.0, 25.0):
+        services.save_weather(db, weather(city.id, t))
+
+    body = client.get(f"/dashboard?city_id={city.id}&limit=2").json()
+    assert body["stats"] == client.get(f"/weather/stats?city_id={city.id}").json()
+    assert body["history"] == client.get(f"/weather/history?city_id={city.id}&limit=2").json()
+
+    services.save_weather(db, weather(city.id, 35.0))
+    assert client.get(f"/dashboard?city_id={city.id}&limit=2").json()["stats"]["count"] == 4
+
+def test_openapi_documents_columns_layout(client):
+    schemas = client.get("/openapi.json").json()["components"]["schemas"]
+    history = schemas["DashboardResponse"]["properties"]["history"]
+    assert [option["type"] for option in history["anyOf"]] == ["array", "object"]
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import create_engine, func, inspect, select, text
+from backend import models, services
+from backend.schemas import WeatherCreate
+
+OBSERVED = datetime(2024, 5, 1, 12, 15)
+
+def weather(city_id: int, observed_at=OBSERVED, temperature: float = 20.0) -> WeatherCreate:
+    return WeatherCreate(
+        city_id=city_id, temperature=temperature, humidity=50, apparent_temperature=temperature, precipitation=0.0,
+        cloud_cover=10, is_day=1, weather_code=0, wind_speed=2.0, observed_at=observed_at,
+    )
+
+def add_city(db, city_id: int = 1) -> models.City:
+    city = models.City(id=city_id, city_name=f"Város {city_id}", latitude=47.0, longitude=19.0)
+    db.add(city)
+    db.commit()
+    return city
+
+def row_count(db) -> int:
+    return db.scalar(select(func.count()).select_from(models.WeatherData))
+
+def test_same_observation_is_stored_once(db):
+    add_city(db)
+    first = services.save_weather(db, weather(1))
+    again = services.save_weather(db, weather(1, temperature=99.0))
+
+    assert again.id == first.id and again.temperature == 20.0
+    assert row_count(db) == 1
+    assert db.scalar(select(func.sum(models.WeatherHourly.count))) == 1
+
+def test_batch_skips_already_stored_observations(db):
+    add_city(db, 1)
+    add_city(db, 2)
+    services.save_weather(db, weather(1))
+
+    saved = services.save_weather_batch(db, [weather(1), weather(2), weather(1, datetime(2024, 5, 1, 12, 30))])
+
+    assert sorted((r.city_id, r.observed_at) for r in saved) == [(1, datetime(2024, 5, 1, 12, 30)), (2, OBSERVED)]
+    assert row_count(db) == 3
+    assert services.save_weather_batch(db, [weather(2)]) == []
+
+def test_rows_without_observation_time_are_not_deduplicated(db):
+    add_city(db)
+    services.save_weather(db, weather(1, observed_at=None))
+    services.save_weather(db, weather(1, observed_at=None))
+    assert row_count(db) == 2
+
+def test_concurrent_updates_share_one_upstream_fetch(monkeypatch):
+    calls = []
+
+    async def fake_batch(cities):
+        calls.append([c.id for c in cities])
+        await asyncio.sleep(0.05)
+        return {cities[0].id: {"city_id": cities[0].id, "observed_at": OBSERVED}}
+
+    monkeypatch.setattr(services, "fetch_weather_data_batch", fake_batch)
+    city = models.City(id=3, city_name="Szeged", latitude=46.25, longitude=20.14)
+
+    async def scenario():
+        results = await asyncio.gather(*(services.fetch_weather_data(city) for _ in range(5)))
+        return results, await services.fetch_weather_data(city)
+
+    results, cached = asyncio.run(scenario())
+    assert calls == [[3]]
+    assert all(r == results[0] for r in results) and cached == results[0]
+    assert services.current_weather_cache.stats()["coalesced"] == 4
+
+def test_create_schema_adds_observed_at_to_old_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE cities (id INTEGER PRIMARY KEY, city_name VARCHAR, latitude FLOAT, longitude FLOAT)"))
+        conn.execute(text(
+            "CREATE TABLE weather_history (id INTEGER PRIMARY KEY, city_id INTEGER, temperature FLOAT, humidity INTEGER,"
+            " apparent_temperature FLOAT, precipitation FLOAT, cloud_cover INTEGER, is_day INTEGER, weather_code INTEGER,"
+            " wind_speed FLOAT, timestamp DATETIME)"
+        ))
+    models.create_schema(engine)
+
+    inspector = inspect(engine)
+    assert "observed_at" in {c["name"] for c in inspector.get_columns("weather_history")}
+    assert any(i["name"] == "ux_weather_history_city_observed" and i["unique"] for i in inspector.get_indexes("weather_history"))
+    engine.dispose()
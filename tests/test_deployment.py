@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from backend import models, scheduler, services
+from backend.database import async_database_url, configure_sqlite
+from benchmarks.openmeteo_stub import OpenMeteoStub
+
+@pytest.fixture
+def stub(monkeypatch):
+    with OpenMeteoStub() as server:
+        monkeypatch.setattr(services, "OPEN_METEO_URL", server.url)
+        yield server
+
+def worker_sessions(engine):
+    """Egy külön "worker folyamat" saját async engine-je ugyanarra az adatbázisfájlra."""
+    async_engine = create_async_engine(async_database_url(str(engine.url)), poolclass=NullPool)
+    configure_sqlite(async_engine.sync_engine)
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def test_election_follows_database_dialect(async_sessions):
+    assert isinstance(scheduler.default_election(async_sessions), scheduler.LeaseElection)
+
+    postgres_bind = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+    election = scheduler.default_election(SimpleNamespace(kw={"bind": postgres_bind}))
+    assert isinstance(election, scheduler.AdvisoryLockElection)
+    assert election.key == scheduler.advisory_lock_key(scheduler.LEASE_NAME)
+    assert -2**63 <= election.key < 2**63
+
+def test_only_one_worker_leads_and_leadership_fails_over(engine, db, stub):
+    """Több worker (külön engine-ek, közös SQLite fájl): egy vezető, leállása után egy másik veszi át."""
+    workers = [
+        scheduler.WeatherScheduler(session_factory=worker_sessions(engine), startup_spread_seconds=0, jitter_seconds=0, owner=f"w{i}")
+        for i in range(3)
+    ]
+
+    async def run():
+        await asyncio.gather(*(w.tick() for w in workers))
+        leaders = [w for w in workers if w.is_leader]
+        assert len(leaders) == 1
+        await leaders[0].stop()
+        for w in workers:
+            w._lease_renew_at = 0.0
+        await asyncio.gather(*(w.tick() for w in workers if w is not leaders[0]))
+        return leaders[0]
+
+    first = asyncio.run(run())
+    assert sum(w.is_leader for w in workers) == 1 and not first.is_leader
+    # Csak a vezetők kértek le adatot, a követők nem hívták az upstreamet
+    assert stub.request_count <= 2
+    assert db.query(models.City).count() == len(services.DEFAULT_CITIES)
+
+def test_alembic_migration_matches_models(tmp_path):
+    pytest.importorskip("alembic")
+    from alembic import command
+    from alembic.autogenerate import compare_metadata
+    from alembic.config import Config
+    from alembic.migration import MigrationContext
+    from sqlalchemy import create_engine
+
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), models.Base.metadata) == []
+    engine.dispose()
@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from backend import export, models
+
+BASE = datetime(2024, 3, 1)
+
+@pytest.fixture
+def history(db):
+    db.add_all([models.City(id=1, city_name="Szeged", latitude=46.25, longitude=20.14),
+                models.City(id=2, city_name="Eger", latitude=47.90, longitude=20.37)])
+    for i in range(12_000):
+        db.add(models.WeatherData(
+            city_id=1 + i % 2, temperature=i / 100, humidity=50, apparent_temperature=0, precipitation=0,
+            cloud_cover=0, is_day=1, weather_code=0, wind_speed=1, timestamp=BASE + timedelta(minutes=i),
+        ))
+    db.commit()
+
+def test_ndjson_export_streams_all_rows_in_order(client, history):
+    response = client.get("/weather/export?format=ndjson&city_id=1")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 6000
+    assert all(r["city_id"] == 1 for r in rows)
+    assert [r["timestamp"] for r in rows] == sorted(r["timestamp"] for r in rows)
+
+def test_csv_export_with_time_range(client, history):
+    end = (BASE + timedelta(minutes=100)).isoformat()
+    response = client.get(f"/weather/export?format=csv&to={end}")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == list(export.EXPORT_COLUMNS)
+    assert len(rows) == 101
+
+def test_parquet_export(client, history):
+    pq = pytest.importorskip("pyarrow.parquet")
+    response = client.get("/weather/export?format=parquet")
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 12_000
+    assert table.column_names == list(export.EXPORT_COLUMNS)
+
+def test_export_rejects_unknown_format(client):
+    assert client.get("/weather/export?format=xml").status_code == 400
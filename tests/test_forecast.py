@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlalchemy.orm import sessionmaker
+from backend import forecast, models, services
+from benchmarks.openmeteo_stub import OpenMeteoStub
+
+@pytest.fixture
+def stub(monkeypatch):
+    with OpenMeteoStub() as server:
+        monkeypatch.setattr(services, "OPEN_METEO_URL", server.url)
+        yield server
+
+@pytest.fixture
+def cities(db):
+    for city_id, name, lat in ((1, "Budapest", 47.5), (2, "Szeged", 46.25), (3, "Eger", 47.9)):
+        db.add(models.City(id=city_id, city_name=name, latitude=lat, longitude=19.0))
+    db.commit()
+
+def test_model_run_alignment():
+    assert forecast.model_run(datetime(2024, 5, 1, 7, 59), run_hours=3, delay_minutes=60) == datetime(2024, 5, 1, 6)
+    # A 06-os futás csak 07:00-kor jelenik meg, addig a 03-as az érvényes
+    assert forecast.model_run(datetime(2024, 5, 1, 6, 59), run_hours=3, delay_minutes=60) == datetime(2024, 5, 1, 3)
+    assert forecast.model_run(datetime(2024, 5, 1, 0, 30), run_hours=6, delay_minutes=60) == datetime(2024, 4, 30, 18)
+    assert forecast.next_run_available(datetime(2024, 5, 1, 6), run_hours=3, delay_minutes=60) == datetime(2024, 5, 1, 10)
+
+def test_pack_roundtrip_keeps_missing_values():
+    blob = forecast.pack([21.3, None, -4.0])
+    assert len(blob) == 12
+    values = forecast.unpack(blob, 3)
+    assert values[0] == np.float32(21.3) and np.isnan(values[1]) and values[2] == -4.0
+    assert np.isnan(forecast.unpack(None, 2)).all()
+
+def test_refresh_fetches_stale_cities_once_per_run(engine, db, cities, stub):
+    refresher = forecast.ForecastRefresher(sessionmaker(bind=engine))
+    now = datetime.utcnow()
+
+    report = asyncio.run(refresher.refresh(now))
+    assert (report["cities"], report["saved"], report["failed"]) == (3, 3, 0)
+    assert stub.request_count == 1 and stub.location_count == 3
+
+    row = db.get(models.Forecast, 1)
+    assert row.model_run == forecast.model_run(now) and row.hours == forecast.FORECAST_DAYS * 24
+    assert len(row.temperature) == row.hours * 4
+
+    # Ugyanabban a futásban nincs újabb lekérés; új város esetén csak az kerül lekérésre
+    assert asyncio.run(refresher.refresh(now))["cities"] == 0
+    db.add(models.City(id=4, city_name="Pécs", latitude=46.07, longitude=18.23))
+    db.commit()
+    assert asyncio.run(refresher.refresh(now))["saved"] == 1
+    # Következő futás: mindenki újra
+    later = forecast.next_run_available(forecast.model_run(now))
+    assert asyncio.run(refresher.refresh(later))["saved"] == 4
+    assert stub.request_count == 3
+
+def test_forecast_endpoint_serves_from_cache(client, engine, cities, stub):
+    asyncio.run(forecast.ForecastRefresher(sessionmaker(bind=engine)).refresh())
+    forecast.forecast_cache.clear()
+
+    first = client.get("/weather/forecast", params={"city_id": 2, "hours": 6})
+    assert first.status_code == 200
+    body = first.json()
+    assert body["interval_seconds"] == 3600 and len(body["forecast"]) == 6
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    assert body["forecast"][0]["time"] == hour.isoformat()
+    assert body["forecast"][0]["temperature"] == pytest.approx(46.25 - 30 + 5 * np.sin(hour.hour * np.pi / 12), abs=0.051)
+
+    columns = client.get("/weather/forecast", params={"city_id": 2, "hours": 6, "layout": "columns"}).json()["forecast"]
+    assert columns["temperature"] == [row["temperature"] for row in body["forecast"]]
+    stats = forecast.forecast_cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    assert stub.request_count == 1
+
+    assert client.get("/weather/forecast", params={"city_id": 99}).status_code == 404
+    assert client.get("/weather/forecast", params={"city_id": 2, "hours": 0}).status_code == 400
+    assert client.get("/forecast/status").json()["cache"]["entries"] == 1
+
+def test_stale_entry_expires_quickly_and_new_run_changes_key():
+    now = datetime(2024, 5, 1, 12, 0)
+    run = forecast.model_run(now)
+    old = forecast.entry_from_row(
+        {"city_id": 1, "model_run": run - timedelta(hours=3), "start": now, "interval_seconds": 3600, "hours": 1,
+         **{name: forecast.pack([1.0]) for name in forecast.VARIABLES}},
+        forecast.entry_expiry(run - timedelta(hours=3), now),
+    )
+    forecast.forecast_cache.put(run, old)
+    assert forecast.cached_forecast(1, now) is old
+    assert forecast.cached_forecast(1, now + timedelta(seconds=forecast.FORECAST_STALE_SECONDS)) is None
+    assert forecast.cached_forecast(1, forecast.next_run_available(run)) is None
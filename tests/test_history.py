@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from backend import models, services
+
+BASE = datetime(2024, 1, 1)
+
+def add_history(db, city_id: int, count: int):
+    db.add(models.City(id=city_id, city_name=f"Város {city_id}", latitude=47.0, longitude=19.0))
+    for i in range(count):
+        db.add(models.WeatherData(
+            city_id=city_id, temperature=i, humidity=50, apparent_temperature=i, precipitation=0,
+            cloud_cover=0, is_day=1, weather_code=0, wind_speed=1,
+            # Minden második mérésnek ugyanaz az időbélyege, így az id-s döntetlenfeloldás is tesztelve van
+            timestamp=BASE + timedelta(minutes=30 * (i // 2)),
+        ))
+    db.commit()
+
+def query_plan(engine, stmt) -> str:
+    compiled = stmt.compile(bind=engine)
+    params = [str(compiled.params[name]) for name in compiled.positiontup]
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(params)).all()
+    return " | ".join(row[-1] for row in rows)
+
+def test_keyset_pagination_walks_full_history(db):
+    add_history(db, 1, 25)
+    add_history(db, 2, 5)
+
+    seen, cursor = [], None
+    while True:
+        page = services.get_history(db, city_id=1, limit=10, before=cursor)
+        seen += [w.id for w in page]
+        if len(page) < 10:
+            break
+        cursor = services.decode_cursor(services.encode_cursor(page[-1]))
+
+    expected = [w.id for w in services.get_history(db, city_id=1, limit=100)]
+    assert seen == expected
+    assert len(set(seen)) == 25
+
+def test_history_time_range(db):
+    add_history(db, 1, 10)
+    page = services.get_history(db, city_id=1, start=BASE + timedelta(hours=1), end=BASE + timedelta(hours=2))
+    assert [w.timestamp for w in page] == [BASE + timedelta(minutes=90)] * 2 + [BASE + timedelta(hours=1)] * 2
+
+def test_history_query_uses_composite_index(engine):
+    for before in (None, (BASE, 10)):
+        plan = query_plan(engine, services.history_query(city_id=1, limit=20, before=before))
+        assert "ix_weather_history_city_timestamp" in plan
+        assert "TEMP B-TREE" not in plan
+
+def test_create_schema_adds_index_to_existing_database(tmp_path):
+    """Régi weather.db: a tábla már létezik, de az összetett index még nem."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE weather_history (id INTEGER PRIMARY KEY, city_id INTEGER, temperature FLOAT, "
+                          "humidity INTEGER, apparent_temperature FLOAT, precipitation FLOAT, cloud_cover INTEGER, "
+                          "is_day INTEGER, weather_code INTEGER, wind_speed FLOAT, timestamp DATETIME)"))
+
+    models.create_schema(engine)
+
+    with engine.connect() as conn:
+        indexes = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all()
+    assert "ix_weather_history_city_timestamp" in indexes
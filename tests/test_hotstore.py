@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import pytest
+from backend import cache, hotstore, models, services
+from backend.schemas import WeatherCreate
+from backend.hotstore import HotStore
+
+BASE = datetime(2024, 5, 1)
+
+def add_rows(db, city_id: int, count: int, offset: int = 0):
+    if db.get(models.City, city_id) is None:
+        db.add(models.City(id=city_id, city_name=f"Város {city_id}", latitude=47.0, longitude=19.0))
+    for i in range(offset, offset + count):
+        db.add(models.WeatherData(
+            city_id=city_id, temperature=i * 0.5, humidity=40 + i % 50, apparent_temperature=i, precipitation=0.1,
+            cloud_cover=i % 100, is_day=i % 2, weather_code=0, wind_speed=3.3,
+            timestamp=BASE + timedelta(minutes=30 * (i // 2)),
+        ))
+    db.commit()
+
+def as_dicts(records):
+    return [{name: getattr(r, name) for name in hotstore.HotRecord._fields} for r in records]
+
+@pytest.mark.parametrize("filters", [
+    {"limit": 10},
+    {"limit": 7, "start": BASE + timedelta(hours=15), "end": BASE + timedelta(hours=18)},
+    {"limit": 5, "before": (BASE + timedelta(hours=19), 10**9)},
+])
+def test_history_matches_database(db, filters):
+    add_rows(db, 1, 50)
+    store = HotStore(capacity=20)
+    store.load(db)
+    expected = as_dicts(services.get_history(db, city_id=1, **filters))
+    assert as_dicts(store.history(1, **filters)) == expected
+
+def test_ranges_beyond_the_ring_fall_back_to_database(db):
+    add_rows(db, 1, 50)
+    store = HotStore(capacity=21)
+    store.load(db)
+    assert store.history(1, limit=30) is None
+    assert store.weather_stats(1, None, None, {"temperature": "temp"}) is None
+    # A gyűrű legrégebbi sora 7:00-kori, a vele azonos időbélyegű társa már kiszorult
+    assert store.history(1, limit=30, start=BASE + timedelta(hours=7)) is None
+    assert len(store.history(1, limit=30, start=BASE + timedelta(hours=7, minutes=1))) == 20
+
+def test_stats_match_database(db):
+    add_rows(db, 1, 30)
+    store = HotStore(capacity=40)
+    store.load(db)
+    metrics = {"temperature": "temp", "humidity": "humidity", "cloud_cover": "cloud_cover"}
+    for start, end in ((None, None), (BASE + timedelta(hours=3), BASE + timedelta(hours=9)), (BASE + timedelta(days=3), None)):
+        # A globális tár nincs betöltve, így a services az adatbázisból számol
+        expected = services.get_weather_stats(db, city_id=1, start=start, end=end, metrics=list(metrics), percentiles=[50, 90])
+        assert store.weather_stats(1, start, end, metrics, [50, 90]) == expected
+
+def test_saves_are_appended_and_served_by_the_endpoint(client, db):
+    add_rows(db, 1, 10)
+    hotstore.hot_store.load(db)
+    record = services.save_weather(db, WeatherCreate(
+        city_id=1, temperature=30.5, humidity=20, apparent_temperature=31.0,
+        precipitation=0.0, cloud_cover=0, is_day=1, weather_code=0, wind_speed=2.0,
+    ))
+    assert hotstore.hot_store.history(1, limit=1)[0].id == record.id
+
+    body = client.get("/weather/history?city_id=1&limit=5")
+    assert hotstore.hot_store.stats()["hits"] == 2
+    hotstore.hot_store.clear()
+    cache.response_cache.clear()
+    assert client.get("/weather/history?city_id=1&limit=5").content == body.content
+    assert client.get("/weather/history?city_id=1&limit=5").headers["x-next-cursor"] == body.headers["x-next-cursor"]
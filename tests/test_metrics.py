@@ -0,0 +1,62 @@
+import asyncio
+from backend import metrics
+
+
+def sample_value(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+def test_exposition_format():
+    counter = metrics.Counter("test_things_total", "Dolgok.", ("kind",))
+    counter.inc('a"b')
+    counter.inc('a"b', amount=2)
+    histogram = metrics.Histogram("test_duration_seconds", "Idő.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(5)
+
+    counter_family, histogram_family = counter.collect(), histogram.collect()
+    assert counter_family.samples == [("test_things_total", {"kind": 'a"b'}, 3.0)]
+    assert metrics._format_labels(counter_family.samples[0][1]) == '{kind="a\\"b"}'
+    buckets = {labels["le"]: value for name, labels, value in histogram_family.samples if name.endswith("_bucket")}
+    assert buckets == {"0.1": 1, "1.0": 1, "+Inf": 2}
+    assert ("test_duration_seconds_count", {}, 2) in histogram_family.samples
+
+def test_timed_records_sync_and_async():
+    @metrics.timed("test_sync")
+    def work():
+        return 1
+
+    @metrics.timed("test_async")
+    async def async_work():
+        return 2
+
+    before = sample_value(metrics.render(), 'weather_function_duration_seconds_count{function="test_async"}')
+    assert work() == 1 and asyncio.run(async_work()) == 2
+    text = metrics.render()
+    assert sample_value(text, 'weather_function_duration_seconds_count{function="test_sync"}') == 1
+    assert sample_value(text, 'weather_function_duration_seconds_count{function="test_async"}') == before + 1
+
+def test_metrics_endpoint_labels_requests_by_route(client):
+    prefix = 'weather_http_request_duration_seconds_count{method="GET",route="/weather/history",status="200"}'
+    before = sample_value(client.get("/metrics").text, prefix)
+    client.get("/weather/history", params={"city_id": 1})
+    client.get("/weather/history", params={"city_id": 2})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert sample_value(response.text, prefix) == before + 2
+    assert "# TYPE weather_scheduler_lag_seconds gauge" in response.text
+    assert "weather_response_cache_hits_total" in response.text
+
+def test_disabled_metrics_are_pass_through(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+
+    def work():
+        return 1
+
+    assert metrics.timed()(work) is work
+    assert metrics.timer("x") is metrics._NULL_TIMER
+    assert isinstance(metrics.register(metrics.Counter("test_disabled_total", "Ki.")), metrics._NullMetric)
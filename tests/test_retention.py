@@ -0,0 +1,122 @@
+import csv
+import gzip
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select
+from backend import export, hotstore, models, retention, rollups
+from backend.hotstore import CityRing
+
+START = datetime(2024, 1, 15)
+NOW = datetime(2024, 4, 10, 12)
+STEP = timedelta(hours=6)
+
+@pytest.fixture
+def history(db):
+    """Két város, 6 óránkénti mérések január közepétől a NOW időpontig, kész aggregátumokkal."""
+    for city_id in (1, 2):
+        db.add(models.City(id=city_id, city_name=f"Város {city_id}", latitude=47.0, longitude=19.0))
+    timestamp, rows = START, 0
+    while timestamp < NOW:
+        for city_id in (1, 2):
+            db.add(models.WeatherData(
+                city_id=city_id, temperature=rows % 17, humidity=50, apparent_temperature=1.0, precipitation=0.0,
+                cloud_cover=10, is_day=1, weather_code=0, wind_speed=2.0, timestamp=timestamp,
+            ))
+            rows += 1
+        timestamp += STEP
+    db.commit()
+    rollups.rebuild(db)
+    return rows
+
+def raw_count(db) -> int:
+    return db.scalar(select(func.count()).select_from(models.WeatherData))
+
+def daily_total(db) -> int:
+    return db.scalar(select(func.sum(models.WeatherDaily.count)))
+
+def read_csv_archive(path):
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == list(export.EXPORT_COLUMNS)
+    return rows[1:]
+
+def test_compact_archives_deletes_and_keeps_rollups(db, history, tmp_path):
+    report = retention.compact(db, now=NOW, days=30, archive_dir=str(tmp_path), archive_format="csv", batch_rows=7)
+
+    cutoff = datetime(2024, 3, 11)
+    assert report["cutoff"] == cutoff.isoformat()
+    assert db.scalar(select(func.min(models.WeatherData.timestamp))) == cutoff
+    assert raw_count(db) == history - report["deleted_rows"]
+    # Az aggregátumok a törölt időszakra is megmaradnak, egy teljes újraszámolás után is
+    assert daily_total(db) == history
+    rollups.rebuild(db)
+    assert daily_total(db) == history
+
+    months = sorted({path.split("month=")[1][:2] for path in report["archive_files"]})
+    assert months == ["01", "02", "03"]
+    archived = [row for path in report["archive_files"] for row in read_csv_archive(path)]
+    assert len(archived) == report["deleted_rows"]
+    assert max(row[2] for row in archived) < cutoff.isoformat()
+
+def test_interrupted_compact_resumes_without_losing_rollups(db, history, tmp_path, monkeypatch):
+    calls = {"delete": 0}
+    real_delete = retention.delete
+
+    def failing_delete(*args):
+        calls["delete"] += 1
+        if calls["delete"] > 5:
+            raise RuntimeError("megszakadt")
+        return real_delete(*args)
+
+    # Napi 8 sor, 3-as kötegek (3+3+2): a második nap utolsó kötege előtt szakad meg
+    monkeypatch.setattr(retention, "delete", failing_delete)
+    with pytest.raises(RuntimeError):
+        retention.compact(db, now=NOW, days=30, archive_dir=str(tmp_path), archive_format="csv", batch_rows=3)
+    db.rollback()
+    monkeypatch.setattr(retention, "delete", real_delete)
+    assert raw_count(db) == history - 14
+    assert daily_total(db) == history
+    rollups.rebuild(db)
+    assert daily_total(db) == history
+
+    report = retention.compact(db, now=NOW, days=30, archive_dir=str(tmp_path), archive_format="csv", batch_rows=3)
+    assert report["deleted_rows"] == history - 14 - raw_count(db)
+    assert daily_total(db) == history
+    rollups.rebuild(db)
+    assert daily_total(db) == history
+
+    # Minden törölt sor pontosan egyszer szerepel az archívumban
+    archived = [row[0] for path in tmp_path.rglob("*.csv.gz") for row in read_csv_archive(path)]
+    assert len(archived) == len(set(archived)) == history - raw_count(db)
+
+def test_compact_parquet_partition(db, history, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    report = retention.compact(db, now=NOW, days=30, archive_dir=str(tmp_path), archive_format="parquet")
+    tables = [pq.read_table(path) for path in report["archive_files"]]
+    assert sum(t.num_rows for t in tables) == report["deleted_rows"]
+    assert tables[0].schema.names == list(export.EXPORT_COLUMNS)
+
+def test_series_before_cutoff_comes_from_rollups(db, history):
+    retention.compact(db, now=NOW, days=30, archive_dir="")
+    series = rollups.get_series(db, 1, start=datetime(2024, 2, 1), end=datetime(2024, 2, 8), max_points=500)
+    assert series["resolution"] == "hour"
+    assert len(series["points"]) == 7 * 4
+
+def test_compact_without_expired_rows_is_noop(db, history):
+    report = retention.compact(db, now=NOW, days=365, archive_dir="")
+    assert report["deleted_rows"] == 0 and raw_count(db) == history
+    assert retention.compact(db, now=NOW, days=0, archive_dir="")["cutoff"] is None
+
+def test_incremental_vacuum_returns_pages(db, history):
+    report = retention.compact(db, now=NOW, days=7, archive_dir="", vacuum_pages=100000)
+    assert report["deleted_rows"] > 0
+    assert report["vacuumed_pages"] is not None and report["vacuumed_pages"] >= 0
+
+def test_ring_drop_before_marks_complete():
+    ring = CityRing(capacity=3)
+    for i in range(5):
+        ring.append(i + 1, i * 10, [0] * len(hotstore.COLUMN_TYPES))
+    assert not ring.complete and ring.key(0) == (20, 3)
+
+    ring.drop_before(25)
+    assert ring.complete and ring.size == 2 and ring.key(0) == (30, 4)
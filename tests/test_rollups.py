@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import pytest
+from backend import models, rollups, services
+from backend.schemas import WeatherCreate
+
+BASE = datetime(2024, 1, 1)
+
+def weather(temperature: float) -> WeatherCreate:
+    return WeatherCreate(
+        city_id=1, temperature=temperature, humidity=50, apparent_temperature=temperature,
+        precipitation=0.2, cloud_cover=0, is_day=1, weather_code=0, wind_speed=3.0,
+    )
+
+@pytest.fixture
+def city(db):
+    db.add(models.City(id=1, city_name="Sopron", latitude=47.68, longitude=16.58))
+    db.commit()
+
+def add_raw(db, hours: int, per_hour: int = 2):
+    """Nyers sorok közvetlenül, aggregátum-frissítés nélkül (mint egy régi adatbázisban)."""
+    for i in range(hours * per_hour):
+        db.add(models.WeatherData(
+            city_id=1, temperature=float(i % 10), humidity=50, apparent_temperature=0, precipitation=0.1,
+            cloud_cover=0, is_day=1, weather_code=0, wind_speed=2.0,
+            timestamp=BASE + timedelta(minutes=60 // per_hour * i),
+        ))
+    db.commit()
+
+def rollup_rows(db, model):
+    return {(r.city_id, r.bucket_start): (r.count, r.temperature_sum, r.temperature_min, r.temperature_max)
+            for r in db.query(model).all()}
+
+def test_ingestion_updates_rollups_incrementally(db, city):
+    services.save_weather(db, weather(10.0))
+    services.save_weather_batch(db, [weather(4.0), weather(16.0)])
+
+    (count, total, low, high), = rollup_rows(db, models.WeatherDaily).values()
+    assert (count, total, low, high) == (3, 30.0, 4.0, 16.0)
+    assert sum(r[0] for r in rollup_rows(db, models.WeatherHourly).values()) == 3
+
+def test_rebuild_matches_incremental(db, city):
+    add_raw(db, hours=30)
+    assert rollups.needs_rebuild(db)
+    assert rollups.rebuild(db) == 60
+
+    hourly = rollup_rows(db, models.WeatherHourly)
+    assert len(hourly) == 30
+    assert hourly[(1, BASE)] == (2, 1.0, 0.0, 1.0)
+    assert len(rollup_rows(db, models.WeatherDaily)) == 2
+
+    # A részleges újraszámolás ugyanazt az eredményt adja
+    rollups.rebuild(db, BASE + timedelta(hours=25), BASE + timedelta(hours=26))
+    assert rollup_rows(db, models.WeatherHourly) == hourly
+
+def test_series_picks_resolution_by_range(db, city):
+    add_raw(db, hours=24 * 20)
+    rollups.rebuild(db)
+
+    raw = rollups.get_series(db, 1, start=BASE, end=BASE + timedelta(hours=3), max_points=100)
+    assert raw["resolution"] == "raw" and len(raw["points"]) == 6
+
+    hourly = rollups.get_series(db, 1, start=BASE, end=BASE + timedelta(days=2), max_points=60)
+    assert hourly["resolution"] == "hour" and len(hourly["points"]) == 48
+
+    daily = rollups.get_series(db, 1, start=BASE, end=BASE + timedelta(days=20), max_points=60)
+    assert daily["resolution"] == "day" and len(daily["points"]) == 20
+
+    thinned = rollups.get_series(db, 1, start=BASE, end=BASE + timedelta(days=20), max_points=5)
+    assert len(thinned["points"]) == 5
+    assert sum(p["count"] for p in thinned["points"]) == 24 * 20 * 2
+    assert min(p["min"] for p in thinned["points"]) == 0.0
+    assert max(p["max"] for p in thinned["points"]) == 9.0
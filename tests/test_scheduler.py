@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from backend import models, scheduler, services
+from backend.scheduler import WeatherScheduler
+from benchmarks.openmeteo_stub import OpenMeteoStub
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+    def __call__(self):
+        return self.now
+
+def make_scheduler(clock, **options) -> WeatherScheduler:
+    defaults = dict(interval_seconds=1800, jitter_seconds=0, backoff_base_seconds=30, max_backoff_seconds=100, startup_spread_seconds=600)
+    defaults.update(options)
+    return WeatherScheduler(clock=clock, **defaults)
+
+def city(city_id: int) -> models.City:
+    return models.City(id=city_id, city_name=f"Város {city_id}", latitude=47.0 + city_id * 0.01, longitude=19.0)
+
+def test_new_cities_are_spread_evenly():
+    clock = FakeClock()
+    s = make_scheduler(clock)
+    for i in range(1, 101):
+        s.add_city(city(i))
+
+    offsets = sorted(entry.next_due - clock.now for entry in s._entries.values())
+    assert 0 <= offsets[0] and offsets[-1] < 600
+    assert max(b - a for a, b in zip(offsets, offsets[1:])) < 3 * 600 / 100
+
+def test_due_time_continues_from_last_observation():
+    clock = FakeClock()
+    s = make_scheduler(clock)
+    last = scheduler._from_epoch(clock.now - 100)
+    s.add_city(city(1), last_timestamp=last)
+    assert s._entries[1].next_due == pytest.approx(clock.now - 100 + 1800)
+
+def test_exponential_backoff_is_capped_and_reset_on_success():
+    clock = FakeClock()
+    s = make_scheduler(clock, startup_spread_seconds=0)
+    s.add_city(city(1))
+    entry = s.pop_due(clock.now)[0]
+
+    delays = []
+    for _ in range(4):
+        s.mark_failure(entry, clock.now, "hiba")
+        delays.append(entry.next_due - clock.now)
+    assert delays == [30, 60, 100, 100]
+
+    s.mark_failure(entry, clock.now, "429", retry_after=500)
+    assert entry.next_due - clock.now == 500
+
+    due = entry.next_due
+    s.mark_success(entry, due)
+    assert entry.failures == 0
+    assert entry.next_due == due + 1800
+
+def test_lease_allows_single_leader(db):
+    now = datetime(2024, 1, 1, 12, 0)
+    assert scheduler.try_acquire_lease(db, "a", 60, now=now)
+    assert not scheduler.try_acquire_lease(db, "b", 60, now=now + timedelta(seconds=30))
+    assert scheduler.try_acquire_lease(db, "a", 60, now=now + timedelta(seconds=30))
+    # Lejárt bérletet más átvehet
+    assert scheduler.try_acquire_lease(db, "b", 60, now=now + timedelta(seconds=120))
+    scheduler.release_lease(db, "b")
+    assert scheduler.try_acquire_lease(db, "c", 60, now=now + timedelta(seconds=121))
+
+@pytest.fixture
+def stub(monkeypatch):
+    with OpenMeteoStub() as server:
+        monkeypatch.setattr(services, "OPEN_METEO_URL", server.url)
+        yield server
+
+def test_tick_seeds_fetches_and_saves_as_leader(async_sessions, db, stub):
+    clock = FakeClock()
+    leader = make_scheduler(clock, session_factory=async_sessions, startup_spread_seconds=0, owner="leader")
+    follower = make_scheduler(clock, session_factory=async_sessions, owner="follower")
+
+    async def run():
+        await leader.tick()
+        await follower.tick()
+
+    asyncio.run(run())
+
+    assert leader.is_leader and not follower.is_leader
+    assert db.query(models.City).count() == len(services.DEFAULT_CITIES)
+    assert db.query(models.WeatherData).count() == len(services.DEFAULT_CITIES)
+    assert stub.request_count == 1
+    status = leader.status()
+    assert status["cycles"] == 1 and status["queue_depth"] == 0 and status["in_backoff"] == 0
+
+def test_rate_limit_pauses_scheduler(async_sessions, stub):
+    clock = FakeClock()
+    s = make_scheduler(clock, session_factory=async_sessions, startup_spread_seconds=0)
+    stub.retry_after = 120
+
+    asyncio.run(s.tick())
+
+    status = s.status()
+    assert status["rate_limited_until"] is not None
+    assert status["in_backoff"] == len(services.DEFAULT_CITIES)
+    assert all(entry.next_due - clock.now >= 120 for entry in s._entries.values())
@@ -0,0 +1,55 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from pydantic import TypeAdapter
+from backend import models, schemas, serialization, services
+
+BASE = datetime(2024, 5, 1, 12, 0, 0, 250000)
+
+@pytest.fixture
+def history(db):
+    for city_id, name in ((1, "Pécs"), (2, "Győr")):
+        db.add(models.City(id=city_id, city_name=name, latitude=46.07 + city_id, longitude=18.23))
+    for i in range(30):
+        db.add(models.WeatherData(
+            city_id=1 + i % 2, temperature=i / 3, humidity=40 + i, apparent_temperature=i - 0.5, precipitation=0.0,
+            cloud_cover=i, is_day=i % 2, weather_code=3, wind_speed=1.5, timestamp=BASE + timedelta(minutes=i),
+        ))
+    db.commit()
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_path_matches_pydantic_contract(db, history, monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(serialization, "ORJSON_AVAILABLE", use_orjson)
+
+    weather_adapter = TypeAdapter(list[schemas.WeatherResponse])
+    city_adapter = TypeAdapter(list[schemas.CityResponse])
+    expected_history = json.loads(weather_adapter.dump_json(weather_adapter.validate_python(services.get_history(db, limit=100))))
+    expected_cities = json.loads(city_adapter.dump_json(city_adapter.validate_python(services.get_cities(db))))
+
+    assert json.loads(serialization.encode(services.get_history_rows(db, limit=100), serialization.WEATHER_FIELDS)) == expected_history
+    assert json.loads(serialization.encode(services.get_city_rows(db), serialization.CITY_FIELDS)) == expected_cities
+
+def test_columns_layout_loads_into_pandas(db, history):
+    pd = pytest.importorskip("pandas")
+    rows = services.get_history_rows(db, city_id=1, limit=5)
+    columns = json.loads(serialization.encode(rows, serialization.WEATHER_FIELDS, "columns"))
+
+    assert list(columns) == list(serialization.WEATHER_FIELDS)
+    assert all(len(values) == 5 for values in columns.values())
+    records = json.loads(serialization.encode(rows, serialization.WEATHER_FIELDS))
+    pd.testing.assert_frame_equal(pd.DataFrame(columns), pd.DataFrame(records))
+    assert serialization.columns_payload([], ("a", "b")) == {"a": [], "b": []}
+
+def test_endpoints_accept_layout(client, db, history):
+    rows = client.get("/weather/history", params={"city_id": 2, "limit": 3}).json()
+    columns = client.get("/weather/history", params={"city_id": 2, "limit": 3, "layout": "columns"}).json()
+    assert columns["id"] == [row["id"] for row in rows]
+    assert columns["timestamp"][0] == rows[0]["timestamp"] == (BASE + timedelta(minutes=29)).isoformat()
+
+    dashboard = client.get("/dashboard", params={"city_id": 2, "limit": 3, "layout": "columns"}).json()
+    assert dashboard["history"] == columns
+    assert [city["city_name"] for city in dashboard["cities"]] == ["Pécs", "Győr"]
+    assert client.get("/cities", params={"layout": "columns"}).json()["city_name"] == ["Pécs", "Győr"]
+    assert client.get("/weather/history", params={"layout": "sideways"}).status_code == 400
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+import pytest
+from backend import models, services
+
+BASE = datetime(2024, 1, 1, 0, 0)
+
+@pytest.fixture
+def history(db):
+    """Két város, óránként 4 mérés két órán át; a hőmérséklet 1..8 illetve 11..18."""
+    for city_id, offset in ((1, 0), (2, 10)):
+        db.add(models.City(id=city_id, city_name=f"Város {city_id}", latitude=47.0, longitude=19.0))
+        for i in range(8):
+            db.add(models.WeatherData(
+                city_id=city_id, temperature=offset + i + 1, humidity=40 + i, apparent_temperature=0,
+                precipitation=0.5 * i, cloud_cover=0, is_day=1, weather_code=0, wind_speed=i,
+                timestamp=BASE + timedelta(minutes=15 * i),
+            ))
+    db.commit()
+    return db
+
+def test_stats_legacy_keys(history):
+    stats = services.get_weather_stats(history, city_id=1)
+    assert stats == {"count": 8, "avg_temp": 4.5, "max_temp": 8, "min_temp": 1}
+
+def test_stats_empty_returns_zeros(db):
+    assert services.get_weather_stats(db, city_id=99) == {"count": 0, "avg_temp": 0, "max_temp": 0, "min_temp": 0}
+
+def test_stats_time_window_metrics_and_percentiles(history):
+    stats = services.get_weather_stats(
+        history, city_id=1, start=BASE + timedelta(hours=1), end=BASE + timedelta(hours=2),
+        metrics=["temperature", "humidity"], percentiles=[50, 100],
+    )
+    assert stats["count"] == 4
+    assert stats["avg_temp"] == 6.5
+    assert stats["p50_temp"] == 6
+    assert stats["p100_temp"] == 8
+    assert stats["min_humidity"] == 44
+
+def test_stats_group_by_city_and_hour(history):
+    by_city = services.get_weather_stats(history, group_by="city", percentiles=[50])
+    assert [(g["city_id"], g["avg_temp"], g["p50_temp"]) for g in by_city] == [(1, 4.5, 4), (2, 14.5, 14)]
+
+    by_hour = services.get_weather_stats(history, city_id=2, group_by="hour")
+    assert [(g["bucket"], g["count"], g["max_temp"]) for g in by_hour] == [
+        ("2024-01-01T00:00:00", 4, 14), ("2024-01-01T01:00:00", 4, 18),
+    ]
+
+def test_stats_rejects_unknown_metric(history):
+    with pytest.raises(ValueError):
+        services.get_weather_stats(history, metrics=["pressure"])
+
+def test_stats_endpoint_metrics_parameter(client, history):
+    body = client.get("/weather/stats", params={"city_id": 1, "metrics": "temperature,humidity"}).json()
+    assert (body["avg_temp"], body["min_humidity"]) == (4.5, 40)
+    assert client.get("/weather/stats", params={"metrics": "pressure"}).status_code == 400
@@ -0,0 +1,54 @@
+import asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from backend import models, services
+from backend.database import async_database_url
+from backend.schemas import CityCreate, WeatherCreate
+
+def weather(city_id: int, temperature: float) -> WeatherCreate:
+    return WeatherCreate(
+        city_id=city_id, temperature=temperature, humidity=50, apparent_temperature=temperature - 1,
+        precipitation=0.0, cloud_cover=10, is_day=1, weather_code=0, wind_speed=5.5,
+    )
+
+def test_sqlite_pragmas_applied(engine):
+    """Az engine minden kapcsolaton WAL naplót, NORMAL szinkronizációt és busy timeoutot állít be."""
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() > 0
+
+def test_save_weather_batch_inserts_in_one_transaction(db):
+    """A kötegelt mentés minden sort elment, és a visszaadott objektumok commit után is olvashatók."""
+    city = services.create_city(db, CityCreate(city_name="Sopron", latitude=47.68, longitude=16.58))
+    saved = services.save_weather_batch(db, [weather(city.id, t) for t in (10.0, 12.5, 15.0)])
+
+    assert [w.temperature for w in saved] == [10.0, 12.5, 15.0]
+    assert all(w.id is not None and w.timestamp is not None for w in saved)
+    assert db.query(models.WeatherData).count() == 3
+
+def test_save_weather_batch_empty(db):
+    assert services.save_weather_batch(db, []) == []
+
+def test_async_services_roundtrip(engine):
+    """Az aszinkron változatok ugyanazt a szinkron logikát futtatják aiosqlite-on keresztül."""
+    async def run():
+        async_engine = create_async_engine(async_database_url(str(engine.url)))
+        try:
+            async with async_sessionmaker(async_engine, expire_on_commit=False)() as session:
+                city = await services.create_city_async(session, CityCreate(city_name="Pécs", latitude=46.07, longitude=18.23))
+                await services.save_weather_batch_async(session, [weather(city.id, 5.0), weather(city.id, 7.0)])
+                history = await services.get_history_async(session, city_id=city.id)
+                found = await services.get_city_by_name_async(session, "Pécs")
+                return city, history, found
+        finally:
+            await async_engine.dispose()
+
+    city, history, found = asyncio.run(run())
+    assert found.id == city.id
+    assert sorted(w.temperature for w in history) == [5.0, 7.0]
+
+def test_city_endpoints_use_async_session(client):
+    created = client.post("/cities", json={"city_name": "Győr", "latitude": 47.68, "longitude": 17.63})
+    assert created.status_code == 200
+    assert [c["city_name"] for c in client.get("/cities").json()] == ["Győr"]
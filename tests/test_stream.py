@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+from datetime import datetime
+from backend import models, pubsub, schemas, services
+
+def record(record_id: int, city_id: int = 1, temperature: float = 20.0) -> models.WeatherData:
+    return models.WeatherData(
+        id=record_id, city_id=city_id, temperature=temperature, humidity=50, apparent_temperature=19.0, precipitation=0.0,
+        cloud_cover=10, is_day=1, weather_code=0, wind_speed=5.0, timestamp=datetime(2024, 5, 1, 12),
+    )
+
+def parse(chunk: bytes):
+    """SSE darab -> [(esemény, adat)] lista."""
+    events = []
+    for block in chunk.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "data" in fields:
+            events.append((fields.get("event"), fields["data"]))
+    return events
+
+def test_stream_filters_by_city_and_reports_drops():
+    broker = pubsub.WeatherBroker(queue_size=2)
+
+    async def scenario():
+        stream = broker.stream([1], heartbeat=0.05)
+        assert await stream.__anext__() == b"retry: %d\n\n" % pubsub.STREAM_RETRY_MS
+        assert await stream.__anext__() == b": keepalive\n\n"
+
+        broker.publish([record(1), record(2, city_id=2)])
+        first = parse(await stream.__anext__())
+        assert [(event, json.loads(data)["id"]) for event, data in first] == [("weather", 1)]
+
+        # Lassú kliens: a 2 hosszú sorban csak a két legfrissebb marad, előttük a dropped jelzés
+        broker.publish([record(i) for i in range(10, 15)])
+        await asyncio.sleep(0)
+        events = parse(await stream.__anext__())
+        assert events[0] == ("dropped", "3")
+        assert [json.loads(data)["id"] for _, data in events[1:]] == [13, 14]
+
+        broker.close()
+        await asyncio.sleep(0)
+        assert [chunk async for chunk in stream] == []
+
+    asyncio.run(scenario())
+    stats = broker.stats()
+    assert (stats["subscribers"], stats["queued"], stats["dropped"]) == (0, 3, 3)
+
+def test_publish_from_another_thread():
+    broker = pubsub.WeatherBroker()
+
+    async def scenario():
+        stream = broker.stream()
+        await stream.__anext__()
+        thread = threading.Thread(target=broker.publish, args=([record(7, city_id=3)],))
+        thread.start()
+        thread.join()
+        events = parse(await asyncio.wait_for(stream.__anext__(), 1))
+        await stream.aclose()
+        return events
+
+    assert [json.loads(data)["city_id"] for _, data in asyncio.run(scenario())] == [3]
+    assert broker.stats()["subscribers"] == 0
+
+def test_subscriber_limit_is_enforced_atomically():
+    broker = pubsub.WeatherBroker(max_subscribers=3)
+
+    async def scenario():
+        # Egyszerre induló kapcsolatok: a korlát felettiek elutasítva
+        streams = [broker.stream([1]) for _ in range(5)]
+        results = await asyncio.gather(*[stream.__anext__() for stream in streams], return_exceptions=True)
+        assert sum(isinstance(result, pubsub.SubscriberLimitError) for result in results) == 2
+        assert broker.stats()["subscribers"] == 3
+
+        # A prepend lezárása a mögötte lévő folyamot is lezárja, így a hely felszabadul
+        events = pubsub.prepend(results[0], streams[0])
+        assert await events.__anext__() == results[0]
+        await events.aclose()
+        assert broker.stats()["subscribers"] == 2
+        for stream in streams[1:]:
+            await stream.aclose()
+
+    asyncio.run(scenario())
+    stats = broker.stats()
+    assert (stats["subscribers"], stats["rejected"]) == (0, 2)
+
+def test_save_weather_publishes_after_commit(db):
+    db.add(models.City(id=1, city_name="Budapest", latitude=47.5, longitude=19.0))
+    db.commit()
+
+    async def scenario():
+        stream = pubsub.broker.stream([1])
+        await stream.__anext__()
+        saved = services.save_weather(db, schemas.WeatherCreate(
+            city_id=1, temperature=21.5, humidity=40, apparent_temperature=21.0, precipitation=0.0,
+            cloud_cover=0, is_day=1, weather_code=0, wind_speed=3.0, observed_at=datetime(2024, 5, 1, 12),
+        ))
+        events = parse(await asyncio.wait_for(stream.__anext__(), 1))
+        await stream.aclose()
+        return saved, events
+
+    saved, events = asyncio.run(scenario())
+    assert [(event, json.loads(data)["id"]) for event, data in events] == [("weather", saved.id)]
+
+def test_stream_endpoint_rejects_over_capacity(client, monkeypatch):
+    monkeypatch.setattr(pubsub.broker, "max_subscribers", 0)
+    response = client.get("/weather/stream", params={"city_ids": "1"})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert client.get("/weather/stream", params={"city_ids": "x"}).status_code == 400
+    assert client.get("/stream/stats").json()["rejected"] >= 1